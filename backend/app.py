@@ -6,6 +6,7 @@ from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify, redirect
 import sqlite3
 import hashlib
+import hmac
 import os
 from dotenv import load_dotenv
 from flask_cors import CORS
@@ -17,15 +18,22 @@ import uuid
 from requests_oauthlib import OAuth2Session
 
 # our functions
-from database.db import get_db
+from database.db import get_db, init_app as init_db_pool, pool_stats
 from scrape.ojuz import verify_ojuz, update_ojuz_scores
 from scrape.qoj import verify_qoj, update_qoj_scores
-from auth.session import session_required
+from jobs.jobs import get_job, stream_job_events, job_stats
+from scrape.client import http_stats
+from scrape.submissions import submission_cache_stats
+from scrape.tokens import token_stats
+from scrape.scraper_pool import scraper_pool_stats
+from auth.session import session_required, session_cache, bump_session_revocations, session_cache_stats
 from auth.github import *
 from auth.discord import *
 from auth.google import *
 from auth.auth import *
 from notes.notes import get_note, save_note
+from catalog.catalog import get_catalog
+from progress.progress import bump_progress_version, record_progress_changes, problem_ids_for, make_etag, not_modified, with_etag, get_problem_changes, apply_problem_updates
 from virtual_contests.vc import *
 
 # this is probably really bad but the website doesn't work without it
@@ -38,6 +46,7 @@ def create_app():
     app.config['SESSION_COOKIE_SAMESITE'] = 'None' if os.getenv("FLASK_ENV") == "production" else 'Lax'
     app.config['SESSION_COOKIE_SECURE'] = os.getenv("FLASK_ENV") == "production"
     CORS(app, supports_credentials=True, origins=[os.getenv("FRONTEND_URL")])
+    init_db_pool(app)
     return app
 
 app = create_app()
@@ -79,6 +88,12 @@ app.add_url_rule("/api/verify-ojuz", view_func=session_required(verify_ojuz), me
 app.add_url_rule("/api/update-ojuz", view_func=session_required(update_ojuz_scores), methods=["POST"])
 app.add_url_rule("/api/verify-qoj", view_func=session_required(verify_qoj), methods=["POST"])
 app.add_url_rule("/api/update-qoj", view_func=session_required(update_qoj_scores), methods=["POST"])
+app.add_url_rule("/api/jobs/<int:job_id>", view_func=session_required(get_job), methods=["GET"])
+app.add_url_rule("/api/jobs/<int:job_id>/events", view_func=session_required(stream_job_events), methods=["GET"])
+
+# checklist progress delta sync
+app.add_url_rule("/api/problems/changes", view_func=session_required(get_problem_changes), methods=["GET"])
+app.add_url_rule("/api/problem-updates", view_func=session_required(apply_problem_updates), methods=["POST"])
 
 # virtual contest stuff
 app.add_url_rule("/api/virtual-contests", view_func=session_required(get_virtual_contests), methods=["GET"])
@@ -90,6 +105,26 @@ app.add_url_rule("/api/virtual-contests/submit", view_func=session_required(subm
 app.add_url_rule("/api/contest-scores", view_func=session_required(get_contest_scores), methods=["GET"])
 app.add_url_rule("/api/virtual-contests/detail/<slug>", view_func=session_required(get_virtual_contest_detail), methods=["GET"])
 
+# Off unless METRICS_TOKEN is set; requests must then send it as X-Metrics-Token
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.route('/api/metrics', methods=["GET"])
+def get_metrics():
+    # Read-only counters for sizing the backend under real traffic
+    if not METRICS_TOKEN:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(request.headers.get("X-Metrics-Token", ""), METRICS_TOKEN):
+        return jsonify({"error": "Invalid metrics token"}), 403
+    return jsonify({
+        "db_pool": pool_stats(),
+        "session_cache": session_cache_stats(),
+        "jobs": job_stats(get_db()),
+        "http": http_stats(),
+        "submission_cache": submission_cache_stats(),
+        "scraper_tokens": token_stats(),
+        "scrapers": scraper_pool_stats()
+    })
+
 @app.route('/api/settings', methods=["GET"])
 @session_required
 def get_user_settings():
@@ -125,44 +160,12 @@ def update_user_settings():
         VALUES (?, ?)
         ON CONFLICT(user_id) DO UPDATE SET checklist_public = excluded.checklist_public
     ''', (user_id, checklist_public))
+    # /api/user responses depend on this flag
+    bump_progress_version(db, user_id)
     db.commit()
 
     return jsonify({"success": True})
 
-import ast
-
-def choose_link(links, platform_pref=None):
-    """links is a list of {platform, url} dicts."""
-    if not links:
-        return None
-
-    # Normalize platform_pref to a list
-    if platform_pref:
-        if isinstance(platform_pref, str):
-            try:
-                # Try to interpret it as a list-like string
-                parsed = ast.literal_eval(platform_pref)
-                if isinstance(parsed, list):
-                    platform_pref = parsed
-                else:
-                    platform_pref = [platform_pref]
-            except (ValueError, SyntaxError):
-                platform_pref = [platform_pref]
-
-        for plat in platform_pref:
-            for l in links:
-                if l['platform'] == plat:
-                    return l['url']
-
-    # Default order preference
-    order = ["oj.uz", "qoj.ac"]
-    for plat in order:
-        for l in links:
-            if l['platform'] == plat:
-                return l['url']
-
-    return links[0]['url']
-
 @app.route('/api/problems', methods=["GET"])
 @session_required
 def get_problems():
@@ -174,79 +177,41 @@ def get_problems():
     user_id = request.user_id 
     db = get_db()
 
-    pref_row = db.execute(
-        "SELECT platform_pref FROM user_settings WHERE user_id = ?",
-        (user_id,)
+    # One lookup decides whether the client's copy is still current
+    state = db.execute(
+        '''
+        SELECT
+            (SELECT version FROM user_progress_versions WHERE user_id = ?) AS version,
+            (SELECT platform_pref FROM user_settings WHERE user_id = ?) AS platform_pref
+        ''',
+        (user_id, user_id)
     ).fetchone()
-    platform_pref = pref_row['platform_pref'] if pref_row and pref_row['platform_pref'] else None
+    platform_pref = state['platform_pref'] or None
 
     want_all_links = request.headers.get("X-All-Problem-Links", "").lower() == "true"
 
-    placeholders = ', '.join(['?'] * len(from_names))
-    problems_raw = db.execute(
-        f'SELECT *, COALESCE(number, 0) as number FROM problems WHERE source IN ({placeholders}) ORDER BY source, year, number',
-        tuple(from_names)
-    ).fetchall()
-
-    problem_ids = [row['id'] for row in problems_raw]
-    links_by_pid = {}
-    if problem_ids:
-        ph_ids = ', '.join(['?'] * len(problem_ids))
-        link_rows = db.execute(
-            f'SELECT problem_id, platform, url FROM problem_links WHERE problem_id IN ({ph_ids})',
-            tuple(problem_ids)
-        ).fetchall()
-        for lr in link_rows:
-            links_by_pid.setdefault(lr['problem_id'], []).append({
-                'platform': lr['platform'],
-                'url': lr['url']
-            })
+    catalog = get_catalog(db)
+    etag = make_etag("problems", user_id, state['version'] or 0, catalog.version, ','.join(from_names), want_all_links)
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
+    placeholders = ', '.join(['?'] * len(from_names))
     progress_rows = db.execute(
-        f'SELECT problem_name, source, year, status, score FROM problem_statuses WHERE user_id = ? AND source IN ({placeholders})',
+        f'''
+        SELECT ps.problem_id, ps.status, ps.score
+        FROM problem_statuses ps
+        JOIN problems p ON p.id = ps.problem_id
+        WHERE ps.user_id = ? AND p.source IN ({placeholders})
+        ''',
         (user_id, *from_names)
     ).fetchall()
 
-    progress = {
-        (row['problem_name'], row['source'], row['year']): {
-            'status': row['status'],
-            'score': row['score']
-        }
-        for row in progress_rows
-    }
-
-    problems_by_category = {}
-
-    for row in problems_raw:
-        source = row['source']
-        year = row['year']
-        pid = row['id']
-
-        problem = dict(row)
-        problem.pop("id", None)
+    progress = {row['problem_id']: row for row in progress_rows}
 
-        links = links_by_pid.get(pid, [])
-        if want_all_links:
-            problem['links'] = {l['platform']: l['url'] for l in links}
-        else:
-            problem['link'] = choose_link(links, platform_pref)
-
-        if 'extra' in row.keys() and row['extra'] is not None:
-            problem['extra'] = row['extra']
-
-        key = (problem['name'], problem['source'], problem['year'])
-        if key in progress:
-            problem['status'] = progress[key]['status']
-            problem['score'] = progress[key]['score']
-        else:
-            problem['status'] = 0
-            problem['score'] = 0
-
-        if source not in problems_by_category:
-            problems_by_category[source] = {}
-        problems_by_category[source].setdefault(year, []).append(problem)
+    problems_by_category = catalog.group(from_names, progress, platform_pref, all_links=want_all_links)
 
-    return jsonify(problems_by_category)
+    return with_etag(jsonify(problems_by_category), etag)
 
 @app.route('/api/user', methods=["GET"])
 def get_user():
@@ -259,94 +224,58 @@ def get_user():
 
     db = get_db()
 
-    user = db.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+    user = db.execute(
+        '''
+        SELECT u.id, s.checklist_public, s.platform_pref, COALESCE(v.version, 0) AS version
+        FROM users u
+        LEFT JOIN user_settings s ON s.user_id = u.id
+        LEFT JOIN user_progress_versions v ON v.user_id = u.id
+        WHERE u.username = ?
+        ''',
+        (username,)
+    ).fetchone()
     if not user:
         return jsonify({"error": f"User {username} not found"}), 404
 
     user_id = user['id']
 
-    checklist_public_row = db.execute("SELECT checklist_public FROM user_settings WHERE user_id = ?", (user_id,)).fetchone()
-    checklist_public = checklist_public_row['checklist_public'] if checklist_public_row else 0
+    checklist_public = user['checklist_public'] if user['checklist_public'] is not None else 0
 
     if checklist_public == 0:
         return jsonify({"error": f"{username}'s checklist is private."}), 403
 
     # ---- get their platform setting ----
-    pref_row = db.execute(
-        "SELECT platform_pref FROM user_settings WHERE user_id = ?",
-        (user_id,)
-    ).fetchone()
-    platform_pref = pref_row['platform_pref'] if pref_row and pref_row['platform_pref'] else None
+    platform_pref = user['platform_pref'] or None
+
+    catalog = get_catalog(db)
+    etag = make_etag("user", user_id, user['version'], catalog.version, ','.join(problems_list))
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
 
     problems_by_category = {}
     if problems_list:
         placeholders = ', '.join(['?'] * len(problems_list))
 
-        problems_raw = db.execute(
-            f'SELECT *, COALESCE(number, 0) as number FROM problems WHERE source IN ({placeholders}) ORDER BY source, year, number',
-            tuple(problems_list)
-        ).fetchall()
-
-        problem_ids = [row['id'] for row in problems_raw]
-        links_by_pid = {}
-        if problem_ids:
-            ph_ids = ', '.join(['?'] * len(problem_ids))
-            link_rows = db.execute(
-                f'SELECT problem_id, platform, url FROM problem_links WHERE problem_id IN ({ph_ids})',
-                tuple(problem_ids)
-            ).fetchall()
-            for lr in link_rows:
-                links_by_pid.setdefault(lr['problem_id'], []).append({
-                    'platform': lr['platform'],
-                    'url': lr['url']
-                })
-
         progress_rows = db.execute(
             f'''
-            SELECT problem_name, source, year, status, score
-            FROM problem_statuses
-            WHERE user_id = ? AND source IN ({placeholders})
+            SELECT ps.problem_id, ps.status, ps.score
+            FROM problem_statuses ps
+            JOIN problems p ON p.id = ps.problem_id
+            WHERE ps.user_id = ? AND p.source IN ({placeholders})
             ''',
             (user_id, *problems_list)
         ).fetchall()
 
-        progress = {
-            (row['problem_name'], row['source'], row['year']): {
-                'status': row['status'],
-                'score': row['score']
-            }
-            for row in progress_rows
-        }
-
-        for row in problems_raw:
-            source = row['source']
-            year = row['year']
-            pid = row['id']
-
-            problem = dict(row)
-            problem.pop("id", None)
-
-            # ---- attach chosen link ----
-            links = links_by_pid.get(pid, [])
-            problem['link'] = choose_link(links, platform_pref)
-
-            key = (problem['name'], problem['source'], problem['year'])
-            if key in progress:
-                problem['status'] = progress[key]['status']
-                problem['score'] = progress[key]['score']
-            else:
-                problem['status'] = 0
-                problem['score'] = 0
-
-            if source not in problems_by_category:
-                problems_by_category[source] = {}
-            problems_by_category[source].setdefault(year, []).append(problem)
+        progress = {row['problem_id']: row for row in progress_rows}
 
-    return jsonify({
+        problems_by_category = catalog.group(problems_list, progress, platform_pref)
+
+    return with_etag(jsonify({
         "username": username,
         "checklist_public": checklist_public,
         "problems": problems_by_category
-    })
+    }), etag)
 
 @app.route('/api/update-problem-status', methods=['POST'])
 @session_required
@@ -363,17 +292,20 @@ def update_problem_status():
         return jsonify({"error": "Missing required fields"}), 400
 
     db = get_db()
-    db.execute(
+    problem_ids = problem_ids_for(db, problem_name, source, year)
+    if not problem_ids:
+        return jsonify({"error": "Unknown problem"}), 404
+    db.executemany(
         '''
-        INSERT INTO problem_statuses (user_id, problem_name, source, year, status)
-        VALUES (?, ?, ?, ?, ?)
-        ON CONFLICT(user_id, problem_name, source, year)
-        DO UPDATE SET status = ?
+        INSERT INTO problem_statuses (user_id, problem_id, status)
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id, problem_id)
+        DO UPDATE SET status = excluded.status
         ''',
-        (user_id, problem_name, source, year, status, status)
+        [(user_id, problem_id, status) for problem_id in problem_ids]
     )
+    record_progress_changes(db, user_id, problem_ids)
     db.commit()
-    db.close()
     return jsonify(success=True)
 
 @app.route('/api/update-problem-score', methods=['POST'])
@@ -391,17 +323,20 @@ def update_problem_score():
         return jsonify({"error": "Missing required fields"}), 400
 
     db = get_db()
-    db.execute(
+    problem_ids = problem_ids_for(db, problem_name, source, year)
+    if not problem_ids:
+        return jsonify({"error": "Unknown problem"}), 404
+    db.executemany(
         '''
-        INSERT INTO problem_statuses (user_id, problem_name, source, year, score)
-        VALUES (?, ?, ?, ?, ?)
-        ON CONFLICT(user_id, problem_name, source, year)
-        DO UPDATE SET score = ?
+        INSERT INTO problem_statuses (user_id, problem_id, score)
+        VALUES (?, ?, ?)
+        ON CONFLICT(user_id, problem_id)
+        DO UPDATE SET score = excluded.score
         ''',
-        (user_id, problem_name, source, year, score, score)
+        [(user_id, problem_id, score) for problem_id in problem_ids]
     )
+    record_progress_changes(db, user_id, problem_ids)
     db.commit()
-    db.close()
     return jsonify(success=True)
 
 # --- POST /api/user-settings: make platform_pref optional like others ---
@@ -482,6 +417,10 @@ def upd_user_settings():
         )
     )
 
+    # platform_pref decides which link /api/problems and /api/user return
+    if has_pref:
+        bump_progress_version(db, user_id)
+
     db.commit()
     return jsonify(success=True)
 
@@ -494,7 +433,6 @@ def gget_user_settings():
     db = get_db()
     user = db.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
     if not user:
-        db.close()
         return jsonify({"error": f"User '{username}' not found"}), 404
 
     user_id = user['id']
@@ -502,7 +440,6 @@ def gget_user_settings():
         "SELECT olympiad_order, hidden, asc_sort, platform_pref, platform_usernames FROM user_settings WHERE user_id = ?",
         (user_id,)
     ).fetchone()
-    db.close()
 
     olympiad_order = hidden = platform_pref = None
     platform_usernames = None
@@ -564,6 +501,8 @@ def api_demo_login():
     elif existing_session["user_id"] != demo_user_id:
         # Update session to point to correct demo user
         db.execute("UPDATE sessions SET user_id = ? WHERE session_id = ?", (demo_user_id, demo_session_id))
+        session_cache.invalidate(demo_session_id)
+        bump_session_revocations(db)
     
     db.commit()
     
@@ -2,6 +2,7 @@ import hashlib
 from flask import request, jsonify
 import uuid
 from database.db import get_db
+from auth.session import revoke_sessions
 
 def api_register():
     data = request.get_json()
@@ -75,8 +76,8 @@ def api_logout():
             (local_storage_data, request.user_id)
         )
 
-    # Delete session
-    db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+    # Delete session (and drop it from every worker's session cache)
+    revoke_sessions(db, session_id=session_id)
     db.commit()
 
     return jsonify({"success": True, "message": "Logged out successfully."})
\ No newline at end of file
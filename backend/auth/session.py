@@ -1,7 +1,126 @@
+import os
+import time
+import threading
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify
 from database.db import get_db
 
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "4096"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))    # seconds a cached token is trusted
+SESSION_CACHE_POLL = float(os.getenv("SESSION_CACHE_POLL", "2"))   # seconds between revocation checks
+
+class SessionCache:
+    """
+    Bounded LRU + TTL cache of session_id -> user_id in front of the
+    sessions table.
+
+    Revocations in this process invalidate entries directly. Revocations in
+    other worker processes bump the shared session_revocations counter; the
+    cache polls it at most every `poll_interval` seconds and drops everything
+    when it has moved.
+    """
+
+    def __init__(self, maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL, poll_interval=SESSION_CACHE_POLL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self._entries = OrderedDict()  # session_id -> (user_id, expires_at)
+        self._lock = threading.Lock()
+        self._revocation_counter = None
+        self._last_poll = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.remote_flushes = 0
+
+    def _poll_revocations(self, db):
+        now = time.monotonic()
+        if now - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = now
+        row = db.execute("SELECT counter FROM session_revocations WHERE id = 1").fetchone()
+        counter = row["counter"] if row else 0
+        with self._lock:
+            if self._revocation_counter is not None and counter != self._revocation_counter:
+                self._entries.clear()
+                self.remote_flushes += 1
+            self._revocation_counter = counter
+
+    def get(self, session_id, db):
+        self._poll_revocations(db)
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                user_id, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(session_id)
+                    self.hits += 1
+                    return user_id
+                del self._entries[session_id]
+                self.expirations += 1
+            self.misses += 1
+        return None
+
+    def put(self, session_id, user_id):
+        with self._lock:
+            self._entries[session_id] = (user_id, time.monotonic() + self.ttl)
+            self._entries.move_to_end(session_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, session_id):
+        with self._lock:
+            if self._entries.pop(session_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            stale = [sid for sid, (uid, _) in self._entries.items() if uid == user_id]
+            for sid in stale:
+                del self._entries[sid]
+            self.invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "remote_flushes": self.remote_flushes,
+            }
+
+session_cache = SessionCache()
+
+def revoke_sessions(db, session_id=None, user_id=None):
+    """
+    Delete a session (or all sessions of a user) and tell every worker
+    process to drop its cached copy. The caller commits.
+    """
+    if session_id is not None:
+        db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        session_cache.invalidate(session_id)
+    if user_id is not None:
+        db.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        session_cache.invalidate_user(user_id)
+    bump_session_revocations(db)
+
+def bump_session_revocations(db):
+    db.execute("UPDATE session_revocations SET counter = counter + 1 WHERE id = 1")
+
+def session_cache_stats():
+    return session_cache.stats()
+
 def session_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -9,13 +128,17 @@ def session_required(f):
         if not auth or not auth.startswith("Bearer "):
             return jsonify({"error": "Token is missing"}), 403
         session_id = auth.split(" ", 1)[1]
-        with get_db() as db:
+        db = get_db()
+        user_id = session_cache.get(session_id, db)
+        if user_id is None:
             row = db.execute(
                 "SELECT user_id FROM sessions WHERE session_id = ?",
                 (session_id,)
             ).fetchone()
-        if not row:
-            return jsonify({"error": "Invalid or expired session"}), 401
-        request.user_id = row["user_id"]
+            if not row:
+                return jsonify({"error": "Invalid or expired session"}), 401
+            user_id = row["user_id"]
+            session_cache.put(session_id, user_id)
+        request.user_id = user_id
         return f(*args, **kwargs)
     return decorated_function
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark the best-subtask aggregation (scrape/aggregate.py).
+
+Generates a synthetic batch of submissions (random problems, times and
+ragged subtask scores, some without a breakdown or time), runs
+best_subtasks() over it with the NumPy and the pure-Python path, checks
+they agree and reports the median time of each.
+
+Usage:
+    python3 backend/bench/aggregate_bench.py [--submissions 100000] [--problems 2000] [--repeat 5]
+"""
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from scrape.aggregate import best_subtasks, HAVE_NUMPY
+
+def synthetic_batch(n, problems, seed):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    widths = [rng.randint(1, 12) for _ in range(problems)]
+    keys, times, subtasks, totals = [], [], [], []
+    for _ in range(n):
+        p = rng.randrange(problems)
+        t = start + timedelta(seconds=rng.randrange(365 * 86400))
+        if rng.random() < 0.1:
+            scores = []                     # no breakdown: counts as its total
+        else:
+            scores = [rng.choice([0, 0, rng.randint(1, 30), round(rng.random() * 30, 2)])
+                      for _ in range(widths[p])]
+        keys.append(p)
+        times.append(None if rng.random() < 0.01 else t.isoformat().replace("+00:00", "Z"))
+        subtasks.append(scores)
+        totals.append(sum(scores) if scores else rng.randint(0, 100))
+    return keys, times, subtasks, totals
+
+def timed(repeat, fn):
+    runs = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - t)
+    return statistics.median(runs), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark best-subtask aggregation")
+    parser.add_argument("--submissions", type=int, default=100_000)
+    parser.add_argument("--problems", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    batch = synthetic_batch(args.submissions, args.problems, args.seed)
+    print(f"{args.submissions} submissions over {args.problems} problems, median of {args.repeat} runs")
+
+    py_s, expected = timed(args.repeat, lambda: best_subtasks(*batch, use_numpy=False))
+    print(f"  python  {py_s * 1000:9.1f} ms")
+    if not HAVE_NUMPY:
+        print("  numpy   not installed")
+        return
+    np_s, result = timed(args.repeat, lambda: best_subtasks(*batch, use_numpy=True))
+    print(f"  numpy   {np_s * 1000:9.1f} ms   ({py_s / np_s:.1f}x)")
+    if result != expected:
+        bad = [k for k in expected if result.get(k) != expected[k]]
+        print(f"  MISMATCH on {len(bad)} problems, e.g. {bad[:5]}")
+        sys.exit(1)
+    print(f"  results match ({len(result)} problems)")
+
+if __name__ == "__main__":
+    main()
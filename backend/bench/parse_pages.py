@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark the scraper HTML parsing on saved pages.
+
+Every page is parsed with each installed tree builder (lxml, html.parser),
+once in full and once restricted to the parts the scraper reads, and the
+scraper's own extraction is run on both trees to check they agree.
+Reports the median parse time and the peak memory allocated while parsing.
+
+Pages are picked up by file name prefix:
+    qoj-list-*.html      qoj.ac submissions list page
+    qoj-detail-*.html    qoj.ac submission page
+    ojuz-list-*.html     oj.uz submissions list page
+    ojuz-detail-*.html   oj.uz submission page
+    ojuz-profile-*.html  oj.uz profile page
+
+Usage:
+    python3 backend/bench/parse_pages.py PAGES_DIR [--repeat 5]
+"""
+import sys
+import time
+import argparse
+import statistics
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from scrape import qoj, ojuz
+from scrape.parsing import parse_html, available_parsers
+
+# prefix -> (parts the scraper parses, extraction run on the tree)
+PAGE_KINDS = {
+    "qoj-list": (qoj._LIST_PARTS, lambda soup: (
+        qoj._parse_submissions_rows_for_page(soup, timedelta(0))[0],
+        round(qoj._parse_server_time_offset(soup).total_seconds() / 60),  # drifts with the clock
+    )),
+    "qoj-detail": (qoj._DETAIL_PARTS, qoj._parse_submission_details),
+    "ojuz-list": (ojuz._LIST_PARTS, ojuz._parse_ojuz_submission_rows),
+    "ojuz-detail": (ojuz._DETAIL_PARTS, ojuz._parse_ojuz_submission_details),
+    "ojuz-profile": (ojuz._PROFILE_PARTS, lambda soup: sorted({a['href'] for a in soup.find_all('a', href=True) if a['href'].startswith('/problem/view/')})),
+}
+
+def page_kind(path: Path):
+    for kind in sorted(PAGE_KINDS, key=len, reverse=True):
+        if path.name.startswith(kind + "-"):
+            return kind
+    return None
+
+def measure(html, parser, only, repeat):
+    """(median seconds, peak bytes, tree) for parsing html `repeat` times."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        soup = parse_html(html, only=only, parser=parser)
+        times.append(time.perf_counter() - start)
+        del soup
+    tracemalloc.start()
+    soup = parse_html(html, only=only, parser=parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak, soup
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scraper HTML parsing")
+    parser.add_argument("pages_dir", type=Path, help="directory of saved pages (see module docstring)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed parses per page and backend")
+    args = parser.parse_args()
+
+    pages = [(p, page_kind(p)) for p in sorted(args.pages_dir.glob("*.html"))]
+    pages = [(p, k) for p, k in pages if k]
+    if not pages:
+        print(f"No recognised pages in {args.pages_dir}")
+        sys.exit(1)
+
+    print(f"{'page':32} {'KiB':>6} {'parser':12} {'mode':8} {'ms':>8} {'peak KiB':>9}  same")
+    totals = {}
+    for path, kind in pages:
+        html = path.read_text(encoding="utf-8", errors="replace")
+        only, extract = PAGE_KINDS[kind]
+        reference = None
+        for name in available_parsers():
+            for mode, strainer in (("full", None), ("partial", only)):
+                seconds, peak, soup = measure(html, name, strainer, args.repeat)
+                result = extract(soup)
+                if reference is None:
+                    reference = result
+                same = "yes" if result == reference else "NO"
+                key = (name, mode)
+                t, m, n = totals.get(key, (0.0, 0, 0))
+                totals[key] = (t + seconds, m + peak, n + 1)
+                print(f"{path.name[:32]:32} {len(html) / 1024:6.0f} {name:12} {mode:8} "
+                      f"{seconds * 1000:8.2f} {peak / 1024:9.0f}  {same}")
+
+    print()
+    print(f"{'parser':12} {'mode':8} {'avg ms/page':>12} {'avg peak KiB':>13}")
+    for (name, mode), (t, m, n) in totals.items():
+        print(f"{name:12} {mode:8} {t / n * 1000:12.2f} {m / n / 1024:13.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark the platform syncs against recorded traffic (scrape/replay.py).
+
+Scenarios:
+    ojuz-vc    sync_ojuz_submissions for the scenario's contest window
+    qoj-vc     sync_qoj_submissions for the same window
+    ojuz-full  run_ojuz_full_sync (the job queued by update_ojuz_scores)
+    qoj-full   run_qoj_full_sync (the job queued by update_qoj_scores)
+
+`record` runs them live once and saves every response plus scenario.json
+into FIXTURES; `replay` runs them from FIXTURES with simulated latency and
+errors. Both work on a scratch copy of the database, and clear the user's
+sync cursors and submission cache before every run unless --warm is given.
+Reported per run: HTTP requests (and replay hits/misses/injected errors),
+wall time, CPU time and peak Python heap (tracemalloc).
+
+scenario.json:
+    {"user_id": 1, "ojuz_username": "...", "qoj_username": "...",
+     "contest": {"contest_name": "...", "contest_stage": null,
+                 "start_time": "2025-01-01T10:00:00Z", "end_time": "2025-01-01T15:00:00Z"}}
+
+Usage:
+    python3 backend/bench/sync_bench.py record FIXTURES --scenario scenario.json \\
+        --ojuz-cookie ... --qoj-cookie ...
+    python3 backend/bench/sync_bench.py replay FIXTURES [--latency 0.1] [--jitter 0.05] \\
+        [--error-rate 0.01] [--repeat 3] [--only qoj-vc qoj-full] [--no-rate-limit]
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import resource
+import tempfile
+import tracemalloc
+from pathlib import Path
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+# no background warm-up requests: fixtures only hold the syncs' own traffic
+os.environ.setdefault("SCRAPER_POOL_WARM", "0")
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+SCENARIOS = ["ojuz-vc", "qoj-vc", "ojuz-full", "qoj-full"]
+
+def scratch_database(source):
+    """Copy `source` (consistently, WAL included) to a temp file, migrate it, return its path."""
+    path = os.path.join(tempfile.mkdtemp(prefix="sync-bench-"), "bench.db")
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(path)
+    src.backup(dst)
+    src.close()
+    dst.isolation_level = None
+    from database.migrations import run_migrations
+    run_migrations(dst, verbose=False)
+    dst.close()
+    return path
+
+def prepare_user(db, scenario):
+    """Store the scenario's handles in the user's settings."""
+    user_id = scenario["user_id"]
+    row = db.execute("SELECT platform_usernames FROM user_settings WHERE user_id = ?", (user_id,)).fetchone()
+    usernames = json.loads(row["platform_usernames"] or "{}") if row else {}
+    if scenario.get("ojuz_username"):
+        usernames["oj.uz"] = scenario["ojuz_username"]
+    if scenario.get("qoj_username"):
+        usernames["qoj.ac"] = scenario["qoj_username"]
+    if row:
+        db.execute("UPDATE user_settings SET platform_usernames = ? WHERE user_id = ?", (json.dumps(usernames), user_id))
+    else:
+        db.execute("INSERT INTO user_settings (user_id, platform_usernames) VALUES (?, ?)", (user_id, json.dumps(usernames)))
+    db.commit()
+
+def reset_sync_state(db, user_id):
+    db.execute("DELETE FROM platform_sync_cursors WHERE user_id = ?", (user_id,))
+    db.execute("DELETE FROM platform_best_subtasks WHERE user_id = ?", (user_id,))
+    db.execute("DELETE FROM platform_submissions")
+    db.commit()
+
+def run_scenario(name, scenario, cookies):
+    from scrape import ojuz, qoj
+    contest = {**scenario.get("contest", {}), "user_id": scenario["user_id"]}
+    if name == "ojuz-vc":
+        return ojuz.sync_ojuz_submissions(contest, scenario["ojuz_username"])
+    if name == "qoj-vc":
+        return qoj.sync_qoj_submissions(contest, scenario["qoj_username"])
+    if name == "ojuz-full":
+        return ojuz.run_ojuz_full_sync(scenario["user_id"], cookies["oj.uz"])
+    if name == "qoj-full":
+        return qoj.run_qoj_full_sync(scenario["user_id"], cookies["qoj.ac"])
+    raise ValueError(name)
+
+def summarize(result):
+    if isinstance(result, list):
+        return f"{len(result)} problems"
+    if isinstance(result, dict):
+        return ", ".join(f"{k}={v}" for k, v in result.items() if not isinstance(v, (list, dict)))
+    return str(result)
+
+def measure(name, scenario, cookies, adapter=None):
+    from scrape.client import http_stats
+    requests_before = http_stats()["requests"]
+    replay_before = dict(adapter.stats) if adapter else {}
+    tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        outcome = summarize(run_scenario(name, scenario, cookies))
+    except Exception as e:
+        outcome = f"failed: {e}"
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    row = {
+        "scenario": name,
+        "requests": http_stats()["requests"] - requests_before,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "peak_mib": round(peak / 2**20, 1),
+        "result": outcome,
+    }
+    if adapter:
+        row.update({k: adapter.stats[k] - replay_before.get(k, 0) for k in adapter.stats})
+    return row
+
+def print_rows(rows):
+    cols = ["scenario", "run", "requests", "served", "missing", "injected_errors", "wall_s", "cpu_s", "peak_mib", "result"]
+    cols = [c for c in cols if any(c in r for r in rows)]
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in cols))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark platform syncs on recorded traffic")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("fixtures", type=Path, help="fixture directory")
+    parser.add_argument("--scenario", type=Path, help="scenario.json (record; replay reads FIXTURES/scenario.json)")
+    parser.add_argument("--db", default=os.getenv("DATABASE_PATH", "database.db"), help="database to copy")
+    parser.add_argument("--only", nargs="+", choices=SCENARIOS, help="scenarios to run")
+    parser.add_argument("--ojuz-cookie", default=os.getenv("BENCH_OJUZ_COOKIE"), help="oidc-auth cookie (record)")
+    parser.add_argument("--qoj-cookie", default=os.getenv("BENCH_QOJ_COOKIE"), help="UOJSESSID cookie (record)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per scenario (replay)")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to every replayed response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of replayed requests failing with 503")
+    parser.add_argument("--seed", type=int, default=1, help="seed for jitter and injected errors")
+    parser.add_argument("--no-rate-limit", action="store_true", help="skip the per-host token buckets when replaying")
+    parser.add_argument("--warm", action="store_true", help="keep sync cursors and the submission cache between runs")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        if not args.scenario:
+            parser.error("record needs --scenario")
+        args.fixtures.mkdir(parents=True, exist_ok=True)
+        shutil.copy(args.scenario, args.fixtures / "scenario.json")
+    scenario = json.loads((args.fixtures / "scenario.json").read_text())
+    names = [n for n in (args.only or SCENARIOS)
+             if (n.startswith("ojuz") and scenario.get("ojuz_username")) or (n.startswith("qoj") and scenario.get("qoj_username"))]
+    names = [n for n in names if not n.endswith("-vc") or scenario.get("contest")]
+
+    os.environ["DATABASE_PATH"] = scratch_database(args.db)
+    print(f"[bench] scratch database: {os.environ['DATABASE_PATH']}")
+
+    from database.db import get_db
+    from scrape.replay import install_recorder, install_replay
+    db = get_db()
+    prepare_user(db, scenario)
+
+    adapter = None
+    if args.mode == "record":
+        store = install_recorder(str(args.fixtures))
+        cookies = {"oj.uz": args.ojuz_cookie, "qoj.ac": args.qoj_cookie}
+        repeat = 1
+    else:
+        adapter = install_replay(str(args.fixtures), latency=args.latency, jitter=args.jitter,
+                                 error_rate=args.error_rate, seed=args.seed,
+                                 rate_limited=not args.no_rate_limit)
+        cookies = {"oj.uz": "replay", "qoj.ac": "replay"}
+        repeat = args.repeat
+
+    rows = []
+    for name in names:
+        for run in range(1, repeat + 1):
+            if adapter:
+                adapter.store.rewind()
+            if not args.warm or run == 1:
+                reset_sync_state(db, scenario["user_id"])
+            row = measure(name, scenario, cookies, adapter)
+            row["run"] = run
+            rows.append(row)
+
+    print()
+    print_rows(rows)
+    print(f"\nmax RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+    if args.mode == "record":
+        print(f"[bench] recorded {len(store)} responses into {args.fixtures}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import ast
+import os
+import time
+import threading
+from types import MappingProxyType
+
+# How often (seconds) a process re-reads catalog_version to notice a repopulate
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "5"))
+
+# Default order preference when the user has none (or none of theirs match)
+DEFAULT_LINK_ORDER = ("oj.uz", "qoj.ac")
+
+def normalize_platform_pref(platform_pref):
+    """Turn a stored platform_pref (list, list-like string or single name) into a tuple."""
+    if not platform_pref:
+        return ()
+    if isinstance(platform_pref, str):
+        try:
+            # Try to interpret it as a list-like string
+            parsed = ast.literal_eval(platform_pref)
+            if isinstance(parsed, list):
+                return tuple(parsed)
+            return (platform_pref,)
+        except (ValueError, SyntaxError):
+            return (platform_pref,)
+    return tuple(platform_pref)
+
+def choose_link(links, platform_pref=None):
+    """links is a list of {platform, url} dicts."""
+    if not links:
+        return None
+
+    for plat in normalize_platform_pref(platform_pref):
+        for l in links:
+            if l['platform'] == plat:
+                return l['url']
+
+    for plat in DEFAULT_LINK_ORDER:
+        for l in links:
+            if l['platform'] == plat:
+                return l['url']
+
+    return links[0]['url']
+
+class Problem:
+    __slots__ = ("id", "name", "source", "year", "number", "extra", "links", "fields")
+
+    def __init__(self, row, links):
+        self.id = row["id"]
+        self.name = row["name"]
+        self.source = row["source"]
+        self.year = row["year"]
+        self.number = row["number"]
+        self.extra = row["extra"]
+        self.links = links  # tuple of MappingProxyType({platform, url})
+        # public columns, in the shape /api/problems has always returned
+        self.fields = MappingProxyType({
+            "name": self.name,
+            "number": self.number,
+            "source": self.source,
+            "year": self.year,
+            "extra": self.extra,
+        })
+
+class Catalog:
+    """
+    Read-only snapshot of problems + problem_links for one catalog version.
+
+    by_source maps source -> year -> tuple of problems ordered by number, and
+    by_key maps (name, source, year) -> problem for validating user input.
+    ids_by_key maps the same key to the ids of every problem it names (a few
+    problems share a name within a source and year; progress sent by name
+    applies to all of them).
+    Chosen links are memoized per platform preference.
+    """
+
+    MAX_LINK_PREFS = 64
+
+    def __init__(self, version, problems):
+        self.version = version
+        self.problems = tuple(problems)
+        by_source = {}
+        for p in self.problems:
+            by_source.setdefault(p.source, {}).setdefault(p.year, []).append(p)
+        self.by_source = MappingProxyType({
+            source: MappingProxyType({year: tuple(ps) for year, ps in years.items()})
+            for source, years in by_source.items()
+        })
+        self.by_id = MappingProxyType({p.id: p for p in self.problems})
+        self.by_key = MappingProxyType({(p.name, p.source, p.year): p for p in self.problems})
+        ids_by_key = {}
+        for p in self.problems:
+            ids_by_key.setdefault((p.name, p.source, p.year), []).append(p.id)
+        self.ids_by_key = MappingProxyType({key: tuple(ids) for key, ids in ids_by_key.items()})
+        self._links_by_pref = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, db, version):
+        rows = db.execute(
+            'SELECT id, name, number, source, year, extra FROM problems ORDER BY source, year, COALESCE(number, 0)'
+        ).fetchall()
+        links = {}
+        for lr in db.execute('SELECT problem_id, platform, url FROM problem_links ORDER BY problem_id, platform, url'):
+            links.setdefault(lr['problem_id'], []).append(
+                MappingProxyType({'platform': lr['platform'], 'url': lr['url']})
+            )
+        return cls(version, (Problem(r, tuple(links.get(r['id'], ()))) for r in rows))
+
+    def chosen_links(self, platform_pref=None):
+        """problem id -> the URL choose_link() picks for this preference."""
+        key = normalize_platform_pref(platform_pref)
+        chosen = self._links_by_pref.get(key)
+        if chosen is None:
+            chosen = MappingProxyType({p.id: choose_link(p.links, key) for p in self.problems})
+            with self._lock:
+                if len(self._links_by_pref) >= self.MAX_LINK_PREFS:
+                    self._links_by_pref.clear()
+                self._links_by_pref[key] = chosen
+        return chosen
+
+    def group(self, sources, progress, platform_pref=None, all_links=False):
+        """
+        Build the {source: {year: [problem, ...]}} payload for the given
+        sources, merging in the user's progress {problem_id: row}.
+        """
+        chosen = None if all_links else self.chosen_links(platform_pref)
+        problems_by_category = {}
+        for source in dict.fromkeys(sources):
+            years = self.by_source.get(source)
+            if not years:
+                continue
+            out_years = problems_by_category.setdefault(source, {})
+            for year, problems in years.items():
+                out = out_years.setdefault(year, [])
+                for p in problems:
+                    problem = dict(p.fields)
+                    if all_links:
+                        problem['links'] = {l['platform']: l['url'] for l in p.links}
+                    else:
+                        problem['link'] = chosen[p.id]
+                    row = progress.get(p.id)
+                    if row is not None:
+                        problem['status'] = row['status']
+                        problem['score'] = row['score']
+                    else:
+                        problem['status'] = 0
+                        problem['score'] = 0
+                    out.append(problem)
+        return problems_by_category
+
+_catalog = None
+_checked_at = 0.0
+_catalog_lock = threading.Lock()
+
+def catalog_version(db):
+    row = db.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()
+    return row["version"] if row else 0
+
+def get_catalog(db):
+    """
+    Return the process-wide catalog, reloading it when the version stamp
+    written by populate_problems.py has moved (checked every
+    CATALOG_POLL_SECONDS).
+    """
+    global _catalog, _checked_at
+    now = time.monotonic()
+    if _catalog is not None and now - _checked_at < CATALOG_POLL_SECONDS:
+        return _catalog
+    version = catalog_version(db)
+    if _catalog is not None and _catalog.version == version:
+        _checked_at = now
+        return _catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            _catalog = Catalog.load(db, version)
+        _checked_at = now
+    return _catalog
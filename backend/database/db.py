@@ -1,11 +1,199 @@
 import os
+import queue
 import sqlite3
+import threading
+import time
+import weakref
+from flask import g, has_app_context
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Pool sizing / tuning (all overridable from .env)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))          # seconds to wait for a free connection
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))            # negative = KiB, as in PRAGMA cache_size
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection handed out by ConnectionPool.
+
+    Its lifetime is owned by the pool (request teardown or thread exit), so
+    close() from handler code is a no-op instead of breaking later get_db()
+    calls in the same request.
+    """
+
+    def close(self):
+        pass
+
+    def _really_close(self):
+        sqlite3.Connection.close(self)
+
+class ConnectionPool:
+    """
+    Bounded pool of tuned SQLite connections.
+
+    Request handlers check out one connection per request (see get_db) and
+    give it back on app-context teardown. Code running outside Flask (sync
+    worker threads, background jobs) gets one connection per thread that is
+    not counted against the pool size and is closed when the thread exits.
+    """
+
+    def __init__(self, db_path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0            # pooled connections currently open (idle + checked out)
+        self._thread_open = 0     # per-thread connections currently open
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._timeouts = 0
+        self._peak_in_use = 0
+        self._in_use = 0
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE}")
+        return conn
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._open < self.size:
+                    self._open += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._open -= 1
+                    raise
+            else:
+                started = time.monotonic()
+                with self._lock:
+                    self._waits += 1
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise RuntimeError(
+                        f"Timed out after {self.timeout}s waiting for a database connection "
+                        f"(pool size {self.size})"
+                    )
+                finally:
+                    with self._lock:
+                        self._wait_seconds += time.monotonic() - started
+
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    def release(self, conn):
+        try:
+            # Never hand an open transaction to the next request
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    def _discard(self, conn):
+        try:
+            conn._really_close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._in_use -= 1
+            self._open -= 1
+
+    def thread_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            with self._lock:
+                self._thread_open += 1
+                self._checkouts += 1
+            # thread-local storage is dropped when the thread exits; close with it
+            weakref.finalize(conn, self._thread_closed)
+            self._local.conn = conn
+        return conn
+
+    def _thread_closed(self):
+        with self._lock:
+            self._thread_open -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+                "in_use": self._in_use,
+                "peak_in_use": self._peak_in_use,
+                "thread_connections": self._thread_open,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_seconds": round(self._wait_seconds, 4),
+                "timeouts": self._timeouts,
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(os.getenv("DATABASE_PATH", "database.db"))
+    return _pool
+
 def get_db():
-    db_path = os.getenv("DATABASE_PATH", "database.db")
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
\ No newline at end of file
+    """
+    Return the connection for the current request (checked out once, released
+    on teardown) or, outside an app context, the calling thread's connection.
+    """
+    if has_app_context():
+        if "db" not in g:
+            g.db = get_pool().acquire()
+        return g.db
+    return get_pool().thread_connection()
+
+def close_db(e=None):
+    db = g.pop("db", None)
+    if db is not None:
+        get_pool().release(db)
+
+def pool_stats():
+    return get_pool().stats()
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
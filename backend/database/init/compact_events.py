@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Drop problem_status_events older than PROGRESS_EVENTS_KEEP_DAYS (default 30).
+Clients whose delta-sync version predates the cut are told to refetch.
+Finished background jobs and their progress events age out the same way.
+"""
+import os
+import sys
+import sqlite3
+from pathlib import Path
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from progress.progress import compact_progress_events
+from jobs.jobs import prune_jobs
+
+keep_days = int(os.getenv("PROGRESS_EVENTS_KEEP_DAYS", "30"))
+db_path = os.getenv("DATABASE_PATH", "database.db")
+conn = sqlite3.connect(db_path)
+conn.row_factory = sqlite3.Row
+
+try:
+    deleted = compact_progress_events(conn, keep_days)
+    pruned = prune_jobs(conn, keep_days)
+    conn.commit()
+finally:
+    conn.close()
+
+print(f"[compact] deleted {deleted} progress events older than {keep_days} days")
+print(f"[compact] deleted {pruned} finished jobs older than {keep_days} days")
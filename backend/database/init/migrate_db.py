@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Apply pending schema migrations (database/migrations.py) and verify that the
+hot-path queries use their indexes.
+
+Usage:
+    python3 backend/database/init/migrate_db.py          # migrate + check plans
+    python3 backend/database/init/migrate_db.py --check  # only check plans
+"""
+import os
+import sys
+import sqlite3
+import argparse
+from pathlib import Path
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from database.migrations import run_migrations, check_query_plans, current_version
+
+parser = argparse.ArgumentParser(description="Run schema migrations")
+parser.add_argument("--check", action="store_true", help="only run the EXPLAIN QUERY PLAN checks")
+args = parser.parse_args()
+
+db_path = os.getenv("DATABASE_PATH", "database.db")
+conn = sqlite3.connect(db_path)
+# Manual transactions (the runner issues BEGIN IMMEDIATE itself)
+conn.isolation_level = None
+
+try:
+    if not args.check:
+        applied = run_migrations(conn)
+        if not applied:
+            print("[migrate] schema already up to date")
+    print(f"[migrate] schema version: {current_version(conn)}")
+
+    failed = 0
+    for res in check_query_plans(conn):
+        mark = "✔" if res["ok"] else "✘"
+        print(f"{mark} [{res['version']:03d}] {res['label']} -> {res['index']}")
+        if not res["ok"]:
+            failed += 1
+            for detail in res["plan"]:
+                print(f"      {detail}")
+finally:
+    conn.close()
+
+if failed:
+    print(f"[migrate] {failed} query plan check(s) did not use the expected index")
+    sys.exit(1)
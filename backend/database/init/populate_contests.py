@@ -15,6 +15,9 @@ if not backend_dir_env:
     raise RuntimeError("BACKEND_DIR not set in environment variables")
 
 BACKEND_DIR = Path(backend_dir_env).resolve()
+sys.path.insert(0, str(BACKEND_DIR))
+
+from database.migrations import contest_slug
 
 CONTESTS_DIR = BACKEND_DIR / "data" / "contests"
 COMPILE_TO_JSON = CONTESTS_DIR / "compile_to_json.py"
@@ -92,8 +95,8 @@ try:
                 """
                 INSERT INTO contests (
                     name, stage, location, duration_minutes, source, year,
-                    date, website, link, notes
-                ) VALUES (?, NULL, ?, ?, ?, ?, ?, ?, ?, ?)
+                    date, website, link, notes, slug
+                ) VALUES (?, NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(name) WHERE stage IS NULL DO UPDATE SET
                     location         = excluded.location,
                     duration_minutes = excluded.duration_minutes,
@@ -102,7 +105,8 @@ try:
                     date             = excluded.date,
                     website          = excluded.website,
                     link             = excluded.link,
-                    notes            = excluded.notes
+                    notes            = excluded.notes,
+                    slug             = excluded.slug
                 """,
                 (
                     name,
@@ -114,6 +118,7 @@ try:
                     contest.get("website"),
                     contest.get("link"),
                     contest.get("notes"),
+                    contest_slug(name, stage),
                 ),
             )
         else:
@@ -121,8 +126,8 @@ try:
                 """
                 INSERT INTO contests (
                     name, stage, location, duration_minutes, source, year,
-                    date, website, link, notes
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    date, website, link, notes, slug
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ON CONFLICT(name, stage) DO UPDATE SET
                     location         = excluded.location,
                     duration_minutes = excluded.duration_minutes,
@@ -131,7 +136,8 @@ try:
                     date             = excluded.date,
                     website          = excluded.website,
                     link             = excluded.link,
-                    notes            = excluded.notes
+                    notes            = excluded.notes,
+                    slug             = excluded.slug
                 """,
                 (
                     name,
@@ -144,6 +150,7 @@ try:
                     contest.get("website"),
                     contest.get("link"),
                     contest.get("notes"),
+                    contest_slug(name, stage),
                 ),
             )
 
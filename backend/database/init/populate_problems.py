@@ -148,13 +148,27 @@ def normalize_extra(val) -> str | None:
     # Any non-string 'extra' is unexpected; treat as stringified
     return str(val)
 
-# Atomic wipe & repopulate
+def natural_key(source, year, number, extra, name):
+    """
+    What identifies a problem across runs: its (source, year, number, extra),
+    or for unnumbered problems its (source, year, extra, name).
+    """
+    if number is not None:
+        return (source, year, number, extra)
+    return (source, year, None, extra, name)
+
+# Atomic upsert: existing problems keep their ids, so progress, notes and
+# links keyed by problem id survive a repopulate.
 cur.execute("BEGIN;")
 try:
-    # WARNING: This deletes ALL problems. If other tables (e.g. contest_problems)
-    # reference problems with ON DELETE CASCADE, they will also be cleared.
-    cur.execute("DELETE FROM problems")
+    existing = cur.execute("SELECT id, name, number, source, year, extra FROM problems").fetchall()
+    by_key = {}
+    by_name = defaultdict(list)
+    for row in existing:
+        by_key[natural_key(row["source"], row["year"], row["number"], row["extra"], row["name"])] = row
+        by_name[(row["source"], row["year"], row["name"])].append(row)
 
+    incoming = []
     for p in problems:
         extra = normalize_extra(p.get("extra"))
 
@@ -169,28 +183,73 @@ try:
 
         yaml_files_by_dir[str(rel_path.parent)].add(rel_path.name)
 
-        links = normalize_links(p)
+        incoming.append({**p, "number": p.get("number"), "extra": extra})
 
-        if "number" in p:
-            cur.execute(
-                """
-                INSERT INTO problems (name, number, source, year, extra)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (p["name"], p["number"], p["source"], p["year"], extra),
-            )
-        else:
-            cur.execute(
-                """
-                INSERT INTO problems (name, source, year, extra)
-                VALUES (?, ?, ?, ?)
-                """,
-                (p["name"], p["source"], p["year"], extra),
-            )
-        problem_id = cur.lastrowid
+    # Match every YAML problem to the row it was stored as: the same key and
+    # name first, then the same name (renumbered or moved to another extra),
+    # then the same key (renamed). Whatever is left over is new.
+    claimed = {}        # problem id -> incoming problem
+    matchers = [
+        lambda p: [r for r in [by_key.get(natural_key(p["source"], p["year"], p["number"], p["extra"], p["name"]))]
+                   if r is not None and r["name"] == p["name"]],
+        lambda p: by_name[(p["source"], p["year"], p["name"])],
+        lambda p: [r for r in [by_key.get(natural_key(p["source"], p["year"], p["number"], p["extra"], p["name"]))]
+                   if r is not None],
+    ]
+    unmatched = incoming
+    for candidates in matchers:
+        left = []
+        for p in unmatched:
+            row = next((r for r in candidates(p) if r["id"] not in claimed), None)
+            if row is None:
+                left.append(p)
+            else:
+                claimed[row["id"]] = p
+        unmatched = left
+    new_problems = unmatched
 
-        # Insert problem_links (URLs already normalized to https)
-        for link in links:
+    # Problems gone from the YAML; their progress, notes and links cascade
+    stale = [(row["id"],) for row in existing if row["id"] not in claimed]
+    cur.executemany("DELETE FROM problems WHERE id = ?", stale)
+
+    # contest_problems reference problems by (source, year, number, extra): drop
+    # the rows of problems whose key changes (populate_contests rebuilds them),
+    # and park those problems on a NULL number so keys can be swapped freely
+    moved = [
+        row for row in existing
+        if row["id"] in claimed
+        and (row["number"], row["extra"]) != (claimed[row["id"]]["number"], claimed[row["id"]]["extra"])
+    ]
+    for row in moved:
+        cur.execute(
+            """
+            DELETE FROM contest_problems
+            WHERE problem_source = ? AND problem_year = ? AND problem_number IS ? AND problem_extra IS ?
+            """,
+            (row["source"], row["year"], row["number"], row["extra"]),
+        )
+        cur.execute("UPDATE problems SET number = NULL WHERE id = ?", (row["id"],))
+
+    for problem_id, p in claimed.items():
+        cur.execute(
+            "UPDATE problems SET name = ?, number = ?, source = ?, year = ?, extra = ? WHERE id = ?",
+            (p["name"], p["number"], p["source"], p["year"], p["extra"], problem_id),
+        )
+    targets = list(claimed.items())
+    for p in new_problems:
+        cur.execute(
+            """
+            INSERT INTO problems (name, number, source, year, extra)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (p["name"], p["number"], p["source"], p["year"], p["extra"]),
+        )
+        targets.append((cur.lastrowid, p))
+
+    # Replace each problem's links (URLs normalized to https)
+    for problem_id, p in targets:
+        cur.execute("DELETE FROM problem_links WHERE problem_id = ?", (problem_id,))
+        for link in normalize_links(p):
             plat = link.get("platform")
             url = link.get("url")
             if not url:
@@ -203,7 +262,11 @@ try:
                 (problem_id, plat, url),
             )
 
+    # Tell running backends (catalog/catalog.py) to reload their in-memory catalog
+    cur.execute("UPDATE catalog_version SET version = version + 1 WHERE id = 1")
+
     conn.commit()
+    print(f"Problems: {len(claimed)} kept, {len(new_problems)} added, {len(stale)} removed.")
 except Exception:
     conn.rollback()
     raise
@@ -0,0 +1,846 @@
+"""
+Numbered schema migrations on top of database/init/init_db.py.
+
+Every migration is applied at most once, inside its own transaction, and is
+recorded in `schema_version`. Statements must be idempotent (IF NOT EXISTS
+etc.) so that a database that was patched by hand still migrates cleanly.
+Steps that SQLite has no IF NOT EXISTS form for (ADD COLUMN, data copies)
+are written as callables taking the connection.
+
+Each migration also ships `plan_checks`: queries copied from the app/scrapers
+together with the index EXPLAIN QUERY PLAN must report for them. They are
+run by database/init/migrate_db.py after migrating (and on --check). A
+check reusing the label of an earlier one replaces it (the query changed).
+"""
+import re
+
+def add_column(table, column, decl):
+    """Idempotent ALTER TABLE ... ADD COLUMN step."""
+    def step(conn):
+        cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if column not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return step
+
+def contest_slug(name, stage):
+    """URL key of a contest: name + stage, lowercased, whitespace removed (as the frontend builds it)."""
+    return re.sub(r"\s+", "", name + (stage or "")).lower()
+
+def _backfill_contest_slugs(conn):
+    rows = conn.execute("SELECT rowid, name, stage FROM contests WHERE slug IS NULL").fetchall()
+    conn.executemany(
+        "UPDATE contests SET slug = ? WHERE rowid = ?",
+        [(contest_slug(name, stage), rowid) for rowid, name, stage in rows],
+    )
+
+# tables that reference a contest by (contest_name, contest_stage)
+CONTEST_CHILD_TABLES = [
+    "contest_problems", "contest_scores", "user_virtual_contests",
+    "active_virtual_contests", "user_virtual_submissions",
+]
+
+def _contests_id_as_rowid(conn):
+    """
+    Rebuild contests with id as an AUTOINCREMENT rowid alias (ids are never
+    reused) and (name, stage) as a UNIQUE key, which the child tables'
+    foreign keys keep referencing. Needs foreign_keys off (run_migrations).
+    """
+    cols = conn.execute("PRAGMA table_info(contests)").fetchall()
+    if any(col[1] == "id" and col[5] for col in cols):
+        return
+    names = "name, stage, location, duration_minutes, source, year, date, website, link, notes, slug"
+    conn.execute("""
+        CREATE TABLE contests_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            stage TEXT,
+            location TEXT,
+            duration_minutes INTEGER,
+            source TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            date DATE,
+            website TEXT,
+            link TEXT,
+            notes TEXT,
+            slug TEXT,
+            UNIQUE(name, stage),
+            CHECK (stage IS NULL OR TRIM(stage) <> '')
+        )
+    """)
+    conn.execute(f"INSERT INTO contests_new (id, {names}) SELECT id, {names} FROM contests ORDER BY id")
+    conn.execute("DROP TABLE contests")
+    # the child tables' contest_id triggers name contests, which is gone until
+    # the rename; legacy mode skips re-checking them (they resolve again after)
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    conn.execute("ALTER TABLE contests_new RENAME TO contests")
+    conn.execute("PRAGMA legacy_alter_table = OFF")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_contests_name_nullstage ON contests(name) WHERE stage IS NULL")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS uq_contests_slug ON contests(slug)")
+
+def _contest_id_steps():
+    """contest_id on every child table: column, backfill, and a trigger filling it for writers that only set name/stage."""
+    steps = []
+    for table in CONTEST_CHILD_TABLES:
+        steps += [
+            add_column(table, "contest_id", "INTEGER"),
+            f"""
+            UPDATE {table}
+            SET contest_id = (SELECT c.id FROM contests c WHERE c.name = contest_name AND c.stage IS contest_stage)
+            WHERE contest_id IS NULL
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_contest_id
+            AFTER INSERT ON {table} WHEN NEW.contest_id IS NULL
+            BEGIN
+                UPDATE {table}
+                SET contest_id = (SELECT id FROM contests WHERE name = NEW.contest_name AND stage IS NEW.contest_stage)
+                WHERE rowid = NEW.rowid;
+            END
+            """,
+        ]
+    return steps
+
+def _rekey_by_problem_id(table, columns):
+    """
+    Rebuild `table` from (user_id, problem_name, source, year, ...) to a
+    WITHOUT ROWID (user_id, problem_id, ...) table. A row whose name/source/year
+    matches several catalog problems is copied to each of them (they all
+    showed it before); rows matching none are kept in <table>_unmatched.
+    """
+    def step(conn):
+        cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if "problem_id" in cols:
+            return
+        names = ", ".join(name for name, _ in columns)
+        conn.execute(f"""
+            CREATE TABLE {table}_new (
+                user_id INTEGER NOT NULL,
+                problem_id INTEGER NOT NULL,
+                {", ".join(f"{name} {decl}" for name, decl in columns)},
+                PRIMARY KEY (user_id, problem_id),
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+                FOREIGN KEY(problem_id) REFERENCES problems(id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"""
+            INSERT INTO {table}_new (user_id, problem_id, {names})
+            SELECT t.user_id, p.id, {", ".join(f"t.{name}" for name, _ in columns)}
+            FROM {table} t
+            JOIN problems p ON p.name = t.problem_name AND p.source = t.source AND p.year = t.year
+            WHERE t.user_id IS NOT NULL
+        """)
+        unmatched = f"""
+            FROM {table} t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM problems p
+                WHERE p.name = t.problem_name AND p.source = t.source AND p.year = t.year
+            )
+        """
+        if conn.execute(f"SELECT 1 {unmatched} LIMIT 1").fetchone():
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table}_unmatched AS SELECT t.* {unmatched}")
+        conn.execute(f"DROP TABLE {table}")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    return step
+
+MIGRATIONS = [
+    {
+        "version": 1,
+        "name": "covering index for per-user progress by source",
+        "sql": [
+            """
+            CREATE INDEX IF NOT EXISTS idx_problem_statuses_user_source
+            ON problem_statuses(user_id, source, problem_name, year, status, score)
+            """,
+        ],
+        "plan_checks": [
+            (
+                "app.get_problems / get_user: progress rows",
+                """
+                SELECT problem_name, source, year, status, score
+                FROM problem_statuses
+                WHERE user_id = ? AND source IN (?, ?, ?)
+                """,
+                (1, "IOI", "APIO", "BOI"),
+                "idx_problem_statuses_user_source",
+            ),
+            (
+                "app.get_problems / get_user: problems by source",
+                """
+                SELECT *, COALESCE(number, 0) as number FROM problems
+                WHERE source IN (?, ?, ?) ORDER BY source, year, number
+                """,
+                ("IOI", "APIO", "BOI"),
+                "sqlite_autoindex_problems_1",
+            ),
+            (
+                "app.get_problems / get_user: links for the listed problems",
+                "SELECT problem_id, platform, url FROM problem_links WHERE problem_id IN (?, ?, ?)",
+                (1, 2, 3),
+                # UNIQUE(problem_id, platform, url) already covers (problem_id, platform)
+                "sqlite_autoindex_problem_links_1",
+            ),
+            (
+                "ojuz/qoj full sync: problems with a platform link",
+                """
+                SELECT p.id, p.name, p.source, p.year, COALESCE(p.number, 0) AS number, pl.url
+                FROM problems p
+                JOIN problem_links pl ON pl.problem_id = p.id
+                WHERE p.source IN (?, ?, ?) AND pl.platform = ?
+                """,
+                ("IOI", "APIO", "BOI", "oj.uz"),
+                "sqlite_autoindex_problem_links_1",
+            ),
+        ],
+    },
+    {
+        "version": 2,
+        "name": "index virtual contest submissions by user/contest/time",
+        "sql": [
+            """
+            CREATE INDEX IF NOT EXISTS idx_user_virtual_submissions_contest
+            ON user_virtual_submissions(user_id, contest_name, contest_stage, submission_time)
+            """,
+        ],
+        "plan_checks": [
+            (
+                "vc.get_virtual_contest_detail: submissions in the contest window",
+                """
+                SELECT submission_time, problem_index, score, subtask_scores
+                FROM user_virtual_submissions
+                WHERE user_id = ?
+                  AND contest_name = ?
+                  AND ((contest_stage = ?) OR (contest_stage IS NULL AND ? IS NULL))
+                  AND submission_time >= ?
+                  AND submission_time <= ?
+                ORDER BY submission_time ASC
+                """,
+                (1, "IOI 2024", "Day 1", "Day 1", "2025-01-01", "2025-01-02"),
+                "idx_user_virtual_submissions_contest",
+            ),
+        ],
+    },
+    {
+        "version": 3,
+        "name": "index sessions by user",
+        "sql": [
+            "CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions(user_id)",
+        ],
+        "plan_checks": [
+            (
+                "sessions of a user (logout-all, ON DELETE CASCADE from users)",
+                "DELETE FROM sessions WHERE user_id = ?",
+                (1,),
+                "idx_sessions_user",
+            ),
+        ],
+    },
+    {
+        "version": 4,
+        "name": "session revocation counter for cross-process cache invalidation",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS session_revocations (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                counter INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            "INSERT OR IGNORE INTO session_revocations (id, counter) VALUES (1, 0)",
+        ],
+        "plan_checks": [],
+    },
+    {
+        "version": 5,
+        "name": "catalog version stamp bumped by populate_problems.py",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS catalog_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL DEFAULT 0
+            )
+            """,
+            "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)",
+        ],
+        "plan_checks": [],
+    },
+    {
+        "version": 6,
+        "name": "per-user progress version for ETags",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS user_progress_versions (
+                user_id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """,
+        ],
+        "plan_checks": [],
+    },
+    {
+        "version": 7,
+        "name": "append-only problem status event log for delta sync",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS problem_status_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                version INTEGER NOT NULL,
+                problem_name TEXT NOT NULL,
+                source TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                status INTEGER,
+                score REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_problem_status_events_user_version
+            ON problem_status_events(user_id, version)
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_problem_status_events_created
+            ON problem_status_events(created_at)
+            """,
+            # events at or below this version have been compacted away
+            add_column("user_progress_versions", "compacted_through", "INTEGER NOT NULL DEFAULT 0"),
+        ],
+        "plan_checks": [
+            (
+                "progress.get_problem_changes: events since a version",
+                """
+                SELECT problem_name, source, year, status, score, version
+                FROM problem_status_events
+                WHERE user_id = ? AND version > ?
+                ORDER BY version
+                """,
+                (1, 10),
+                "idx_problem_status_events_user_version",
+            ),
+            (
+                "progress.compact_progress_events: events older than the cutoff",
+                "DELETE FROM problem_status_events WHERE created_at < ?",
+                ("2025-01-01",),
+                "idx_problem_status_events_created",
+            ),
+        ],
+    },
+    {
+        "version": 8,
+        "name": "job queue for background platform syncs",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                user_id INTEGER,
+                payload TEXT NOT NULL DEFAULT '{}',
+                status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed')),
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 3,
+                run_after REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_jobs_status_run_after ON jobs(status, run_after)",
+            "CREATE INDEX IF NOT EXISTS idx_jobs_user_kind ON jobs(user_id, kind, status)",
+        ],
+        "plan_checks": [
+            (
+                "jobs.lease_job: next runnable job",
+                """
+                SELECT id FROM jobs
+                WHERE status = 'queued' AND run_after <= ?
+                ORDER BY run_after, id
+                LIMIT 1
+                """,
+                (0.0,),
+                "idx_jobs_status_run_after",
+            ),
+            (
+                "jobs.enqueue_job: existing job of the same kind",
+                """
+                SELECT id FROM jobs
+                WHERE user_id = ? AND kind = ? AND status IN ('queued', 'running')
+                ORDER BY id DESC LIMIT 1
+                """,
+                (1, "ojuz_full_sync"),
+                "idx_jobs_user_kind",
+            ),
+        ],
+    },
+    {
+        "version": 9,
+        "name": "job progress events for the SSE stream",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS job_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id INTEGER NOT NULL,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL DEFAULT '{}',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events(job_id, id)",
+        ],
+        "plan_checks": [
+            (
+                "jobs.stream_job_events: events after the last one sent",
+                "SELECT id, event, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+                (1, 0),
+                "idx_job_events_job",
+            ),
+        ],
+    },
+    {
+        "version": 10,
+        "name": "shared per-host rate limit buckets (RATE_LIMIT_SHARED=1)",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                host TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+            """,
+        ],
+        "plan_checks": [],
+    },
+    {
+        "version": 11,
+        "name": "incremental full-sync cursors and stored best subtasks",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS platform_sync_cursors (
+                user_id INTEGER NOT NULL,
+                platform TEXT NOT NULL,
+                username TEXT NOT NULL,
+                problems_key TEXT NOT NULL,
+                last_submission_id INTEGER NOT NULL,
+                last_submission_time TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (user_id, platform),
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS platform_best_subtasks (
+                user_id INTEGER NOT NULL,
+                platform TEXT NOT NULL,
+                problem_ref TEXT NOT NULL,
+                total_score REAL NOT NULL DEFAULT 0,
+                subtask_scores TEXT NOT NULL DEFAULT '[]',
+                earliest_improvement_time TEXT,
+                PRIMARY KEY (user_id, platform, problem_ref),
+                FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+            )
+            """,
+        ],
+        "plan_checks": [
+            (
+                "scrape.cursor.load_best: stored best subtasks of a user",
+                """
+                SELECT problem_ref, total_score, subtask_scores, earliest_improvement_time
+                FROM platform_best_subtasks WHERE user_id = ? AND platform = ?
+                """,
+                (1, "qoj.ac"),
+                "sqlite_autoindex_platform_best_subtasks_1",
+            ),
+        ],
+    },
+    {
+        "version": 12,
+        "name": "cache of judged platform submission details",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS platform_submissions (
+                platform TEXT NOT NULL,
+                submission_id INTEGER NOT NULL,
+                problem_ref TEXT,
+                submission_time TEXT,
+                total_score REAL NOT NULL,
+                subtask_scores TEXT NOT NULL,
+                fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (platform, submission_id)
+            )
+            """,
+        ],
+        "plan_checks": [
+            (
+                "scrape.submissions.load_cached: cached details by id",
+                """
+                SELECT submission_id, problem_ref, total_score, subtask_scores
+                FROM platform_submissions
+                WHERE platform = ? AND submission_id IN (?, ?, ?)
+                """,
+                ("qoj.ac", 1, 2, 3),
+                "sqlite_autoindex_platform_submissions_1",
+            ),
+        ],
+    },
+    {
+        "version": 13,
+        "name": "cross-process lease for scraper bot logins",
+        "sql": [
+            """
+            CREATE TABLE IF NOT EXISTS scraper_auth_locks (
+                platform TEXT PRIMARY KEY,
+                holder TEXT NOT NULL,
+                expires REAL NOT NULL
+            )
+            """,
+        ],
+        "plan_checks": [],
+    },
+    {
+        "version": 14,
+        "name": "live virtual contest sync: submission ids and last poll time",
+        "sql": [
+            add_column("user_virtual_submissions", "platform", "TEXT"),
+            add_column("user_virtual_submissions", "submission_id", "INTEGER"),
+            add_column("active_virtual_contests", "live_synced_at", "TEXT"),
+            # repeated polls of one contest window replace rows instead of adding them
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_user_virtual_submissions_platform_id
+            ON user_virtual_submissions(user_id, contest_name, COALESCE(contest_stage, ''), platform, submission_id)
+            """,
+        ],
+        "plan_checks": [],
+    },
+    {
+        "version": 15,
+        "name": "contest slugs for virtual contest detail lookups",
+        "sql": [
+            add_column("contests", "slug", "TEXT"),
+            _backfill_contest_slugs,
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_contests_slug ON contests(slug)",
+            add_column("user_virtual_contests", "slug", "TEXT"),
+            """
+            UPDATE user_virtual_contests
+            SET slug = (SELECT c.slug FROM contests c WHERE c.name = contest_name AND c.stage IS contest_stage)
+            WHERE slug IS NULL
+            """,
+            # not unique: a contest without a stage can be done more than once (NULL in the primary key)
+            """
+            CREATE INDEX IF NOT EXISTS idx_user_virtual_contests_slug
+            ON user_virtual_contests(user_id, slug, started_at)
+            """,
+        ],
+        "plan_checks": [
+            (
+                "vc.get_virtual_contest_detail: contest by slug",
+                """
+                SELECT v.contest_name, v.contest_stage, c.source, v.started_at, v.ended_at
+                FROM user_virtual_contests v
+                JOIN contests c ON c.name = v.contest_name AND c.stage IS v.contest_stage
+                WHERE v.user_id = ? AND v.slug = ?
+                ORDER BY v.started_at DESC
+                LIMIT 1
+                """,
+                (1, "ioi2024day1"),
+                "idx_user_virtual_contests_slug",
+            ),
+            (
+                "vc.get_virtual_contest_detail: submissions in the contest window",
+                """
+                SELECT submission_time, problem_index, score, subtask_scores
+                FROM user_virtual_submissions
+                WHERE user_id = ? AND contest_name = ? AND contest_stage IS ?
+                  AND submission_time >= ? AND submission_time <= ?
+                ORDER BY submission_time ASC
+                """,
+                (1, "IOI 2024", "Day 1", "2025-01-01", "2025-01-02"),
+                "idx_user_virtual_submissions_contest",
+            ),
+        ],
+    },
+    {
+        "version": 16,
+        "name": "integer contest ids referenced by contest child tables",
+        "sql": [
+            add_column("contests", "id", "INTEGER"),
+            "UPDATE contests SET id = rowid WHERE id IS NULL",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_contests_id ON contests(id)",
+            # populate_contests.py inserts by name/stage; new contests get the next id
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_contests_id
+            AFTER INSERT ON contests WHEN NEW.id IS NULL
+            BEGIN
+                UPDATE contests SET id = (SELECT COALESCE(MAX(id), 0) + 1 FROM contests) WHERE rowid = NEW.rowid;
+            END
+            """,
+            # the child tables keep their contest_name/contest_stage columns
+            # next to contest_id (filled by the triggers below for writers that
+            # only set those), so the old name/stage shape stays readable and
+            # writable as is and needs no compatibility views
+            *_contest_id_steps(),
+            "CREATE INDEX IF NOT EXISTS idx_contest_problems_contest ON contest_problems(contest_id, problem_index)",
+            "CREATE INDEX IF NOT EXISTS idx_contest_scores_contest ON contest_scores(contest_id)",
+            "CREATE INDEX IF NOT EXISTS idx_user_virtual_contests_contest ON user_virtual_contests(user_id, contest_id)",
+            """
+            CREATE INDEX IF NOT EXISTS idx_user_virtual_submissions_contest_id
+            ON user_virtual_submissions(user_id, contest_id, submission_time)
+            """,
+        ],
+        "plan_checks": [
+            (
+                "vc.get_virtual_contests: active contest with its contest row",
+                """
+                SELECT avc.contest_name, c.duration_minutes
+                FROM active_virtual_contests avc
+                JOIN contests c ON c.id = avc.contest_id
+                WHERE avc.user_id = ?
+                """,
+                (1,),
+                "uq_contests_id",
+            ),
+            (
+                "vc._sync_contest_window / confirm: problems of a contest",
+                "SELECT problem_index FROM contest_problems WHERE contest_id = ? ORDER BY problem_index",
+                (1,),
+                "idx_contest_problems_contest",
+            ),
+            (
+                "ojuz/qoj sync_*_submissions: contest problems with a platform link",
+                """
+                SELECT cp.problem_index, p.name, pl.url
+                FROM contest_problems cp
+                JOIN problems p ON cp.problem_source = p.source AND cp.problem_year = p.year AND cp.problem_number = p.number
+                JOIN problem_links pl ON p.id = pl.problem_id
+                WHERE cp.contest_id = ? AND pl.platform = ?
+                ORDER BY cp.problem_index
+                """,
+                (1, "oj.uz"),
+                "idx_contest_problems_contest",
+            ),
+            (
+                "vc.start_virtual_contest: already completed",
+                "SELECT 1 FROM user_virtual_contests WHERE user_id = ? AND contest_id = ?",
+                (1, 1),
+                "idx_user_virtual_contests_contest",
+            ),
+            (
+                "vc.get_virtual_contest_detail: submissions in the contest window",
+                """
+                SELECT submission_time, problem_index, score, subtask_scores
+                FROM user_virtual_submissions
+                WHERE user_id = ? AND contest_id = ? AND submission_time >= ? AND submission_time <= ?
+                ORDER BY submission_time ASC
+                """,
+                (1, 1, "2025-01-01", "2025-01-02"),
+                "idx_user_virtual_submissions_contest_id",
+            ),
+        ],
+    },
+    {
+        "version": 17,
+        "name": "user progress and notes keyed by integer problem id",
+        "sql": [
+            # the rekey joins progress and notes to problems on these
+            "CREATE INDEX IF NOT EXISTS idx_problems_source_year_name ON problems(source, year, name)",
+            _rekey_by_problem_id("problem_statuses", [
+                ("status", "INTEGER NOT NULL DEFAULT 0"),
+                ("score", "REAL NOT NULL DEFAULT 0"),
+            ]),
+            _rekey_by_problem_id("user_problem_notes", [
+                ("note", "TEXT NOT NULL DEFAULT ''"),
+                ("updated_at", "TIMESTAMP DEFAULT CURRENT_TIMESTAMP"),
+            ]),
+        ],
+        "plan_checks": [
+            (
+                "app.get_problems / get_user: progress rows",
+                """
+                SELECT ps.problem_id, ps.status, ps.score
+                FROM problem_statuses ps
+                JOIN problems p ON p.id = ps.problem_id
+                WHERE ps.user_id = ? AND p.source IN (?, ?, ?)
+                """,
+                (1, "IOI", "APIO", "BOI"),
+                "PRIMARY KEY",
+            ),
+            (
+                "progress.record_progress_changes: current row of a changed problem",
+                """
+                SELECT ps.user_id, p.name, p.source, p.year, ps.status, ps.score
+                FROM problem_statuses ps
+                JOIN problems p ON p.id = ps.problem_id
+                WHERE ps.user_id = ? AND ps.problem_id = ?
+                """,
+                (1, 1),
+                "PRIMARY KEY",
+            ),
+            (
+                "notes.get_note: note of a problem",
+                "SELECT note FROM user_problem_notes WHERE user_id = ? AND problem_id = ?",
+                (1, 1),
+                "PRIMARY KEY",
+            ),
+        ],
+    },
+    {
+        "version": 18,
+        "name": "sealed job credentials and one queued job per user and kind",
+        "sql": [
+            # plaintext cookies of jobs queued before payloads were sealed
+            """
+            UPDATE jobs
+            SET status = 'failed', error = 'Queued before credentials were encrypted; start the sync again',
+                lease_owner = NULL, lease_expires = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE status IN ('queued', 'running') AND json_extract(payload, '$.cookie') IS NOT NULL
+            """,
+            "UPDATE jobs SET payload = json_remove(payload, '$.cookie') WHERE json_extract(payload, '$.cookie') IS NOT NULL",
+            # keep the newest of any duplicate queued jobs
+            """
+            UPDATE jobs
+            SET status = 'failed', error = 'Superseded by a newer queued job', updated_at = CURRENT_TIMESTAMP
+            WHERE status = 'queued' AND user_id IS NOT NULL AND id < (
+                SELECT MAX(j.id) FROM jobs j
+                WHERE j.status = 'queued' AND j.user_id = jobs.user_id AND j.kind = jobs.kind
+            )
+            """,
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_jobs_queued_user_kind ON jobs(user_id, kind) WHERE status = 'queued'",
+        ],
+        "plan_checks": [
+            (
+                "jobs.enqueue_job: existing job of the same kind",
+                """
+                SELECT MAX(id) AS id FROM jobs
+                WHERE user_id = ? AND kind = ? AND status IN ('queued', 'running') AND id != ?
+                """,
+                (1, "ojuz_full_sync", -1),
+                "idx_jobs_user_kind",
+            ),
+        ],
+    },
+    {
+        "version": 19,
+        "name": "contests.id as an autoincrement rowid alias",
+        "sql": [
+            # drops trg_contests_id (MAX(id) + 1 could hand a deleted contest's id out again)
+            _contests_id_as_rowid,
+        ],
+        "plan_checks": [
+            (
+                "vc.get_virtual_contests: active contest with its contest row",
+                """
+                SELECT avc.contest_name, c.duration_minutes
+                FROM active_virtual_contests avc
+                JOIN contests c ON c.id = avc.contest_id
+                WHERE avc.user_id = ?
+                """,
+                (1,),
+                "INTEGER PRIMARY KEY",
+            ),
+            (
+                "vc.get_contest_scores: medal data of the requested contests",
+                """
+                WITH wanted(name, stage) AS (VALUES (?, ?), (?, ?))
+                SELECT c.name, c.stage, s.medal_names, s.medal_cutoffs, s.problem_scores
+                FROM wanted w
+                JOIN contests c ON c.name = w.name AND c.stage IS w.stage
+                JOIN contest_scores s ON s.contest_id = c.id
+                """,
+                ("IOI 2024", "Day 1", "APIO 2023", None),
+                "idx_contest_scores_contest",
+            ),
+            (
+                "vc.get_virtual_contests: completed contests",
+                "SELECT DISTINCT contest_id FROM user_virtual_contests WHERE user_id = ?",
+                (1,),
+                "idx_user_virtual_contests_contest",
+            ),
+        ],
+    },
+]
+
+def _ensure_version_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+def current_version(conn) -> int:
+    _ensure_version_table(conn)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def run_migrations(conn, verbose=True) -> list[int]:
+    """
+    Apply every migration newer than the recorded schema version.
+    Returns the list of versions applied by this call.
+    """
+    _ensure_version_table(conn)
+    # table rebuilds (DROP + RENAME) must not cascade into child tables;
+    # the pragma is a no-op inside a transaction, so set it up front
+    conn.execute("PRAGMA foreign_keys = OFF")
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m["version"]):
+        version = migration["version"]
+        # BEGIN IMMEDIATE so two concurrent runners can't both apply a version
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute(
+                "SELECT 1 FROM schema_version WHERE version = ?", (version,)
+            ).fetchone()
+            if done:
+                conn.execute("ROLLBACK")
+                continue
+            for stmt in migration.get("sql", []):
+                if callable(stmt):
+                    stmt(conn)
+                else:
+                    conn.execute(stmt)
+            conn.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (version, migration["name"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        applied.append(version)
+        if verbose:
+            print(f"[migrate] applied {version:03d}: {migration['name']}")
+    if applied:
+        # let SQLite refresh planner stats for the new indexes
+        conn.execute("PRAGMA optimize")
+    return applied
+
+def explain(conn, sql, params=()) -> list[str]:
+    return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+def check_query_plans(conn, up_to=None) -> list[dict]:
+    """
+    Run EXPLAIN QUERY PLAN for the plan_checks of every applied migration.
+    Returns one dict per check: {version, label, index, ok, plan}.
+    """
+    version = current_version(conn) if up_to is None else up_to
+    applied = [m for m in sorted(MIGRATIONS, key=lambda m: m["version"]) if m["version"] <= version]
+    # the newest check of each label wins
+    latest = {check[0]: m["version"] for m in applied for check in m.get("plan_checks", [])}
+    results = []
+    for migration in applied:
+        for label, sql, params, index in migration.get("plan_checks", []):
+            if latest[label] != migration["version"]:
+                continue
+            plan = explain(conn, sql, params)
+            # "PRIMARY KEY" is the key of a WITHOUT ROWID table, "INTEGER PRIMARY KEY" a rowid
+            ok = any(f"INDEX {index}" in detail or f"USING {index} (" in detail for detail in plan)
+            results.append({
+                "version": migration["version"],
+                "label": label,
+                "index": index,
+                "ok": ok,
+                "plan": plan,
+            })
+    return results
@@ -0,0 +1,349 @@
+"""
+SQLite-backed job queue for work that should not run inside a request
+(platform syncs). Request handlers enqueue and return a job id; the
+worker process (jobs/worker.py) leases jobs, keeps the lease alive with
+heartbeats, and stores the result or retries with exponential backoff.
+
+While a job runs, the sync code reports progress with emit_progress();
+the events land in job_events and GET /api/jobs/<id>/events streams them
+to the browser as Server-Sent Events.
+
+Platform cookies go into a payload sealed with seal_secret() (Fernet,
+keyed by JOB_SECRET_KEY or a key file created next to the backend) and
+are dropped from it once the job can no longer run.
+"""
+import os
+import json
+import time
+import contextvars
+from pathlib import Path
+from cryptography.fernet import Fernet, InvalidToken
+from flask import request, jsonify, Response
+from database.db import get_db, get_pool
+
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+JOB_RETRY_MAX_SECONDS = float(os.getenv("JOB_RETRY_MAX_SECONDS", "900"))
+JOB_EVENTS_POLL = float(os.getenv("JOB_EVENTS_POLL", "0.5"))            # seconds between SSE polls
+JOB_EVENTS_KEEPALIVE = float(os.getenv("JOB_EVENTS_KEEPALIVE", "15"))   # seconds between SSE comments
+JOB_SECRET_KEY = os.getenv("JOB_SECRET_KEY")                             # Fernet key shared by web and worker
+JOB_SECRET_KEY_FILE = os.getenv("JOB_SECRET_KEY_FILE", str(Path(__file__).resolve().parents[1] / ".job_secret_key"))
+JOB_SECRET_TTL = int(os.getenv("JOB_SECRET_TTL", "86400"))               # seconds a sealed secret stays readable
+
+# (job_id, monotonic start) of the job running in this context; set by the worker
+current_job = contextvars.ContextVar("current_job", default=None)
+
+class JobFailed(Exception):
+    """Raised by a job handler for failures that retrying will not fix."""
+
+_fernet = None
+
+def _secret_box():
+    """Fernet for job secrets: JOB_SECRET_KEY, else the key file (created on first use)."""
+    global _fernet
+    if _fernet is None:
+        key = JOB_SECRET_KEY
+        if not key:
+            try:
+                fd = os.open(JOB_SECRET_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(Fernet.generate_key())
+            except FileExistsError:
+                pass
+            key = Path(JOB_SECRET_KEY_FILE).read_bytes().strip()
+        _fernet = Fernet(key)
+    return _fernet
+
+def seal_secret(value) -> str:
+    """Encrypt a credential for a job payload."""
+    return _secret_box().encrypt(value.encode()).decode()
+
+def open_secret(token) -> str:
+    """Decrypt a sealed credential; JobFailed if it is unreadable or older than JOB_SECRET_TTL."""
+    try:
+        return _secret_box().decrypt(token.encode(), ttl=JOB_SECRET_TTL).decode()
+    except (InvalidToken, AttributeError):
+        raise JobFailed("Stored credentials are expired or unreadable; start the sync again")
+
+def enqueue_job(db, kind, payload, user_id=None, max_attempts=JOB_MAX_ATTEMPTS, delay=0):
+    """
+    Queue a job and return its id. If the same user already has a queued or
+    running job of this kind, that job's id is returned instead (the job
+    calling this does not count, so a job can queue its own next run). A
+    user has at most one queued job per kind (uq_jobs_queued_user_kind), so
+    concurrent callers end up with the same job. The caller commits.
+    """
+    if user_id is not None:
+        running = current_job.get()
+        existing = db.execute(
+            """
+            SELECT MAX(id) AS id FROM jobs
+            WHERE user_id = ? AND kind = ? AND status IN ('queued', 'running') AND id != ?
+            """,
+            (user_id, kind, running[0] if running else -1)
+        ).fetchone()
+        if existing["id"] is not None:
+            return existing["id"]
+    row = db.execute(
+        """
+        INSERT INTO jobs (kind, user_id, payload, max_attempts, run_after)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, kind) WHERE status = 'queued'
+        DO UPDATE SET updated_at = updated_at
+        RETURNING id
+        """,
+        (kind, user_id, json.dumps(payload), max_attempts, time.time() + delay)
+    ).fetchone()
+    return row["id"]
+
+def lease_job(db, owner, lease_seconds=JOB_LEASE_SECONDS, kinds=None):
+    """
+    Atomically claim the next runnable job for `owner`. Jobs whose lease
+    expired (worker died mid-run) become runnable again while they have
+    attempts left, so a job that keeps killing its worker ends up failed.
+    Returns the job row or None.
+    """
+    now = time.time()
+    # OR IGNORE: a job that already queued its own next run is not requeued
+    db.execute(
+        """
+        UPDATE OR IGNORE jobs
+        SET status = 'queued', lease_owner = NULL, lease_expires = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'running' AND lease_expires < ? AND attempts < max_attempts
+        """,
+        (now,)
+    )
+    db.execute(
+        """
+        UPDATE jobs
+        SET status = 'failed',
+            error = CASE WHEN attempts >= max_attempts THEN 'Lease expired after max attempts'
+                         ELSE 'Lease expired; a newer run is queued' END,
+            lease_owner = NULL, lease_expires = NULL, payload = json_remove(payload, '$.cookie'),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE status = 'running' AND lease_expires < ?
+        """,
+        (now,)
+    )
+    kind_filter = ""
+    params = [now]
+    if kinds:
+        kind_filter = f"AND kind IN ({', '.join(['?'] * len(kinds))})"
+        params.extend(kinds)
+    row = db.execute(
+        f"""
+        UPDATE jobs
+        SET status = 'running', lease_owner = ?, lease_expires = ?,
+            attempts = attempts + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE status = 'queued' AND run_after <= ? {kind_filter}
+            ORDER BY run_after, id
+            LIMIT 1
+        )
+        RETURNING *
+        """,
+        (owner, now + lease_seconds, *params)
+    ).fetchone()
+    db.commit()
+    return row
+
+def heartbeat_job(db, job_id, owner, lease_seconds=JOB_LEASE_SECONDS) -> bool:
+    """Extend the lease; False means we lost it (another worker took over)."""
+    cur = db.execute(
+        """
+        UPDATE jobs SET lease_expires = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND lease_owner = ? AND status = 'running'
+        """,
+        (time.time() + lease_seconds, job_id, owner)
+    )
+    db.commit()
+    return cur.rowcount == 1
+
+def complete_job(db, job_id, owner, result):
+    # credentials in the payload are only needed while the job can still run
+    db.execute(
+        """
+        UPDATE jobs
+        SET status = 'succeeded', result = ?, error = NULL, lease_owner = NULL, lease_expires = NULL,
+            payload = json_remove(payload, '$.cookie'), updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND lease_owner = ?
+        """,
+        (json.dumps(result), job_id, owner)
+    )
+    db.commit()
+
+def fail_job(db, job_id, owner, error, retry=True):
+    """Record a failure; requeue with exponential backoff unless out of attempts."""
+    row = db.execute(
+        "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?",
+        (job_id, owner)
+    ).fetchone()
+    if not row:
+        return
+    requeued = False
+    if retry and row["attempts"] < row["max_attempts"]:
+        delay = min(JOB_RETRY_BASE_SECONDS * (2 ** (row["attempts"] - 1)), JOB_RETRY_MAX_SECONDS)
+        # OR IGNORE: no retry if the job already queued its own next run
+        requeued = db.execute(
+            """
+            UPDATE OR IGNORE jobs
+            SET status = 'queued', error = ?, run_after = ?, lease_owner = NULL, lease_expires = NULL,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (error, time.time() + delay, job_id)
+        ).rowcount == 1
+    if not requeued:
+        db.execute(
+            """
+            UPDATE jobs
+            SET status = 'failed', error = ?, lease_owner = NULL, lease_expires = NULL,
+                payload = json_remove(payload, '$.cookie'), updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (error, job_id)
+        )
+    db.commit()
+
+def emit_progress(event, **data):
+    """
+    Record a progress event for the job running in this context; a no-op
+    outside the worker. Uses its own pooled connection so events commit
+    independently of whatever transaction the sync has open.
+    """
+    job = current_job.get()
+    if job is None:
+        return
+    job_id, started = job
+    data["elapsed"] = round(time.monotonic() - started, 2)
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        conn.execute(
+            "INSERT INTO job_events (job_id, event, data) VALUES (?, ?, ?)",
+            (job_id, event, json.dumps(data))
+        )
+        conn.commit()
+    finally:
+        pool.release(conn)
+    print(f"[JOBS] job {job_id} {event}: {data}")
+
+def job_to_dict(row):
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "result": json.loads(row["result"]) if row["result"] else None,
+        "error": row["error"],
+        "created_at": row["created_at"],
+        "updated_at": row["updated_at"],
+    }
+
+def get_job(job_id):
+    """GET /api/jobs/<id>: status and result of one of the caller's jobs."""
+    db = get_db()
+    row = db.execute(
+        "SELECT * FROM jobs WHERE id = ? AND user_id = ?",
+        (job_id, request.user_id)
+    ).fetchone()
+    if not row:
+        return jsonify({"error": "Job not found"}), 404
+    job = job_to_dict(row)
+    last = db.execute(
+        "SELECT event, data FROM job_events WHERE job_id = ? ORDER BY id DESC LIMIT 1",
+        (job_id,)
+    ).fetchone()
+    job["progress"] = {"event": last["event"], **json.loads(last["data"])} if last else None
+    return jsonify(job)
+
+def _sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def stream_job_events(job_id):
+    """
+    GET /api/jobs/<id>/events: Server-Sent Events stream of a job's progress.
+    Resumes after Last-Event-ID (or ?after=) and ends with a `done` event
+    carrying the finished job.
+    """
+    user_id = request.user_id
+    db = get_db()
+    if not db.execute("SELECT 1 FROM jobs WHERE id = ? AND user_id = ?", (job_id, user_id)).fetchone():
+        return jsonify({"error": "Job not found"}), 404
+    after = request.headers.get("Last-Event-ID") or request.args.get("after") or 0
+    try:
+        after = int(after)
+    except ValueError:
+        after = 0
+
+    def generate(after):
+        # the request's connection goes back to the pool when the view returns,
+        # so the stream borrows its own for each poll
+        pool = get_pool()
+        last_sent = time.monotonic()
+        while True:
+            conn = pool.acquire()
+            try:
+                events = conn.execute(
+                    "SELECT id, event, data FROM job_events WHERE job_id = ? AND id > ? ORDER BY id",
+                    (job_id, after)
+                ).fetchall()
+                job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            finally:
+                pool.release(conn)
+            for ev in events:
+                after = ev["id"]
+                yield _sse(ev["event"], json.loads(ev["data"]), ev["id"])
+                last_sent = time.monotonic()
+            if job is None or job["status"] in ("succeeded", "failed"):
+                yield _sse("done", job_to_dict(job) if job else None)
+                return
+            if time.monotonic() - last_sent >= JOB_EVENTS_KEEPALIVE:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+            time.sleep(JOB_EVENTS_POLL)
+
+    return Response(generate(after), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+def prune_jobs(db, keep_days=30) -> int:
+    """
+    Delete finished jobs (and their progress events) older than keep_days.
+    The caller commits. Returns the number of jobs deleted.
+    """
+    cutoff = f"-{int(keep_days)} days"
+    db.execute(
+        """
+        DELETE FROM job_events WHERE job_id IN (
+            SELECT id FROM jobs
+            WHERE status IN ('succeeded', 'failed') AND updated_at < datetime('now', ?)
+        )
+        """,
+        (cutoff,)
+    )
+    cur = db.execute(
+        "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < datetime('now', ?)",
+        (cutoff,)
+    )
+    return cur.rowcount
+
+def job_stats(db):
+    """Job counts by status, plus how long the oldest runnable job has waited."""
+    counts = {status: 0 for status in ("queued", "running", "succeeded", "failed")}
+    for row in db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status"):
+        counts[row["status"]] = row["n"]
+    oldest = db.execute(
+        "SELECT MIN(run_after) AS t FROM jobs WHERE status = 'queued' AND run_after <= ?",
+        (time.time(),)
+    ).fetchone()["t"]
+    counts["oldest_queued_seconds"] = round(time.time() - oldest, 1) if oldest else None
+    return counts
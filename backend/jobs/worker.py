@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Job worker: runs queued platform syncs outside the web server.
+
+Usage:
+    python3 backend/jobs/worker.py           # run forever
+    python3 backend/jobs/worker.py --once    # drain runnable jobs and exit
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import traceback
+from pathlib import Path
+from dotenv import load_dotenv, find_dotenv
+
+load_dotenv(find_dotenv())
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+from database.db import get_db
+from jobs.jobs import lease_job, heartbeat_job, complete_job, fail_job, open_secret, JobFailed, JOB_LEASE_SECONDS, current_job
+from scrape.ojuz import run_ojuz_full_sync
+from scrape.qoj import run_qoj_full_sync
+from virtual_contests.vc import run_vc_autosync, run_vc_live_sync
+from scrape.client import http_stats
+
+JOB_WORKER_THREADS = int(os.getenv("JOB_WORKER_THREADS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+
+# kind -> handler(user_id, payload) returning a JSON-serialisable result
+HANDLERS = {
+    "ojuz_full_sync": lambda user_id, payload: run_ojuz_full_sync(user_id, open_secret(payload["cookie"])),
+    "qoj_full_sync": lambda user_id, payload: run_qoj_full_sync(user_id, open_secret(payload["cookie"])),
+    "vc_autosync": lambda user_id, payload: run_vc_autosync(user_id),
+    "vc_live_sync": lambda user_id, payload: run_vc_live_sync(user_id),
+}
+
+def _heartbeat_loop(job_id, owner, stop):
+    db = get_db()
+    while not stop.wait(JOB_LEASE_SECONDS / 3):
+        if not heartbeat_job(db, job_id, owner):
+            print(f"[JOBS] {owner} lost the lease on job {job_id}")
+            return
+
+def run_job(job, owner):
+    """Run one leased job to completion, recording the result or failure."""
+    db = get_db()
+    handler = HANDLERS.get(job["kind"])
+    if handler is None:
+        fail_job(db, job["id"], owner, f"Unknown job kind: {job['kind']}", retry=False)
+        return
+
+    stop = threading.Event()
+    beat = threading.Thread(target=_heartbeat_loop, args=(job["id"], owner, stop), daemon=True)
+    beat.start()
+    started = time.monotonic()
+    token = current_job.set((job["id"], started))
+    print(f"[JOBS] {owner} running job {job['id']} ({job['kind']}, attempt {job['attempts']})")
+    try:
+        result = handler(job["user_id"], json.loads(job["payload"] or "{}"))
+    except JobFailed as e:
+        db.rollback()
+        fail_job(db, job["id"], owner, str(e), retry=False)
+        print(f"[JOBS] job {job['id']} failed: {e}")
+    except Exception as e:
+        db.rollback()
+        traceback.print_exc()
+        fail_job(db, job["id"], owner, f"{type(e).__name__}: {e}")
+        print(f"[JOBS] job {job['id']} errored (attempt {job['attempts']}/{job['max_attempts']}): {e}")
+    else:
+        complete_job(db, job["id"], owner, result)
+        print(f"[JOBS] job {job['id']} done in {time.monotonic() - started:.1f}s")
+        stats = http_stats()
+        print(f"[JOBS] http: {stats['requests']} requests over {stats['connections']} connections ({stats['reused']} reused)")
+    finally:
+        current_job.reset(token)
+        stop.set()
+        beat.join()
+
+def work(owner, once=False, stop=None):
+    """Lease and run jobs until `stop` is set (or, with once=True, the queue is empty)."""
+    db = get_db()
+    while stop is None or not stop.is_set():
+        job = lease_job(db, owner, kinds=list(HANDLERS))
+        if job is None:
+            if once:
+                return
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        run_job(job, owner)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background jobs")
+    parser.add_argument("--once", action="store_true", help="exit when no job is runnable")
+    parser.add_argument("--threads", type=int, default=JOB_WORKER_THREADS)
+    args = parser.parse_args()
+
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(target=work, args=(f"{prefix}:{i}", args.once), daemon=True)
+        for i in range(max(1, args.threads))
+    ]
+    print(f"[JOBS] worker {prefix} started with {len(threads)} thread(s)")
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            while t.is_alive():
+                t.join(1)
+    except KeyboardInterrupt:
+        print("[JOBS] shutting down")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from flask import request, jsonify
 from database.db import get_db
+from progress.progress import problem_ids_for
 
 def get_note():
     name = request.args.get('problem_name')
@@ -9,12 +10,15 @@ def get_note():
         return jsonify({"error": "Missing required parameters"}), 400
 
     with get_db() as db:
+        problem_ids = problem_ids_for(db, name, source, year)
+        if not problem_ids:
+            return jsonify({"note": ''}), 200
         row = db.execute(
             '''
             SELECT note FROM user_problem_notes
-            WHERE user_id = ? AND problem_name = ? AND source = ? AND year = ?
+            WHERE user_id = ? AND problem_id = ?
             ''',
-            (request.user_id, name, source, year)
+            (request.user_id, problem_ids[0])
         ).fetchone()
 
     return jsonify({"note": (row['note'] if row else '')}), 200
@@ -33,15 +37,18 @@ def save_note():
         return jsonify({"error": "Invalid year"}), 400
 
     with get_db() as db:
-        db.execute(
+        problem_ids = problem_ids_for(db, name, source, year_int)
+        if not problem_ids:
+            return jsonify({"error": "Unknown problem"}), 404
+        db.executemany(
             '''
-            INSERT INTO user_problem_notes (user_id, problem_name, source, year, note, updated_at)
-            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(user_id, problem_name, source, year)
+            INSERT INTO user_problem_notes (user_id, problem_id, note, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(user_id, problem_id)
             DO UPDATE SET note = excluded.note, updated_at = CURRENT_TIMESTAMP
             ''',
-            (request.user_id, name, source, year_int, note)
+            [(request.user_id, problem_id, note) for problem_id in problem_ids]
         )
         db.commit()
 
-    return jsonify({"success": True})
\ No newline at end of file
+    return jsonify({"success": True})
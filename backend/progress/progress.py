@@ -0,0 +1,248 @@
+import os
+import hashlib
+from flask import request, jsonify, current_app
+from database.db import get_db
+from catalog.catalog import get_catalog
+
+def progress_version(db, user_id) -> int:
+    row = db.execute(
+        "SELECT version FROM user_progress_versions WHERE user_id = ?",
+        (user_id,)
+    ).fetchone()
+    return row["version"] if row else 0
+
+def bump_progress_version(db, user_id) -> int:
+    """
+    Advance the user's progress version (anything that changes their
+    checklist payload). Runs inside the caller's transaction; the caller
+    commits. Returns the new version.
+    """
+    row = db.execute(
+        """
+        INSERT INTO user_progress_versions (user_id, version)
+        VALUES (?, 1)
+        ON CONFLICT(user_id) DO UPDATE SET version = version + 1
+        RETURNING version
+        """,
+        (user_id,)
+    ).fetchone()
+    return row["version"]
+
+def make_etag(*parts) -> str:
+    """Strong ETag value from the inputs that fully determine a response."""
+    raw = "\x1f".join(str(p) for p in parts)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+def not_modified(etag):
+    """
+    Return a 304 response if the request's If-None-Match matches `etag`,
+    otherwise None so the caller builds the full response.
+    """
+    if request.if_none_match.contains(etag):
+        resp = current_app.response_class(status=304)
+        return with_etag(resp, etag)
+    return None
+
+def with_etag(resp, etag):
+    resp.set_etag(etag)
+    # private: per-user payload; no-cache: always revalidate (cheap via 304)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+def problem_ids_for(db, name, source, year) -> tuple:
+    """
+    ids of the catalog problems a (name, source, year) key from the API names;
+    empty if there are none or the year is not a number.
+    """
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        return ()
+    return get_catalog(db).ids_by_key.get((name, source, year), ())
+
+def record_progress_changes(db, user_id, problem_ids) -> int:
+    """
+    Bump the user's progress version and append one problem_status_events
+    row per changed problem, copied from its current problem_statuses row
+    (events keep the problem's name/source/year, which is what clients see).
+    problem_ids is an iterable of problems.id. The caller commits.
+    Returns the new version.
+    """
+    version = bump_progress_version(db, user_id)
+    db.executemany(
+        """
+        INSERT INTO problem_status_events (user_id, version, problem_name, source, year, status, score)
+        SELECT ps.user_id, ?, p.name, p.source, p.year, ps.status, ps.score
+        FROM problem_statuses ps
+        JOIN problems p ON p.id = ps.problem_id
+        WHERE ps.user_id = ? AND ps.problem_id = ?
+        """,
+        [(version, user_id, problem_id) for problem_id in dict.fromkeys(problem_ids)]
+    )
+    return version
+
+def get_problem_changes():
+    """
+    GET /api/problems/changes?since=<version>
+
+    Returns the latest (name, source, year, status, score) of every problem
+    whose progress changed after `since`, plus the current version. If the
+    events needed to answer have been compacted away, returns reset=true and
+    the client should refetch /api/problems.
+    """
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "Missing or invalid 'since' query parameter"}), 400
+
+    user_id = request.user_id
+    db = get_db()
+    row = db.execute(
+        "SELECT version, compacted_through FROM user_progress_versions WHERE user_id = ?",
+        (user_id,)
+    ).fetchone()
+    version = row["version"] if row else 0
+    compacted_through = row["compacted_through"] if row else 0
+
+    if since < compacted_through or since > version:
+        return jsonify({"version": version, "reset": True, "changes": []})
+    if since == version:
+        return jsonify({"version": version, "reset": False, "changes": []})
+
+    events = db.execute(
+        """
+        SELECT problem_name, source, year, status, score, version
+        FROM problem_status_events
+        WHERE user_id = ? AND version > ?
+        ORDER BY version
+        """,
+        (user_id, since)
+    ).fetchall()
+
+    # later events win; keep one row per problem
+    latest = {}
+    for ev in events:
+        latest[(ev["problem_name"], ev["source"], ev["year"])] = ev
+    changes = [
+        {
+            "name": ev["problem_name"],
+            "source": ev["source"],
+            "year": ev["year"],
+            "status": ev["status"],
+            "score": ev["score"],
+        }
+        for ev in latest.values()
+    ]
+    return jsonify({"version": version, "reset": False, "changes": changes})
+
+def compact_progress_events(db, keep_days=30) -> int:
+    """
+    Delete events older than keep_days, remembering per user the highest
+    version removed so /api/problems/changes can tell stale clients to
+    reset. The caller commits. Returns the number of events deleted.
+    """
+    cutoff = f"-{int(keep_days)} days"
+    db.execute(
+        """
+        UPDATE user_progress_versions
+        SET compacted_through = MAX(compacted_through, (
+            SELECT MAX(e.version) FROM problem_status_events e
+            WHERE e.user_id = user_progress_versions.user_id
+              AND e.created_at < datetime('now', ?)
+        ))
+        WHERE user_id IN (
+            SELECT DISTINCT user_id FROM problem_status_events
+            WHERE created_at < datetime('now', ?)
+        )
+        """,
+        (cutoff, cutoff)
+    )
+    cur = db.execute(
+        "DELETE FROM problem_status_events WHERE created_at < datetime('now', ?)",
+        (cutoff,)
+    )
+    return cur.rowcount
+
+MAX_BATCH_UPDATES = int(os.getenv("MAX_BATCH_UPDATES", "1000"))
+VALID_STATUSES = (0, 1, 2)
+
+def _parse_update(item, catalog):
+    """Validate one mutation; returns (problem_ids, status, score) or an error string."""
+    if not isinstance(item, dict):
+        return "each update must be an object"
+    name = item.get('problem_name')
+    source = item.get('source')
+    year = item.get('year')
+    if not name or not source or year is None:
+        return "missing problem_name, source or year"
+    try:
+        year = int(year)
+    except (TypeError, ValueError):
+        return "invalid year"
+    problem_ids = catalog.ids_by_key.get((name, source, year))
+    if not problem_ids:
+        return f"unknown problem {name!r} ({source} {year})"
+
+    status = item.get('status')
+    score = item.get('score')
+    if status is None and score is None:
+        return "nothing to update (need status and/or score)"
+    if status is not None and (isinstance(status, bool) or status not in VALID_STATUSES):
+        return "invalid status"
+    if score is not None:
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 100:
+            return "invalid score"
+    return problem_ids, status, score
+
+def apply_problem_updates():
+    """
+    POST /api/problem-updates
+    Body: {"updates": [{"problem_name", "source", "year", "status"?, "score"?}, ...]}
+
+    Validates every mutation against the catalog, then applies them all in
+    one transaction (later entries for the same problem win field by field).
+    Returns {success, updated, version}.
+    """
+    data = request.get_json(silent=True) or {}
+    updates = data.get('updates')
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"error": "Missing 'updates' (must be a non-empty list)"}), 400
+    if len(updates) > MAX_BATCH_UPDATES:
+        return jsonify({"error": f"Too many updates (max {MAX_BATCH_UPDATES})"}), 400
+
+    user_id = request.user_id
+    db = get_db()
+    catalog = get_catalog(db)
+
+    merged = {}  # problem_id -> [status, score]
+    for i, item in enumerate(updates):
+        parsed = _parse_update(item, catalog)
+        if isinstance(parsed, str):
+            return jsonify({"error": f"updates[{i}]: {parsed}"}), 400
+        problem_ids, status, score = parsed
+        for problem_id in problem_ids:
+            fields = merged.setdefault(problem_id, [None, None])
+            if status is not None:
+                fields[0] = status
+            if score is not None:
+                fields[1] = score
+
+    try:
+        db.executemany(
+            '''
+            INSERT INTO problem_statuses (user_id, problem_id, status, score)
+            VALUES (?, ?, COALESCE(?, 0), COALESCE(?, 0))
+            ON CONFLICT(user_id, problem_id)
+            DO UPDATE SET status = COALESCE(?, status), score = COALESCE(?, score)
+            ''',
+            [
+                (user_id, problem_id, status, score, status, score)
+                for problem_id, (status, score) in merged.items()
+            ]
+        )
+        version = record_progress_changes(db, user_id, merged.keys())
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return jsonify({"success": True, "updated": len(merged), "version": version})
@@ -0,0 +1,157 @@
+"""
+Best-subtask aggregation shared by the oj.uz / qoj.ac syncs and the virtual
+contest scoring.
+
+A problem's subtask_scores are the element-wise maximum of the subtask
+scores of all its submissions that have a breakdown ([] if none has one).
+Its total is the sum of those, or the best total of a submission without a
+breakdown if that is higher, and its earliest_improvement_time is when the
+total was reached: the time of the last submission that raised the running
+total, taking submissions in time order. best_subtasks() computes all three
+for a batch in one pass, with NumPy (a pinned requirement) and with plain
+Python when NumPy cannot be imported (same results).
+
+Times are ISO strings (or None); each is parsed once, and the result
+carries the deciding submission's own string.
+"""
+from math import isfinite
+from itertools import chain
+from datetime import datetime, timezone
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+def to_epoch(iso) -> float:
+    """Seconds since the epoch for an ISO timestamp ("...Z" or with an offset); None -> -inf."""
+    if iso is None:
+        return float("-inf")
+    dt = datetime.fromisoformat(iso.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def _number(v):
+    return int(v) if float(v).is_integer() else v
+
+def _float(v) -> float:
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return 0.0
+    return v if isfinite(v) else 0.0
+
+def _scores(subtasks):
+    """A submission's subtask scores as floats; [] without a breakdown."""
+    if isinstance(subtasks, (list, tuple)) and len(subtasks):
+        try:
+            out = list(map(float, subtasks))
+            if isfinite(sum(out)):
+                return out
+        except (TypeError, ValueError):
+            pass
+        return [_float(v) for v in subtasks]
+    return []
+
+def _rows(keys, times, subtasks, totals, initial):
+    """
+    (keys, time labels, epochs, scores, floors) with `initial` prepended as
+    the oldest rows. A row's floor is the total it guarantees regardless of
+    its breakdown: a submission's total when it has no breakdown, an
+    initial result's total always.
+    """
+    init = list((initial or {}).items())
+    all_keys = [k for k, _ in init] + list(keys)
+    labels = [b["earliest_improvement_time"] for _, b in init]
+    labels += list(times) if times is not None else [None] * len(keys)
+    epochs = [float("-inf")] * len(init) + [to_epoch(t) for t in labels[len(init):]]
+    scores = [_scores(b["subtask_scores"]) for _, b in init]
+    floors = [_float(b["total_score"]) for _, b in init]
+    for i in range(len(keys)):
+        scores.append(_scores(subtasks[i]))
+        floors.append(0.0 if scores[-1] else _float(totals[i] if totals is not None else None))
+    return all_keys, labels, epochs, scores, floors
+
+def _best_python(keys, labels, epochs, scores, floors):
+    order = sorted(range(len(keys)), key=lambda i: epochs[i])
+    state = {}
+    for i in order:
+        best, floor, total, when = state.get(keys[i], ([], 0.0, -1.0, None))
+        if len(scores[i]) > len(best):
+            best = best + [0.0] * (len(scores[i]) - len(best))
+        best = [max(b, v) for b, v in zip(best, scores[i] + [0.0] * (len(best) - len(scores[i])))]
+        floor = max(floor, floors[i])
+        new_total = max(sum(best, 0.0), floor)
+        if new_total > total:
+            total, when = new_total, labels[i]
+        state[keys[i]] = (best, floor, total, when)
+    return {key: (best, total, when) for key, (best, _, total, when) in state.items()}
+
+def _best_numpy(keys, labels, epochs, scores, floors):
+    n = len(keys)
+    codes = {}
+    code = np.fromiter((codes.setdefault(k, len(codes)) for k in keys), dtype=np.int64, count=n)
+    lengths = np.fromiter((len(s) for s in scores), dtype=np.int64, count=n)
+    width = max(int(lengths.max()), 1)
+    # ragged scores -> zero-padded matrix, via dense ranks so the grouped
+    # running maxima below are exact integer arithmetic
+    flat = np.fromiter(chain.from_iterable(scores), dtype=np.float64, count=int(lengths.sum()))
+    floor = np.asarray(floors, dtype=np.float64)
+    values, ranks = np.unique(np.concatenate(([0.0], flat, floor)), return_inverse=True)
+    flat_rank, floor_rank = ranks[1:1 + len(flat)], ranks[1 + len(flat):]
+    rank = np.full((n, width), int(ranks[0]), dtype=np.int64)
+    rows = np.repeat(np.arange(n), lengths)
+    cols = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    rank[rows, cols] = flat_rank
+
+    # group by problem, oldest first (stable, so the initial rows stay first)
+    order = np.lexsort((np.arange(n), np.asarray(epochs, dtype=np.float64), code))
+    code, rank, floor_rank = code[order], rank[order], floor_rank[order]
+    # segmented running max: lift each problem above the previous ones
+    lift = code * len(values)
+    running = values[np.maximum.accumulate(rank + lift[:, None], axis=0) - lift[:, None]]
+    running_floor = values[np.maximum.accumulate(floor_rank + lift) - lift]
+    # left to right like sum(), so totals match the pure-Python path exactly
+    totals = np.maximum(np.add.accumulate(running, axis=1)[:, -1], running_floor)
+    start = np.ones(n, dtype=bool)
+    start[1:] = code[1:] != code[:-1]
+    prev = np.concatenate(([-1.0], totals[:-1]))
+    raised = start | (totals > prev)
+    last_raise = np.maximum.accumulate(np.where(raised, np.arange(n), -1))
+    ends = np.flatnonzero(np.append(start[1:], True))
+    widths = np.maximum.reduceat(lengths[order], np.flatnonzero(start))
+
+    inverse = {c: k for k, c in codes.items()}
+    state = {}
+    for e, w in zip(ends, widths):
+        best = running[e, :w].tolist()
+        state[inverse[int(code[e])]] = (best, float(totals[e]), labels[order[last_raise[e]]])
+    return state
+
+def best_subtasks(keys, times, subtasks, totals=None, initial=None, use_numpy=None):
+    """
+    Best result per problem over a batch of submissions.
+
+    keys, times, subtasks and totals are parallel sequences: the problem key,
+    ISO submission time (times=None: all unknown), subtask scores (a list, or
+    None/[] for none) and total score of each submission. `initial` is an
+    earlier result of this function, folded in as older than the batch.
+
+    Returns {key: {'total_score', 'subtask_scores', 'earliest_improvement_time'}}.
+    """
+    rows = _rows(keys, times, subtasks, totals, initial)
+    if not rows[0]:
+        return {}
+    if use_numpy is None:
+        use_numpy = HAVE_NUMPY
+    state = (_best_numpy if use_numpy else _best_python)(*rows)
+    return {
+        key: {
+            "total_score": _number(total),
+            "subtask_scores": [_number(v) for v in best],
+            "earliest_improvement_time": when,
+        }
+        for key, (best, total, when) in state.items()
+    }
@@ -0,0 +1,130 @@
+"""
+Shared HTTP client for the scrapers.
+
+oj.uz requests go through one process-wide requests.Session whose
+HTTPAdapter keeps a pool of keep-alive connections per host, so a full sync
+reuses a handful of TCP/TLS connections instead of handshaking for every
+page. qoj.ac needs cloudscraper sessions (Cloudflare), which are
+requests.Session subclasses; configure_session() gives them the same
+adapter settings and hooks them into the same counters.
+
+Every adapter takes a token from the per-host rate limiter
+(scrape/ratelimit.py) before sending, so pacing lives here rather than in
+sleeps scattered through the scrapers.
+
+With SCRAPER_RECORD_DIR set, every response is also saved as a fixture for
+scrape/replay.py.
+
+The shared session never stores cookies: credentials are passed per call
+(Cookie header), so one user's cookies can't leak into another's sync.
+"""
+import os
+import threading
+import weakref
+from collections import Counter
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from scrape.ratelimit import acquire as rate_limit, rate_limit_stats
+
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "4"))        # per-host pools kept per session
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))   # keep-alive connections per host
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))           # default seconds when a call passes none
+SCRAPER_RECORD_DIR = os.getenv("SCRAPER_RECORD_DIR")             # save every response here (scrape/replay.py)
+
+_counter_lock = threading.Lock()
+_requests_by_host = Counter()
+_sessions = weakref.WeakSet()
+
+_shared = None
+_shared_lock = threading.Lock()
+_adapter_factory = None
+
+def _count_response(resp, *args, **kwargs):
+    host = urlsplit(resp.url).hostname or "?"
+    with _counter_lock:
+        _requests_by_host[host] += 1
+    return resp
+
+class RateLimitedAdapter(HTTPAdapter):
+    def send(self, request, **kwargs):
+        rate_limit(request.url)
+        return super().send(request, **kwargs)
+
+def set_adapter_factory(factory):
+    """
+    Build the adapters of sessions configured from now on with factory()
+    instead (None restores the default); used by scrape/replay.py.
+    """
+    global _adapter_factory, _shared
+    with _shared_lock:
+        _adapter_factory = factory
+        _shared = None
+
+def _new_adapter():
+    if _adapter_factory is not None:
+        return _adapter_factory()
+    if SCRAPER_RECORD_DIR:
+        from scrape.replay import recording_adapter
+        return recording_adapter(SCRAPER_RECORD_DIR)
+    return RateLimitedAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE)
+
+def configure_session(session):
+    """Mount the pooled, rate-limited adapter on a session and count its requests."""
+    adapter = _new_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.setdefault("Accept-Encoding", "gzip, deflate")
+    session.headers.setdefault("Connection", "keep-alive")
+    session.hooks["response"].append(_count_response)
+    _sessions.add(session)
+    return session
+
+def get_session():
+    """The process-wide cookie-less session used for oj.uz."""
+    global _shared
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                s = requests.Session()
+                s.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+                _shared = configure_session(s)
+    return _shared
+
+def get(url, **kwargs):
+    """requests.get() through the shared session, with a default timeout."""
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    return get_session().get(url, **kwargs)
+
+def http_stats():
+    """
+    Requests and newly opened connections per host across every configured
+    session that is still alive. reused = requests served on an existing
+    connection.
+    """
+    connections = Counter()
+    for session in list(_sessions):
+        for adapter in set(session.adapters.values()):
+            pools = getattr(adapter, "poolmanager", None)
+            if pools is None:
+                continue
+            for key in list(pools.pools.keys()):
+                pool = pools.pools.get(key)
+                if pool is not None:
+                    connections[pool.host] += pool.num_connections
+    with _counter_lock:
+        by_host = {
+            host: {"requests": n, "connections": connections.get(host, 0)}
+            for host, n in _requests_by_host.items()
+        }
+    total_requests = sum(h["requests"] for h in by_host.values())
+    total_connections = sum(h["connections"] for h in by_host.values())
+    return {
+        "pool_maxsize": HTTP_POOL_MAXSIZE,
+        "requests": total_requests,
+        "connections": total_connections,
+        "reused": max(total_requests - total_connections, 0),
+        "by_host": by_host,
+        "rate_limits": rate_limit_stats(),
+    }
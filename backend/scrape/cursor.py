@@ -0,0 +1,116 @@
+"""
+Per-user, per-platform cursors for the full syncs.
+
+A cursor remembers the newest submission a full sync has completely
+processed, together with the handle and the set of tracked problems it was
+computed for. The next full sync pages newest-first and stops at the
+cursor; qoj.ac merges the new submissions into the best-subtask state kept
+in platform_best_subtasks instead of re-fetching the whole history.
+
+The cursor never moves onto submissions younger than
+SYNC_CURSOR_SETTLE_SECONDS, so anything that may still be judging is looked
+at again next time. Merges take maxima, so reprocessing is harmless.
+"""
+import os
+import json
+import hashlib
+from datetime import datetime, timezone, timedelta
+
+SYNC_CURSOR_SETTLE_SECONDS = int(os.getenv("SYNC_CURSOR_SETTLE_SECONDS", "900"))
+
+def problem_set_key(refs) -> str:
+    """Fingerprint of the tracked problems; a new link invalidates the cursor."""
+    return hashlib.sha1("\n".join(sorted(str(r) for r in refs)).encode()).hexdigest()
+
+def get_cursor(db, user_id, platform):
+    row = db.execute(
+        """
+        SELECT username, problems_key, last_submission_id, last_submission_time
+        FROM platform_sync_cursors WHERE user_id = ? AND platform = ?
+        """,
+        (user_id, platform)
+    ).fetchone()
+    return dict(row) if row else None
+
+def cursor_matches(cursor, username, problems_key) -> bool:
+    return cursor["username"] == username and cursor["problems_key"] == problems_key
+
+def reset_cursor(db, user_id, platform):
+    """Forget the cursor and stored best state (handle or problem set changed)."""
+    db.execute("DELETE FROM platform_sync_cursors WHERE user_id = ? AND platform = ?", (user_id, platform))
+    db.execute("DELETE FROM platform_best_subtasks WHERE user_id = ? AND platform = ?", (user_id, platform))
+
+def save_cursor(db, user_id, platform, username, problems_key, submission_id, submission_time):
+    db.execute(
+        """
+        INSERT INTO platform_sync_cursors
+            (user_id, platform, username, problems_key, last_submission_id, last_submission_time, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(user_id, platform) DO UPDATE SET
+            username = excluded.username,
+            problems_key = excluded.problems_key,
+            last_submission_id = excluded.last_submission_id,
+            last_submission_time = excluded.last_submission_time,
+            updated_at = CURRENT_TIMESTAMP
+        """,
+        (user_id, platform, username, problems_key, int(submission_id), submission_time)
+    )
+
+def newest_settled(items, time_key="submission_time"):
+    """
+    (submission_id, time) of the newest item old enough to be final, or None.
+    Submission ids grow with time on both platforms, so everything at or
+    below it is settled too.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SYNC_CURSOR_SETTLE_SECONDS)
+    best = None
+    for it in items:
+        try:
+            t = datetime.fromisoformat(it[time_key].replace('Z', '+00:00'))
+        except (AttributeError, TypeError, ValueError):    # no time / not ISO
+            continue
+        if t.tzinfo is None:
+            t = t.replace(tzinfo=timezone.utc)
+        if t > cutoff:
+            continue
+        sid = int(it["submission_id"])
+        if best is None or sid > best[0]:
+            best = (sid, it[time_key])
+    return best
+
+def load_best(db, user_id, platform):
+    """problem_ref -> {'total_score', 'subtask_scores', 'earliest_improvement_time'}"""
+    rows = db.execute(
+        """
+        SELECT problem_ref, total_score, subtask_scores, earliest_improvement_time
+        FROM platform_best_subtasks WHERE user_id = ? AND platform = ?
+        """,
+        (user_id, platform)
+    ).fetchall()
+    return {
+        r["problem_ref"]: {
+            "total_score": r["total_score"],
+            "subtask_scores": json.loads(r["subtask_scores"] or "[]"),
+            "earliest_improvement_time": r["earliest_improvement_time"],
+        }
+        for r in rows
+    }
+
+def save_best(db, user_id, platform, best, refs):
+    """Persist best-subtask state for the given problem refs. The caller commits."""
+    db.executemany(
+        """
+        INSERT INTO platform_best_subtasks
+            (user_id, platform, problem_ref, total_score, subtask_scores, earliest_improvement_time)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, platform, problem_ref) DO UPDATE SET
+            total_score = excluded.total_score,
+            subtask_scores = excluded.subtask_scores,
+            earliest_improvement_time = excluded.earliest_improvement_time
+        """,
+        [
+            (user_id, platform, str(ref), best[ref]["total_score"],
+             json.dumps(best[ref]["subtask_scores"]), best[ref]["earliest_improvement_time"])
+            for ref in refs
+        ]
+    )
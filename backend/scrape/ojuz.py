@@ -2,12 +2,76 @@ from flask import request, jsonify
 from datetime import timedelta, datetime
 from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor
-import requests
+from scrape import client
+from scrape.parsing import parse_html, parts
+import os
 import re
-import time
 import json
-import random
 from database.db import get_db
+from progress.progress import record_progress_changes
+from jobs.jobs import enqueue_job, seal_secret, JobFailed, emit_progress
+from scrape.submissions import fetch_details, looks_pending, load_cached, result_column, result_text
+from scrape.aggregate import best_subtasks
+from scrape.cursor import problem_set_key, get_cursor, cursor_matches, reset_cursor, save_cursor, newest_settled
+
+# How run_ojuz_full_sync reads scores: "submissions" walks the user's
+# submissions list (problem pages only for rows without a readable score),
+# "problems" opens the page of every candidate problem
+OJUZ_SYNC_MODE = os.getenv("OJUZ_SYNC_MODE", "submissions")
+
+_SCORE_RE = re.compile(r'([0-9]+(?:\.[0-9]+)?)\s*/\s*([0-9]+(?:\.[0-9]+)?)')
+_ZERO_RE = re.compile(r'Compil(?:e|ation) error', re.I)
+_JUDGING_RE = re.compile(r'\b(Waiting|Pending|In queue|Judging|Compiling|Running)\b', re.I)
+_LOGGED_IN_RE = re.compile(r'<span><a href="/profile/([^"]+)">([^<]+)</a></span>')
+
+# Page parts the parsers read (see scrape/parsing.py)
+_LIST_PARTS = parts("table")
+_DETAIL_PARTS = parts("table", {"id": re.compile(r"^subtask_results_div_\d+")})
+_PROFILE_PARTS = parts("a")
+
+def _parse_ojuz_submission_details(html):
+    """
+    total_score, subtask_scores and pending of an oj.uz submission page
+    (text, or a tree already parsed with _DETAIL_PARTS).
+    """
+    soup = html if isinstance(html, BeautifulSoup) else parse_html(html, only=_DETAIL_PARTS)
+
+    # Extract subtask scores
+    subtask_scores = []
+    total_score = 0
+
+    # Find all subtask panels
+    subtask_divs = soup.find_all('div', id=re.compile(r'subtask_results_div_\d+'))
+
+    for subtask_div in subtask_divs:
+        try:
+            # Find the subtask score span
+            score_span = subtask_div.find('span', class_=re.compile(r'subtask-score'))
+            if score_span:
+                # Extract score text like "17 / 17" or "0 / 6" or "39.61 / 100"
+                score_text = score_span.get_text().strip()
+                score_match = _SCORE_RE.search(score_text)
+                if score_match:
+                    earned = float(score_match.group(1))
+                    # Round to 2 decimal places and convert to int if it's a whole number
+                    earned_rounded = round(earned, 2)
+                    if earned_rounded == int(earned_rounded):
+                        earned_rounded = int(earned_rounded)
+                    total_score += earned_rounded
+                    subtask_scores.append(earned_rounded)
+                else:
+                    subtask_scores.append(0)
+            else:
+                subtask_scores.append(0)
+        except Exception as e:
+            print(f"Error parsing subtask panel: {e}")
+            subtask_scores.append(0)
+
+    return {
+        'total_score': total_score,
+        'subtask_scores': subtask_scores,
+        'pending': looks_pending(soup),
+    }
 
 def sync_ojuz_submissions(active_contest, ojuz_username):
     """
@@ -17,6 +81,7 @@ def sync_ojuz_submissions(active_contest, ojuz_username):
     
     Args:
         active_contest: The active contest object with user_id, contest_name, contest_stage, start_time, end_time
+                        (and contest_id, looked up from name/stage when missing)
         ojuz_username: The user's oj.uz username
         
     Returns:
@@ -34,36 +99,25 @@ def sync_ojuz_submissions(active_contest, ojuz_username):
     start_dt = datetime.fromisoformat(contest_start_time.replace('Z', '+00:00'))
     end_dt = datetime.fromisoformat(contest_end_time.replace('Z', '+00:00'))
     
-    if contest_stage is not None:
-        contest_problems = db.execute('''
-            SELECT 
-                cp.problem_index,
-                p.name as problem_name,
-                pl.url as problem_link
-            FROM contest_problems cp
-            JOIN problems p ON cp.problem_source = p.source 
-                            AND cp.problem_year = p.year 
-                            AND cp.problem_number = p.number
-            JOIN problem_links pl ON p.id = pl.problem_id
-            WHERE cp.contest_name = ? AND cp.contest_stage = ?
-              AND pl.platform = 'oj.uz'
-            ORDER BY cp.problem_index
-        ''', (contest_name, contest_stage)).fetchall()
-    else:
-        contest_problems = db.execute('''
-            SELECT 
-                cp.problem_index,
-                p.name as problem_name,
-                pl.url as problem_link
-            FROM contest_problems cp
-            JOIN problems p ON cp.problem_source = p.source 
-                            AND cp.problem_year = p.year 
-                            AND cp.problem_number = p.number
-            JOIN problem_links pl ON p.id = pl.problem_id
-            WHERE cp.contest_name = ? AND cp.contest_stage IS NULL
-              AND pl.platform = 'oj.uz'
-            ORDER BY cp.problem_index
-        ''', (contest_name,)).fetchall()
+    contest_id = active_contest.get('contest_id')
+    if contest_id is None:
+        row = db.execute('SELECT id FROM contests WHERE name = ? AND stage IS ?', (contest_name, contest_stage)).fetchone()
+        contest_id = row['id'] if row else None
+
+    contest_problems = db.execute('''
+        SELECT 
+            cp.problem_index,
+            p.name as problem_name,
+            pl.url as problem_link
+        FROM contest_problems cp
+        JOIN problems p ON cp.problem_source = p.source 
+                        AND cp.problem_year = p.year 
+                        AND cp.problem_number = p.number
+        JOIN problem_links pl ON p.id = pl.problem_id
+        WHERE cp.contest_id = ?
+          AND pl.platform = 'oj.uz'
+        ORDER BY cp.problem_index
+    ''', (contest_id,)).fetchall()
     
     print(f"Found {len(contest_problems)} oj.uz problems for contest {contest_name}, stage: {contest_stage}")
     for row in contest_problems:
@@ -92,17 +146,18 @@ def sync_ojuz_submissions(active_contest, ojuz_username):
     # Step 1: Get all relevant submissions from the submissions page(s)
     relevant_submissions = []
     submissions_url = f"https://oj.uz/submissions?handle={ojuz_username}"
+    pages_scanned = 0
     
     while submissions_url:
         print(f"Fetching submissions page: {submissions_url}")
         
         try:
-            response = requests.get(submissions_url, headers=headers, timeout=10)
+            response = client.get(submissions_url, headers=headers, timeout=10)
             if response.status_code != 200:
                 print(f"Failed to fetch submissions page: {response.status_code}")
                 break
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = parse_html(response.text, only=_LIST_PARTS)
             
             # Find all submission rows in the table
             submission_rows = soup.select('table.table tbody tr')
@@ -174,8 +229,9 @@ def sync_ojuz_submissions(active_contest, ojuz_username):
                 submissions_url = f"https://oj.uz/submissions?handle={ojuz_username}&direction=down&id={last_submission_id}"
             else:
                 submissions_url = None
-                
-            time.sleep(0.5)  # Rate limiting
+
+            pages_scanned += 1
+            emit_progress('page', platform='oj.uz', page=pages_scanned, submissions=len(relevant_submissions))
             
         except Exception as e:
             print(f"Error fetching submissions page: {e}")
@@ -191,134 +247,58 @@ def sync_ojuz_submissions(active_contest, ojuz_username):
                 submission_url = f"https://oj.uz/submission/{submission_info['submission_id']}"
                 print(f"Fetching submission details: {submission_url}")
                 
-                response = requests.get(submission_url, headers=headers, timeout=10)
+                response = client.get(submission_url, headers=headers, timeout=10)
                 if response.status_code != 200:
                     print(f"Failed to fetch submission {submission_info['submission_id']}")
                     return None
                 
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Extract subtask scores
-                subtask_scores = []
-                total_score = 0
-                
-                # Find all subtask panels
-                subtask_divs = soup.find_all('div', id=re.compile(r'subtask_results_div_\d+'))
-                
-                for subtask_div in subtask_divs:
-                    try:
-                        # Find the subtask score span
-                        score_span = subtask_div.find('span', class_=re.compile(r'subtask-score'))
-                        if score_span:
-                            # Extract score text like "17 / 17" or "0 / 6" or "39.61 / 100"
-                            score_text = score_span.get_text().strip()
-                            score_match = re.search(r'([0-9]+(?:\.[0-9]+)?)\s*/\s*([0-9]+(?:\.[0-9]+)?)', score_text)
-                            if score_match:
-                                earned = float(score_match.group(1))
-                                max_points = float(score_match.group(2))
-                                # Round to 2 decimal places and convert to int if it's a whole number
-                                earned_rounded = round(earned, 2)
-                                if earned_rounded == int(earned_rounded):
-                                    earned_rounded = int(earned_rounded)
-                                total_score += earned_rounded
-                                subtask_scores.append(earned_rounded)
-                            else:
-                                subtask_scores.append(0)
-                        else:
-                            subtask_scores.append(0)
-                    except Exception as e:
-                        print(f"Error parsing subtask in submission {submission_info['submission_id']}: {e}")
-                        subtask_scores.append(0)
-                
                 return {
-                    'submission_id': submission_info['submission_id'],
-                    'submission_time': submission_info['submission_time'],
-                    'problem_index': submission_info['problem_index'],
-                    'problem_name': submission_info['problem_name'],
-                    'problem_link': submission_info['problem_link'],
-                    'total_score': total_score,
-                    'subtask_scores': subtask_scores
+                    'problem_ref': submission_info['problem_link'],
+                    **_parse_ojuz_submission_details(response.text),
                 }
                 
             except Exception as e:
                 print(f"Error fetching submission {submission_info['submission_id']}: {e}")
                 return None
         
-        # Fetch all submission details in parallel
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            results = executor.map(fetch_submission_details, relevant_submissions)
-            for result in results:
-                if result:
-                    detailed_submissions.append(result)
-                time.sleep(0.2)  # Rate limiting between requests
+        # Judged submissions come from platform_submissions; the rest are fetched in parallel
+        details = fetch_details(db, 'oj.uz', relevant_submissions, fetch_submission_details)
+        for submission_info, result in zip(relevant_submissions, details):
+            if result:
+                detailed_submissions.append({
+                    'submission_id': submission_info['submission_id'],
+                    'submission_time': submission_info['submission_time'],
+                    'problem_index': submission_info['problem_index'],
+                    'problem_name': submission_info['problem_name'],
+                    'problem_link': submission_info['problem_link'],
+                    'total_score': result['total_score'],
+                    'subtask_scores': result['subtask_scores']
+                })
     
     print(f"Successfully fetched details for {len(detailed_submissions)} submissions")
+    emit_progress('submissions', platform='oj.uz', fetched=len(detailed_submissions), total=len(relevant_submissions))
     
     # Step 3: Calculate best scores per problem and save to database
-    problem_best_scores = {}  # problem_index -> {'total_score': X, 'subtask_scores': [], 'earliest_improvement_time': str}
+    problem_best_scores = best_subtasks(  # problem_index -> {'total_score', 'subtask_scores', 'earliest_improvement_time'}
+        [s['problem_index'] for s in detailed_submissions],
+        [s['submission_time'] for s in detailed_submissions],
+        [s['subtask_scores'] for s in detailed_submissions],
+        [s['total_score'] for s in detailed_submissions],
+    )
     
     for submission in detailed_submissions:
-        problem_idx = submission['problem_index']
-        
-        if problem_idx not in problem_best_scores:
-            problem_best_scores[problem_idx] = {
-                'total_score': submission['total_score'],
-                'subtask_scores': submission['subtask_scores'][:],
-                'earliest_improvement_time': submission['submission_time']
-            }
-        else:
-            # Update with maximum scores per subtask
-            current_best = problem_best_scores[problem_idx]
-            new_subtask_scores = []
-            improved = False
-            
-            max_len = max(len(current_best['subtask_scores']), len(submission['subtask_scores']))
-            for i in range(max_len):
-                current_score = current_best['subtask_scores'][i] if i < len(current_best['subtask_scores']) else 0
-                new_score = submission['subtask_scores'][i] if i < len(submission['subtask_scores']) else 0
-                max_score = max(current_score, new_score)
-                new_subtask_scores.append(max_score)
-                
-                # Check if this submission improved any subtask
-                if new_score > current_score:
-                    improved = True
-            
-            new_total_score = sum(new_subtask_scores)
-            
-            # If this submission improved the total score, update the earliest improvement time
-            if new_total_score > current_best['total_score']:
-                # Parse submission times to compare which is earlier
-                current_time = datetime.fromisoformat(current_best['earliest_improvement_time'].replace('Z', '+00:00'))
-                submission_time = datetime.fromisoformat(submission['submission_time'].replace('Z', '+00:00'))
-                earliest_time = min(current_time, submission_time).isoformat().replace('+00:00', 'Z')
-                
-                problem_best_scores[problem_idx] = {
-                    'total_score': new_total_score,
-                    'subtask_scores': new_subtask_scores,
-                    'earliest_improvement_time': earliest_time
-                }
-            elif improved:
-                # Even if total didn't improve, if any subtask improved, consider updating time if this is earlier
-                submission_time = datetime.fromisoformat(submission['submission_time'].replace('Z', '+00:00'))
-                current_time = datetime.fromisoformat(current_best['earliest_improvement_time'].replace('Z', '+00:00'))
-                
-                if submission_time < current_time:
-                    problem_best_scores[problem_idx]['earliest_improvement_time'] = submission['submission_time']
-                
-                # Update subtask scores even if total didn't improve
-                problem_best_scores[problem_idx]['subtask_scores'] = new_subtask_scores
-        
         # Save individual submission to database
         db.execute('''
             INSERT OR REPLACE INTO user_virtual_submissions 
-            (user_id, contest_name, contest_stage, submission_time, problem_index, score, subtask_scores)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (user_id, contest_name, contest_stage, contest_id, submission_time, problem_index, score, subtask_scores, platform, submission_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'oj.uz', ?)
         ''', (
-            user_id, contest_name, contest_stage,
+            user_id, contest_name, contest_stage, contest_id,
             submission['submission_time'],
             submission['problem_index'],
             submission['total_score'],
-            json.dumps(submission['subtask_scores'])
+            json.dumps(submission['subtask_scores']),
+            int(submission['submission_id'])
         ))
     
     db.commit()
@@ -370,11 +350,11 @@ def verify_ojuz():
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
     }
     try:
-        response = requests.get(homepage_url, headers=headers, timeout=5)
+        response = client.get(homepage_url, headers=headers, timeout=5)
         if response.status_code != 200:
             return jsonify({"error": "Failed to fetch homepage"}), 500
         # Look for logged-in username
-        match = re.search(r'<span><a href="/profile/([^"]+)">([^<]+)</a></span>', response.text)
+        match = _LOGGED_IN_RE.search(response.text)
         if not match:
             return jsonify({"valid": False}), 400
         username = match.group(2).strip()
@@ -410,13 +390,250 @@ def verify_ojuz():
     except Exception as e:
         return jsonify({"error": f"Error fetching homepage: {str(e)}"}), 500
     
+def _ojuz_logged_in_user(headers):
+    """The handle the oj.uz homepage shows as logged in with `headers`' cookie, or None."""
+    response = client.get('https://oj.uz', headers=headers, timeout=10)
+    if response.status_code != 200:
+        raise RuntimeError(f'oj.uz homepage returned {response.status_code}')
+    match = _LOGGED_IN_RE.search(response.text)
+    return match.group(2).strip() if match else None
+
+def _ojuz_username(db, user_id):
+    """The user's configured oj.uz handle, or None."""
+    row = db.execute(
+        "SELECT platform_usernames FROM user_settings WHERE user_id = ?",
+        (user_id,)
+    ).fetchone()
+    if not row or not row["platform_usernames"]:
+        return None
+    try:
+        return (json.loads(row["platform_usernames"]) or {}).get("oj.uz")
+    except Exception:
+        return None
+
+def _parse_ojuz_submission_rows(html):
+    """
+    Rows of an oj.uz submissions list page (text, or a tree parsed with
+    _LIST_PARTS), newest first: {submission_id, submission_time, problem_link,
+    score}. score is the result as a percentage, or None while the row is
+    still judging or shows no score.
+    """
+    soup = html if isinstance(html, BeautifulSoup) else parse_html(html, only=_LIST_PARTS)
+    rows = []
+    for table in soup.select('table.table'):
+        col = result_column(table)
+        for row in table.select('tbody tr'):
+            time_span = row.find('span', {'data-timestamp-iso': True})
+            submission_link = row.find('a', href=re.compile(r'/submission/\d+'))
+            problem_link_elem = row.find('a', href=re.compile(r'/problem/view/'))
+            if not time_span or not submission_link or not problem_link_elem:
+                continue
+            # The result column shows "earned / max" in a progress bar once
+            # judged; the title and handle are not read (a problem may be
+            # called "Running Man")
+            text = result_text(row, col)
+            m = _SCORE_RE.search(text)
+            score = None
+            if _JUDGING_RE.search(text):
+                pass
+            elif m and float(m.group(2)) > 0:
+                score = round(float(m.group(1)) / float(m.group(2)) * 100)
+            elif _ZERO_RE.search(text):
+                score = 0
+            rows.append({
+                'submission_id': submission_link['href'].split('/')[-1],
+                'submission_time': time_span['data-timestamp-iso'],
+                'problem_link': 'https://oj.uz' + problem_link_elem['href'],
+                'score': score,
+            })
+    return rows
+
+def _scan_ojuz_submissions(username, stop_id=None, max_pages=None):
+    """
+    Walk a user's oj.uz submissions newest-first until submission `stop_id`
+    (exclusive), the end of the history, or `max_pages`. Returns
+    (rows, complete); complete is False if a page failed to load.
+    """
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+    url = f"https://oj.uz/submissions?handle={username}"
+    rows = []
+    pages = 0
+    last_id = None
+    while url:
+        try:
+            response = client.get(url, headers=headers, timeout=10)
+        except Exception as e:
+            print(f"[OJUZ FULLSYNC] Error fetching submissions page: {e}")
+            return rows, False
+        if response.status_code != 200:
+            print(f"[OJUZ FULLSYNC] Submissions page returned {response.status_code}")
+            return rows, False
+        page_rows = _parse_ojuz_submission_rows(response.text)
+        # the next page may repeat the row it was anchored at
+        page_rows = [r for r in page_rows if last_id is None or int(r['submission_id']) < last_id]
+        pages += 1
+        if not page_rows:
+            break
+        for row in page_rows:
+            if stop_id is not None and int(row['submission_id']) <= stop_id:
+                return rows, True
+            rows.append(row)
+        emit_progress('page', platform='oj.uz', page=pages, submissions=len(rows))
+        if max_pages is not None and pages >= max_pages:
+            break
+        last_id = int(page_rows[-1]['submission_id'])
+        url = f"https://oj.uz/submissions?handle={username}&direction=down&id={last_id}"
+    return rows, True
+
 def update_ojuz_scores():
+    """Queue a full oj.uz sync for the caller; poll GET /api/jobs/<id> for the result."""
     data = request.get_json()
     oidc_auth = data.get('cookie')
     if not oidc_auth:
         return jsonify({'error': 'Missing oidc-auth cookie'}), 400
 
-    user_id = request.user_id
+    db = get_db()
+    job_id = enqueue_job(db, 'ojuz_full_sync', {'cookie': seal_secret(oidc_auth)}, user_id=request.user_id)
+    db.commit()
+    return jsonify({'job_id': job_id}), 202
+
+def _fetch_problem_scores(problems, headers):
+    """Read the user's score off each problem page (8 at a time); [(problem, score)]."""
+    def fetch_score(problem):
+        print("Fetching:", problem['link'])
+        try:
+            res = client.get(problem['link'], headers=headers, timeout=5, allow_redirects=True)
+            match = re.search(r"circleProgress\(\s*{\s*value:\s*([0-9.]+)", res.text)
+            if match:
+                score = round(float(match.group(1)) * 100)
+                print("Score for", problem['name'], ":", score)
+                return (problem, score)
+            else:
+                print("No score found for", problem['name'])
+        except Exception as e:
+            print("Error fetching", problem['name'], ":", e)
+        return None
+
+    results = []
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for checked, result in enumerate(executor.map(fetch_score, problems), 1):
+            if result is not None:
+                results.append(result)
+            if checked % 10 == 0 or checked == len(problems):
+                emit_progress('problems', platform='oj.uz', checked=checked, total=len(problems), scored=len(results))
+    return results
+
+def _scores_from_problem_pages(oj_username, oj_problems, cursor, headers):
+    """
+    OJUZ_SYNC_MODE=problems: open the page of every problem on the user's
+    profile (or, with a cursor, of every problem submitted to since).
+    Returns (results, complete, scanned submissions).
+    """
+    incremental = False
+    expect_all = False      # every fetched problem should have a score (they all have submissions)
+    scanned, scan_complete = [], False
+    if cursor:
+        scanned, scan_complete = _scan_ojuz_submissions(oj_username, stop_id=cursor['last_submission_id'])
+        if scan_complete:
+            touched = {row['problem_link'] for row in scanned}
+            before = len(oj_problems)
+            oj_problems = [p for p in oj_problems if p['link'] in touched]
+            incremental = expect_all = True
+            print(f"[OJUZ FULLSYNC] {len(scanned)} submissions since the cursor; rechecking {len(oj_problems)}/{before} problems.")
+
+    # Pre-filter via profile page to skip irrelevant problems
+    # Only keep problems that appear on the user's profile
+    # (either solved or submitted but unsolved).
+    try:
+        if oj_username and not incremental:
+            profile_url = f"https://oj.uz/profile/{oj_username}"
+            print(f"[OJUZ FULLSYNC] Fetching profile: {profile_url}")
+            prof_res = client.get(profile_url, headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}, timeout=10)
+            if prof_res.status_code == 200:
+                prof_soup = parse_html(prof_res.text, only=_PROFILE_PARTS)
+                # Collect all problem links that appear on the profile
+                profile_links = set()
+                for a in prof_soup.find_all('a', href=True):
+                    href = a['href']
+                    if href.startswith('/problem/view/'):
+                        profile_links.add('https://oj.uz' + href)
+                if profile_links:
+                    before = len(oj_problems)
+                    oj_problems = [p for p in oj_problems if p['link'] in profile_links]
+                    after = len(oj_problems)
+                    expect_all = True
+                    print(f"[OJUZ FULLSYNC] Profile pre-filter kept {after}/{before} problems.")
+            else:
+                print(f"[OJUZ FULLSYNC] Profile fetch failed with status {prof_res.status_code}, skipping pre-filter.")
+        elif not oj_username:
+            print("[OJUZ FULLSYNC] No oj.uz username stored; skipping profile pre-filter.")
+    except Exception as e:
+        print(f"[OJUZ FULLSYNC] Profile pre-filter error: {e}")
+
+    if oj_username and not incremental:
+        # every problem gets rechecked below, so the newest submission is the new cursor
+        scanned, scan_complete = _scan_ojuz_submissions(oj_username, max_pages=1)
+
+    emit_progress('started', platform='oj.uz', problems=len(oj_problems), incremental=incremental)
+
+    results = _fetch_problem_scores(oj_problems, headers)
+
+    # If nothing succeeded then treat cookie as invalid
+    if not results and oj_problems:
+        raise JobFailed('Invalid or expired cookie')
+    return results, scan_complete and (not expect_all or len(results) == len(oj_problems)), scanned
+
+def _scores_from_submissions(db, oj_username, oj_problems, cursor, headers):
+    """
+    OJUZ_SYNC_MODE=submissions: walk the user's submissions list (back to the
+    cursor, or all of it) and take each problem's best row. Rows without a
+    score in the list are looked up in the submission cache, and only
+    problems where that still leaves a doubt get their problem page read.
+    Cached totals are taken as percentages, as oj.uz problems are scored
+    out of 100. Returns (results, complete, scanned submissions).
+    """
+    # The list is public, so a bad cookie would only show on the problem
+    # pages of ambiguous rows; check it before walking the history
+    if _ojuz_logged_in_user(headers) is None:
+        raise JobFailed('Invalid or expired cookie')
+    stop_id = cursor['last_submission_id'] if cursor else None
+    scanned, complete = _scan_ojuz_submissions(oj_username, stop_id=stop_id)
+    if not complete and not scanned:
+        raise RuntimeError('Could not load the oj.uz submissions list')
+
+    by_link = {p['link']: p for p in oj_problems}
+    best, unscored = {}, {}
+    for row in scanned:
+        link = row['problem_link']
+        if link not in by_link:
+            continue
+        if row['score'] is None:
+            unscored.setdefault(link, []).append(row['submission_id'])
+        else:
+            best[link] = max(best.get(link, 0), row['score'])
+
+    cached = load_cached(db, 'oj.uz', [i for ids in unscored.values() for i in ids])
+    ambiguous = []
+    for link, ids in unscored.items():
+        scores = [cached[i]['total_score'] for i in ids if i in cached]
+        if scores:
+            best[link] = max(best.get(link, 0), min(100, round(max(scores))))
+        if len(scores) < len(ids) and best.get(link, 0) < 100:
+            ambiguous.append(by_link[link])
+    print(f"[OJUZ FULLSYNC] {len(scanned)} submissions scanned, {len(best)} problems scored, "
+          f"{len(ambiguous)} ambiguous{' (partial scan)' if not complete else ''}.")
+    emit_progress('started', platform='oj.uz', problems=len(best) + len(ambiguous), incremental=cursor is not None)
+
+    if ambiguous:
+        fetched = _fetch_problem_scores(ambiguous, headers)
+        for problem, score in fetched:
+            best[problem['link']] = max(best.get(problem['link'], 0), score)
+        complete = complete and len(fetched) == len(ambiguous)
+    results = [(by_link[link], score) for link, score in best.items()]
+    return results, complete, scanned
+
+def run_ojuz_full_sync(user_id, oidc_auth):
+    """Job handler for 'ojuz_full_sync': fetch every oj.uz score and store the maxima."""
     db = get_db()
 
     # Step 1: Fetch all oj.uz problems + current progress
@@ -447,16 +664,17 @@ def update_ojuz_scores():
 
     progress_rows = db.execute(
         f"""
-        SELECT problem_name, source, year, status, score
-        FROM problem_statuses
-        WHERE user_id = ? AND source IN ({placeholders})
+        SELECT ps.problem_id, ps.status, ps.score
+        FROM problem_statuses ps
+        JOIN problems p ON p.id = ps.problem_id
+        WHERE ps.user_id = ? AND p.source IN ({placeholders})
         """,
         (user_id, *sources)
     ).fetchall()
 
     # Organize progress
     progress = {
-        (row['problem_name'], row['source'], row['year']): {
+        row['problem_id']: {
             'status': row['status'],
             'score': row['score']
         }
@@ -466,6 +684,7 @@ def update_ojuz_scores():
     # Only oj.uz problems
     oj_problems = [
         {
+            'id': row['id'],
             'name': row['name'],
             'link': row['oj_url'],
             'source': row['source'],
@@ -474,82 +693,30 @@ def update_ojuz_scores():
         for row in oj_rows
     ]
 
-    # Pre-filter via profile page to skip irrelevant problems
-    # Only keep problems that appear on the user's profile
-    # (either solved or submitted but unsolved).
-    try:
-        prof_row = db.execute(
-            "SELECT platform_usernames FROM user_settings WHERE user_id = ?",
-            (user_id,)
-        ).fetchone()
-        oj_username = None
-        if prof_row and prof_row["platform_usernames"]:
-            try:
-                _pu = json.loads(prof_row["platform_usernames"]) or {}
-                oj_username = _pu.get("oj.uz")
-            except Exception:
-                oj_username = None
+    oj_username = _ojuz_username(db, user_id)
 
-        if oj_username:
-            profile_url = f"https://oj.uz/profile/{oj_username}"
-            print(f"[OJUZ FULLSYNC] Fetching profile: {profile_url}")
-            prof_res = requests.get(profile_url, headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'}, timeout=10)
-            if prof_res.status_code == 200:
-                prof_soup = BeautifulSoup(prof_res.text, 'html.parser')
-                # Collect all problem links that appear on the profile
-                profile_links = set()
-                for a in prof_soup.find_all('a', href=True):
-                    href = a['href']
-                    if href.startswith('/problem/view/'):
-                        profile_links.add('https://oj.uz' + href)
-                if profile_links:
-                    before = len(oj_problems)
-                    oj_problems = [p for p in oj_problems if p['link'] in profile_links]
-                    after = len(oj_problems)
-                    print(f"[OJUZ FULLSYNC] Profile pre-filter kept {after}/{before} problems.")
-            else:
-                print(f"[OJUZ FULLSYNC] Profile fetch failed with status {prof_res.status_code}, skipping pre-filter.")
-        else:
-            print("[OJUZ FULLSYNC] No oj.uz username stored; skipping profile pre-filter.")
-    except Exception as e:
-        print(f"[OJUZ FULLSYNC] Profile pre-filter error: {e}")
+    # With a cursor from the previous full sync, only problems that got a
+    # submission since then need their score page re-read
+    problems_key = problem_set_key(p['link'] for p in oj_problems)
+    cursor = get_cursor(db, user_id, 'oj.uz') if oj_username else None
+    if cursor and not cursor_matches(cursor, oj_username, problems_key):
+        print("[OJUZ FULLSYNC] Handle or problem set changed; rechecking every problem.")
+        reset_cursor(db, user_id, 'oj.uz')
+        db.commit()
+        cursor = None
 
-    # Step 2: Fetch scores using threads
     headers = {
         'Cookie': f'oidc-auth={oidc_auth}',
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
     }
-
-    def fetch_score(problem):
-        print("Fetching:", problem['link'])
-        try:
-            time.sleep(random.uniform(0.2, 0.5))
-            res = requests.get(problem['link'], headers=headers, timeout=5, allow_redirects=True)
-            match = re.search(r"circleProgress\(\s*{\s*value:\s*([0-9.]+)", res.text)
-            if match:
-                score = round(float(match.group(1)) * 100)
-                print("Score for", problem['name'], ":", score)
-                return (problem, score)
-            else:
-                print("No score found for", problem['name'])
-        except Exception as e:
-            print("Error fetching", problem['name'], ":", e)
-        return None
-
-    results = []
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        for result in executor.map(fetch_score, oj_problems):
-            if result is not None:
-                results.append(result)
-                
-    # If nothing succeeded then treat cookie as invalid
-    if not results:
-        return jsonify({'error': 'Invalid or expired cookie'}), 401
+    if oj_username and OJUZ_SYNC_MODE == 'submissions':
+        results, complete, scanned = _scores_from_submissions(db, oj_username, oj_problems, cursor, headers)
+    else:
+        results, complete, scanned = _scores_from_problem_pages(oj_username, oj_problems, cursor, headers)
 
     updated = 0
     for problem, new_score in results:
-        key = (problem['name'], problem['source'], problem['year'])
-        old = progress.get(key, {'status': 0, 'score': 0})
+        old = progress.get(problem['id'], {'status': 0, 'score': 0})
 
         # Set new score to max(new score, old score)
         new_score = max(new_score, old['score'])
@@ -565,19 +732,22 @@ def update_ojuz_scores():
         # Always update the entry, even if the score hasn't changed
         db.execute(
             '''
-            INSERT INTO problem_statuses (user_id, problem_name, source, year, score, status)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(user_id, problem_name, source, year)
+            INSERT INTO problem_statuses (user_id, problem_id, score, status)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, problem_id)
             DO UPDATE SET score = ?, status = ?
             ''',
-            (
-                user_id, problem['name'], problem['source'], problem['year'], new_score, new_status,
-                new_score, new_status
-            )
+            (user_id, problem['id'], new_score, new_status, new_score, new_status)
         )
         updated += 1
         print(f"Updated {problem['name']} to score {new_score} and status {new_status}")
 
+    if updated:
+        record_progress_changes(db, user_id, [p['id'] for p, _ in results])
+    # Advance the cursor only if nothing was missed
+    newest = newest_settled(scanned) if complete else None
+    if newest:
+        save_cursor(db, user_id, 'oj.uz', oj_username, problems_key, *newest)
     db.commit()
-    db.close()
-    return jsonify({'updated': updated, 'total_checked': len(results)}), 200
\ No newline at end of file
+    emit_progress('updated', platform='oj.uz', problems=updated)
+    return {'updated': updated, 'total_checked': len(results)}
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+HTML parsing for the scrapers.
+
+parse_html() builds a BeautifulSoup tree with the fastest tree builder
+installed: lxml when it is importable, html.parser otherwise. HTML_PARSER
+(auto | lxml | html.parser) pins one. Callers keep the BeautifulSoup API, so
+select()/find() code is the same for every backend.
+
+Most pages are only read for a table or a few panels. Passing only=parts(...)
+makes the tree builder skip everything else: only matching top-level
+elements (with their whole subtree) become Tag objects, which saves most of
+the tree-building time and memory on large pages.
+"""
+import os
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.filter import ElementFilter
+
+try:
+    import lxml  # noqa: F401
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+HTML_PARSER = os.getenv("HTML_PARSER", "auto")
+
+def available_parsers() -> list[str]:
+    return ["lxml", "html.parser"] if HAVE_LXML else ["html.parser"]
+
+def default_parser() -> str:
+    if HTML_PARSER == "auto":
+        return available_parsers()[0]
+    if HTML_PARSER == "lxml" and not HAVE_LXML:
+        print("[parsing] HTML_PARSER=lxml but lxml is not installed; using html.parser")
+        return "html.parser"
+    return HTML_PARSER
+
+PARSER = default_parser()
+
+class AnyOf(ElementFilter):
+    """parse_only filter that keeps an element if any of its strainers would."""
+
+    def __init__(self, *strainers):
+        super().__init__()
+        self.strainers = strainers
+
+    @property
+    def includes_everything(self) -> bool:
+        return False
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return any(s.allow_tag_creation(nsprefix, name, attrs) for s in self.strainers)
+
+    def allow_string_creation(self, string) -> bool:
+        return False
+
+def parts(*rules) -> AnyOf:
+    """
+    Parts of a page to keep: each rule is a tag name or a dict of
+    SoupStrainer keyword arguments, e.g. parts("table", {"id": re.compile(...)}).
+    Multi-valued attributes are matched as the raw attribute string, so match
+    a single class with a \\b-anchored regex.
+    """
+    return AnyOf(*(SoupStrainer(**r) if isinstance(r, dict) else SoupStrainer(r) for r in rules))
+
+def parse_html(markup, only=None, parser=None) -> BeautifulSoup:
+    """BeautifulSoup tree of `markup`, restricted to `only` (see parts()) if given."""
+    return BeautifulSoup(markup, parser or PARSER, parse_only=only)
@@ -1,16 +1,37 @@
 from flask import request, jsonify
 from datetime import datetime, timezone, timedelta
-from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 import cloudscraper
 import re
-import time
 import json
 import os
 import hashlib
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from database.db import get_db
+from scrape.client import configure_session
+from scrape.parsing import parse_html, parts
+from scrape.submissions import fetch_details, looks_pending, load_cached, store
+from scrape.aggregate import best_subtasks
+from scrape.tokens import TokenManager
+from scrape.scraper_pool import ScraperPool
+from scrape.cursor import (
+    problem_set_key, get_cursor, cursor_matches, reset_cursor, save_cursor,
+    newest_settled, load_best, save_best,
+)
+from progress.progress import record_progress_changes
+from jobs.jobs import enqueue_job, seal_secret, JobFailed, emit_progress
 
 BASE = "https://qoj.ac"
+# Page parts the parsers read (see scrape/parsing.py)
+_LIST_PARTS = parts("table", "p")                    # submission rows + "Server Time"
+_DETAIL_PARTS = parts("a", "table", {"class_": re.compile(r"\bcard-header\b")})
+_PAGER_PARTS = parts("ul", "ol")
+QOJ_PAGE_WORKERS = int(os.getenv("QOJ_PAGE_WORKERS", "4"))      # submission pages fetched at once
+QOJ_DETAIL_WORKERS = int(os.getenv("QOJ_DETAIL_WORKERS", "6"))  # submission detail pages fetched at once
+# Session of the QOJ_USER bot account, shared by every sync (see scrape/tokens.py)
+QOJ_TOKENS = TokenManager("qoj.ac")
 
 def _iso_to_dt(iso_str: str) -> datetime:
     # "2025-08-25T17:22:12Z" -> aware UTC datetime
@@ -19,17 +40,18 @@ def _iso_to_dt(iso_str: str) -> datetime:
 def _dt_to_iso_utc(dt: datetime) -> str:
     return dt.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
 
-def _make_scraper(qoj_session_id: str | None = None):
-    s = cloudscraper.create_scraper()
-    if qoj_session_id:
-        # QOJ is UOJ-based; the cookie name is UOJSESSID
-        s.cookies.set("UOJSESSID", qoj_session_id, domain="qoj.ac")
+def _new_scraper():
+    s = configure_session(cloudscraper.create_scraper())
     # keep a UA for good measure
     s.headers.update({
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
     })
     return s
 
+# Warm cloudscraper sessions keyed by their UOJSESSID (QOJ is UOJ-based);
+# see scrape/scraper_pool.py
+QOJ_SCRAPERS = ScraperPool("qoj.ac", _new_scraper, cookie="UOJSESSID", domain="qoj.ac", warm_url=BASE)
+
 def _is_logged_in(soup: BeautifulSoup) -> bool:
     """
     Determine if the current page reflects a logged-in session.
@@ -49,22 +71,6 @@ def _is_logged_in(soup: BeautifulSoup) -> bool:
         return True
     return False
 
-def _get_db_token(db) -> str | None:
-    row = db.execute(
-        "SELECT token FROM scraper_auth_tokens WHERE platform = ? ORDER BY rowid DESC LIMIT 1",
-        ("qoj.ac",),
-    ).fetchone()
-    return row["token"] if row and hasattr(row, "keys") and "token" in row.keys() else (row[0] if row else None)
-
-def _save_db_token(db, token: str) -> None:
-    # replace any existing token row(s) for qoj.ac with the new one
-    db.execute("DELETE FROM scraper_auth_tokens WHERE platform = ?", ("qoj.ac",))
-    db.execute(
-        "INSERT INTO scraper_auth_tokens (platform, token) VALUES (?, ?)",
-        ("qoj.ac", token),
-    )
-    db.commit()
-
 def _get_login_token(scraper) -> str:
     r = scraper.get(f"{BASE}/login", timeout=20)
     r.raise_for_status()
@@ -87,55 +93,68 @@ def _perform_login(scraper, username: str, password: str) -> None:
     if resp.text.strip() != "ok":
         raise RuntimeError(f"Login failed, server responded: {resp.text!r}")
 
-def _refresh_qoj_token(db) -> str:
-    """
-    Log into qoj.ac using env vars QOJ_USER / QOJ_PASS and persist a fresh UOJSESSID.
-    Returns the cookie value.
-    """
+def _login_qoj() -> str:
+    """Log into qoj.ac using env vars QOJ_USER / QOJ_PASS; returns the new UOJSESSID."""
     username = os.environ.get("QOJ_USER")
     password = os.environ.get("QOJ_PASS")
     if not username or not password:
         raise RuntimeError("QOJ_USER and QOJ_PASS env vars must be set to refresh session token")
-    scraper = cloudscraper.create_scraper()
-    scraper.headers.update({
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-    })
-    _perform_login(scraper, username, password)
-    # extract the UOJSESSID cookie issued for qoj.ac
-    new_token = None
-    for cookie in scraper.cookies:
-        if cookie.name == "UOJSESSID" and "qoj.ac" in cookie.domain:
-            new_token = cookie.value
-            break
+    # the pool keeps the logged-in session under its new cookie afterwards
+    with QOJ_SCRAPERS.session() as scraper:
+        _perform_login(scraper, username, password)
+        # extract the UOJSESSID cookie issued for qoj.ac
+        new_token = None
+        for cookie in scraper.cookies:
+            if cookie.name == "UOJSESSID" and "qoj.ac" in cookie.domain:
+                new_token = cookie.value
+                break
     if not new_token:
         raise RuntimeError("Login succeeded but UOJSESSID cookie not found")
-    _save_db_token(db, new_token)
     return new_token
 
+def _refresh_qoj_token(db, stale_token: str | None = None) -> str:
+    """
+    Replace the expired bot session `stale_token` and persist it. Concurrent
+    callers share one login (see TokenManager.refresh). Returns the cookie value.
+    """
+    return QOJ_TOKENS.refresh(db, stale_token, _login_qoj)
+
 def _ensure_auth_and_get_max_page(db, username: str):
     """
-    Use the stored token (if any) to probe an extreme submissions page.
+    Use the shared bot token (if any) to probe an extreme submissions page.
     If not logged in, refresh token via login, save it, and retry once.
-    Returns (scraper, max_page).
+    A token that passed this check within SCRAPER_TOKEN_CHECK_TTL is not
+    checked again; the probe then only reads the paginator.
+    Returns (scraper, max_page); the scraper is checked out of QOJ_SCRAPERS
+    and must be released.
     """
-    token = _get_db_token(db)
-    scraper = _make_scraper(token)
+    token = QOJ_TOKENS.current(db)
+    scraper = QOJ_SCRAPERS.acquire(token)
 
     def _probe(scr):
         url = f"{BASE}/submissions?submitter={username}&page=10000000"
         r = scr.get(url, timeout=20)
         r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = parse_html(r.text)
         return soup
 
-    soup = _probe(scraper)
-    if not _is_logged_in(soup):
-        print("[auth] Stored qoj.ac session is invalid; refreshing token via login…")
-        token = _refresh_qoj_token(db)
-        scraper = _make_scraper(token)
+    try:
+        if QOJ_TOKENS.recently_valid(token):
+            return scraper, _discover_max_page(scraper, username)
         soup = _probe(scraper)
         if not _is_logged_in(soup):
-            raise RuntimeError("Authentication failed: still not logged in after refreshing token")
+            print("[auth] Stored qoj.ac session is invalid; refreshing token via login…")
+            QOJ_SCRAPERS.release(scraper, discard=True)
+            token = _refresh_qoj_token(db, token)
+            scraper = QOJ_SCRAPERS.acquire(token)
+            soup = _probe(scraper)
+            if not _is_logged_in(soup):
+                QOJ_TOKENS.invalidate(token)
+                raise RuntimeError("Authentication failed: still not logged in after refreshing token")
+    except BaseException:
+        QOJ_SCRAPERS.release(scraper, discard=True)
+        raise
+    QOJ_TOKENS.mark_valid(token)
 
     # derive max page number from the pagination controls
     active = soup.select_one("li.page-item.active a.page-link")
@@ -163,7 +182,7 @@ def _discover_max_page(scraper, username: str) -> int:
     url = f"{BASE}/submissions?submitter={username}&page=10000000"
     r = scraper.get(url, timeout=20)
     r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
+    soup = parse_html(r.text, only=_PAGER_PARTS)
 
     active = soup.select_one("li.page-item.active a.page-link")
     if active:
@@ -204,8 +223,9 @@ def _parse_server_time_offset(soup: BeautifulSoup) -> timedelta:
     # offset = server_local - utc_now (i.e., how far ahead of UTC the server clock is)
     return server_naive - now_utc
 
-def _parse_submissions_rows_for_page(html: str, server_offset: timedelta):
+def _parse_submissions_rows_for_page(html, server_offset: timedelta):
     """
+    html may be the page text or a tree already parsed with _LIST_PARTS.
     Returns list of dicts:
     {
       'submission_id': '1260177',
@@ -213,7 +233,7 @@ def _parse_submissions_rows_for_page(html: str, server_offset: timedelta):
       'submission_time_iso': '...Z'
     }
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = html if isinstance(html, BeautifulSoup) else parse_html(html, only=_LIST_PARTS)
     rows = soup.select("table tbody tr")
     results = []
     for row in rows:
@@ -251,6 +271,96 @@ def _parse_submissions_rows_for_page(html: str, server_offset: timedelta):
             continue
     return results, soup  # return soup so caller can reuse if needed
 
+class _SubmissionPages:
+    """
+    A user's qoj.ac submission list (newest first), fetched and parsed page
+    by page. Pages are memoized for the duration of one sync, so pages probed
+    while searching for a boundary are not downloaded again.
+    """
+
+    def __init__(self, scraper, username: str, max_page: int, headers=None, log_prefix=""):
+        self.scraper = scraper
+        self.username = username
+        self.max_page = max_page
+        self.headers = headers
+        self.log_prefix = log_prefix
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def get(self, page: int):
+        """Parsed rows of one page; raises on HTTP errors."""
+        with self._lock:
+            if page in self._pages:
+                return self._pages[page]
+        url = f"{BASE}/submissions?submitter={self.username}&page={page}"
+        print(f"{self.log_prefix}Fetching submissions page: {url}")
+        r = self.scraper.get(url, headers=self.headers, timeout=20)
+        r.raise_for_status()
+        soup = parse_html(r.text, only=_LIST_PARTS)
+        rows, _ = _parse_submissions_rows_for_page(soup, _parse_server_time_offset(soup))
+        with self._lock:
+            self._pages[page] = rows
+        return rows
+
+    def _try_get(self, page: int):
+        try:
+            return self.get(page)
+        except Exception as e:
+            print(f"{self.log_prefix}Error fetching submissions page {page}: {e}")
+            return None
+
+    @property
+    def fetched(self) -> int:
+        return len(self._pages)
+
+    def first_page_where(self, pred, lo: int = 1) -> int:
+        """
+        Smallest page >= lo whose rows satisfy pred, or max_page + 1. pred
+        must be monotone over the newest-first list (false ... false, true
+        ... true). Gallops 1, 2, 4, ... pages ahead, then bisects the last
+        gap, so a boundary near the front costs as few fetches as one deep in
+        the history.
+        """
+        prev, probe, step = lo - 1, lo, 1
+        while probe <= self.max_page and not pred(self.get(probe)):
+            prev, probe, step = probe, probe + step, step * 2
+        lo, hi = prev + 1, min(probe, self.max_page + 1)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if pred(self.get(mid)):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def window(self, start_dt: datetime, end_dt: datetime):
+        """(first, last) pages holding submissions in [start_dt, end_dt], or None."""
+        def oldest(rows):
+            return min(_iso_to_dt(r['submission_time_iso']) for r in rows)
+
+        first = self.first_page_where(lambda rows: not rows or oldest(rows) <= end_dt)
+        if first > self.max_page:
+            return None
+        last = self.first_page_where(lambda rows: not rows or oldest(rows) < start_dt, lo=first)
+        return first, min(last, self.max_page)
+
+    def scan(self, first: int, last: int):
+        """
+        Yield (page, rows) from `first` on. Pages up to `last` are fetched in
+        parallel; later ones, only reached if the caller keeps going (e.g. the
+        list shifted because of new submissions), one at a time. Stops at the
+        first page that cannot be fetched.
+        """
+        todo = [p for p in range(first, last + 1) if p not in self._pages]
+        if len(todo) > 1:
+            with ThreadPoolExecutor(max_workers=QOJ_PAGE_WORKERS) as executor:
+                list(executor.map(self._try_get, todo))
+        for page in range(first, self.max_page + 1):
+            rows = self._try_get(page)
+            if rows is None:
+                return
+            yield page, rows
+
 def _fetch_submission_details(scraper, sub_id: str):
     """
     Returns:
@@ -259,13 +369,21 @@ def _fetch_submission_details(scraper, sub_id: str):
         'problem_id': <int> or None,
         'subtask_scores': [numbers],
         'total_score': float,
+        'pending': bool,   # still waiting/judging; not cached
       }
     """
     url = f"{BASE}/submission/{sub_id}"
     r = scraper.get(url, timeout=20)
     if r.status_code != 200:
         return None
-    soup = BeautifulSoup(r.text, "html.parser")
+    return {"submission_id": sub_id, **_parse_submission_details(r.text)}
+
+def _parse_submission_details(html):
+    """
+    problem_id, subtask_scores, total_score and pending of a submission page
+    (text, or a tree already parsed with _DETAIL_PARTS).
+    """
+    soup = html if isinstance(html, BeautifulSoup) else parse_html(html, only=_DETAIL_PARTS)
 
     # Recover problem id from any /problem/<id> link on the page (robust)
     pid = None
@@ -311,19 +429,132 @@ def _fetch_submission_details(scraper, sub_id: str):
                 pass
 
     return {
-        "submission_id": sub_id,
         "problem_id": pid,
         "subtask_scores": subtask_scores,
         "total_score": total_score,
+        "pending": looks_pending(soup),
     }
 
+def _qoj_detail(scraper, sub_id: str):
+    """_fetch_submission_details in the shape scrape.submissions caches."""
+    det = _fetch_submission_details(scraper, sub_id)
+    if not det:
+        return None
+    return {
+        "problem_ref": det["problem_id"],
+        "total_score": det["total_score"],
+        "subtask_scores": det["subtask_scores"],
+        "pending": det["pending"],
+    }
+
+def _pipelined_details(db, pages, last, detail, keep=lambda row: True, stop_id=None, on_page=None):
+    """
+    Fetch submission pages 1..last and the details of their rows as one
+    pipeline: pages are fetched QOJ_PAGE_WORKERS at a time, each page's rows
+    go to a shared pool of QOJ_DETAIL_WORKERS detail fetchers as soon as the
+    page arrives, and on_page(page, [(row, detail), ...]) runs on the calling
+    thread, in page order, once a page's details are all in. Every request
+    still goes through the per-host rate limiter.
+
+    Rows at or below stop_id are dropped. Past `last` the pipeline follows
+    the list one page at a time while it keeps producing unseen rows and the
+    stop id has not been reached (the list shifts when the user submits
+    mid-sync). Details come from the platform_submissions cache when
+    possible; detail(row) fetches the rest and returns None on failure.
+    Database work stays on the calling thread.
+
+    Returns (scanned, complete): every row newer than stop_id, and False if
+    a page or a detail fetch failed.
+    """
+    events = queue.Queue()
+    seen = set()
+    state = {}        # page -> {'rows', 'details', 'waiting'}
+    fetched = []      # (submission_id, submission_time, detail) to cache
+    scanned = []
+    complete = True
+    outstanding = 0
+    next_page = 1
+
+    def _safe_detail(row):
+        try:
+            return detail(row)
+        except Exception as e:
+            print(f"{pages.log_prefix}Error fetching submission {row['submission_id']}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=QOJ_PAGE_WORKERS) as page_pool, \
+         ThreadPoolExecutor(max_workers=QOJ_DETAIL_WORKERS) as detail_pool:
+
+        def submit_page(page):
+            page_pool.submit(pages._try_get, page).add_done_callback(
+                lambda f, page=page: events.put(('page', page, f.result())))
+
+        def submit_detail(page, i, row):
+            detail_pool.submit(_safe_detail, row).add_done_callback(
+                lambda f, page=page, i=i, row=row: events.put(('detail', page, (i, row, f.result()))))
+
+        for page in range(1, last + 1):
+            submit_page(page)
+            outstanding += 1
+
+        while outstanding:
+            kind, page, payload = events.get()
+            outstanding -= 1
+
+            if kind == 'page':
+                if payload is None:
+                    complete = False
+                    state[page] = {'rows': [], 'details': [], 'waiting': 0}
+                else:
+                    new = [r for r in payload if r['submission_id'] not in seen]
+                    seen.update(r['submission_id'] for r in new)
+                    reached_stop = stop_id is not None and any(int(r['submission_id']) <= stop_id for r in new)
+                    if stop_id is not None:
+                        new = [r for r in new if int(r['submission_id']) > stop_id]
+                    scanned.extend(new)
+                    rows = [r for r in new if keep(r)]
+                    cached = load_cached(db, 'qoj.ac', [r['submission_id'] for r in rows])
+                    details = [cached.get(str(r['submission_id'])) for r in rows]
+                    state[page] = {'rows': rows, 'details': details, 'waiting': 0}
+                    for i, row in enumerate(rows):
+                        if details[i] is None:
+                            submit_detail(page, i, row)
+                            state[page]['waiting'] += 1
+                            outstanding += 1
+                    if page == last and new and not reached_stop:
+                        last += 1
+                        submit_page(last)
+                        outstanding += 1
+            else:
+                i, row, det = payload
+                st = state[page]
+                st['waiting'] -= 1
+                if det is None:
+                    complete = False
+                else:
+                    st['details'][i] = det
+                    fetched.append((row['submission_id'], row['submission_time_iso'], det))
+
+            while next_page in state and state[next_page]['waiting'] == 0:
+                st = state.pop(next_page)
+                if fetched:
+                    store(db, 'qoj.ac', fetched)
+                    db.commit()
+                    fetched = []
+                if on_page:
+                    on_page(next_page, [(r, d) for r, d in zip(st['rows'], st['details']) if d is not None])
+                next_page += 1
+
+    return scanned, complete
+
 def sync_qoj_submissions(active_contest, qoj_username: str):
     """
     Mirrors sync_ojuz_submissions but for qoj.ac.
 
     Args:
         active_contest: dict with keys:
-            user_id, contest_name, contest_stage, start_time (ISO Z), end_time (ISO Z)
+            user_id, contest_name, contest_stage, start_time (ISO Z), end_time (ISO Z),
+            and optionally contest_id (looked up from name/stage when missing)
         qoj_username: QOJ handle (e.g., 'avighna')
 
     Returns:
@@ -349,36 +580,25 @@ def sync_qoj_submissions(active_contest, qoj_username: str):
     end_dt = _iso_to_dt(contest_end_time)
 
     # Pull contest problems that have a qoj.ac link
-    if contest_stage is not None:
-        contest_problems = db.execute('''
-            SELECT 
-                cp.problem_index,
-                p.name as problem_name,
-                pl.url as problem_link
-            FROM contest_problems cp
-            JOIN problems p ON cp.problem_source = p.source 
-                            AND cp.problem_year = p.year 
-                            AND cp.problem_number = p.number
-            JOIN problem_links pl ON p.id = pl.problem_id
-            WHERE cp.contest_name = ? AND cp.contest_stage = ?
-              AND pl.platform = 'qoj.ac'
-            ORDER BY cp.problem_index
-        ''', (contest_name, contest_stage)).fetchall()
-    else:
-        contest_problems = db.execute('''
-            SELECT 
-                cp.problem_index,
-                p.name as problem_name,
-                pl.url as problem_link
-            FROM contest_problems cp
-            JOIN problems p ON cp.problem_source = p.source 
-                            AND cp.problem_year = p.year 
-                            AND cp.problem_number = p.number
-            JOIN problem_links pl ON p.id = pl.problem_id
-            WHERE cp.contest_name = ? AND cp.contest_stage IS NULL
-              AND pl.platform = 'qoj.ac'
-            ORDER BY cp.problem_index
-        ''', (contest_name,)).fetchall()
+    contest_id = active_contest.get('contest_id')
+    if contest_id is None:
+        row = db.execute('SELECT id FROM contests WHERE name = ? AND stage IS ?', (contest_name, contest_stage)).fetchone()
+        contest_id = row['id'] if row else None
+
+    contest_problems = db.execute('''
+        SELECT 
+            cp.problem_index,
+            p.name as problem_name,
+            pl.url as problem_link
+        FROM contest_problems cp
+        JOIN problems p ON cp.problem_source = p.source 
+                        AND cp.problem_year = p.year 
+                        AND cp.problem_number = p.number
+        JOIN problem_links pl ON p.id = pl.problem_id
+        WHERE cp.contest_id = ?
+          AND pl.platform = 'qoj.ac'
+        ORDER BY cp.problem_index
+    ''', (contest_id,)).fetchall()
 
     print(f"Found {len(contest_problems)} qoj.ac problems for contest {contest_name}, stage: {contest_stage}")
     for row in contest_problems:
@@ -408,32 +628,26 @@ def sync_qoj_submissions(active_contest, qoj_username: str):
 
     # Step 1: ensure auth and discover pagination
     scraper, max_page = _ensure_auth_and_get_max_page(db, qoj_username)
-    print(f"Detected {max_page} submission pages for {qoj_username}")
-
-    # Now scan submission pages (newest -> older) until we pass start_dt
-    relevant_submissions = []
-    stop_pagination = False
-    for page in range(1, max_page + 1):
-        if stop_pagination:
-            break
-        url = f"{BASE}/submissions?submitter={qoj_username}&page={page}"
-        try:
-            print(f"Fetching submissions page: {url}")
-            r = scraper.get(url, timeout=20)
-            if r.status_code != 200:
-                print(f"Failed to fetch submissions page {page}: {r.status_code}")
-                break
-            soup = BeautifulSoup(r.text, "html.parser")
-
-            # Infer server offset for THIS page
-            server_offset = _parse_server_time_offset(soup)
-
-            page_items, _ = _parse_submissions_rows_for_page(r.text, server_offset)
-
-            if not page_items:
-                # perhaps empty
-                continue
+    try:
+        print(f"Detected {max_page} submission pages for {qoj_username}")
 
+        # Locate the pages covering the contest window (newest -> older), then
+        # fetch just those
+        pages = _SubmissionPages(scraper, qoj_username, max_page)
+        try:
+            window = pages.window(start_dt, end_dt)
+        except Exception as e:
+            # not the same as an empty window: fall back to scanning from the
+            # newest page until the contest start, one page at a time
+            print(f"Error locating the contest window in submission pages ({e}); scanning from page 1.")
+            window = (1, 1)
+        if window:
+            print(f"Contest window is on pages {window[0]}-{window[1]} ({pages.fetched} pages fetched to find it)")
+
+        relevant_submissions = []
+        seen = set()
+        for page, page_items in (pages.scan(*window) if window else ()):
+            stop_pagination = False
             # rows are listed newest first; stop at first < start_dt
             for item in page_items:
                 sub_dt = _iso_to_dt(item['submission_time_iso'])
@@ -441,9 +655,10 @@ def sync_qoj_submissions(active_contest, qoj_username: str):
                     stop_pagination = True
                     print(f"Reached submission before contest start: {item['submission_time_iso']}")
                     break
-                if sub_dt > end_dt:
-                    # after contest end, skip
+                if sub_dt > end_dt or item['submission_id'] in seen:
+                    # after contest end, or seen on the previous page before the list shifted
                     continue
+                seen.add(item['submission_id'])
                 pid = item['problem_id']
                 if pid in problem_id_map:
                     print(f"Found relevant submission {item['submission_id']} for problem_id {pid} at {item['submission_time_iso']}")
@@ -456,24 +671,22 @@ def sync_qoj_submissions(active_contest, qoj_username: str):
                         'problem_link': problem_id_map[pid]['link'],
                     })
 
-            time.sleep(0.5)  # rate limit between pages
-        except Exception as e:
-            print(f"Error processing submissions page {page}: {e}")
-            break
+            emit_progress('page', platform='qoj.ac', page=page, pages=max_page, submissions=len(relevant_submissions))
+            if stop_pagination or (page >= window[1] and not page_items):
+                break
 
-    print(f"Found {len(relevant_submissions)} relevant submissions")
+        print(f"Found {len(relevant_submissions)} relevant submissions")
 
-    # Step 2: fetch detailed subtask scores for each relevant submission
-    detailed_submissions = []
-    if relevant_submissions:
-        def _worker(sub_info):
-            try:
-                det = _fetch_submission_details(scraper, sub_info['submission_id'])
+        # Step 2: fetch detailed subtask scores for each relevant submission
+        detailed_submissions = []
+        if relevant_submissions:
+            details = fetch_details(db, 'qoj.ac', relevant_submissions, lambda it: _qoj_detail(scraper, it['submission_id']))
+            for sub_info, det in zip(relevant_submissions, details):
                 if not det:
-                    return None
+                    continue
                 # ensure problem id matches; if missing, keep the known one
-                problem_id = det['problem_id'] if det['problem_id'] is not None else sub_info['problem_id']
-                return {
+                problem_id = int(det['problem_ref']) if det['problem_ref'] is not None else sub_info['problem_id']
+                detailed_submissions.append({
                     'submission_id': sub_info['submission_id'],
                     'submission_time': sub_info['submission_time'],
                     'problem_id': problem_id,
@@ -482,77 +695,37 @@ def sync_qoj_submissions(active_contest, qoj_username: str):
                     'problem_link': sub_info['problem_link'],
                     'total_score': det['total_score'],
                     'subtask_scores': det['subtask_scores'],
-                }
-            except Exception as e:
-                print(f"Error fetching submission {sub_info['submission_id']}: {e}")
-                return None
-
-        with ThreadPoolExecutor(max_workers=5) as ex:
-            for res in ex.map(_worker, relevant_submissions):
-                if res:
-                    detailed_submissions.append(res)
-                time.sleep(0.2)  # gentle pacing
+                })
+    finally:
+        QOJ_SCRAPERS.release(scraper)
 
     print(f"Successfully fetched details for {len(detailed_submissions)} submissions")
+    emit_progress('submissions', platform='qoj.ac', fetched=len(detailed_submissions), total=len(relevant_submissions))
 
     # Step 3: compute best subtask-wise scores per problem index, find earliest improvement time
-    problem_best = {}  # problem_index -> {'total_score', 'subtask_scores', 'earliest_improvement_time'}
+    problem_best = best_subtasks(  # problem_index -> {'total_score', 'subtask_scores', 'earliest_improvement_time'}
+        [sub['problem_index'] for sub in detailed_submissions],
+        [sub['submission_time'] for sub in detailed_submissions],
+        [sub['subtask_scores'] for sub in detailed_submissions],
+        [sub['total_score'] for sub in detailed_submissions],
+    )
 
     for sub in detailed_submissions:
-        pidx = sub['problem_index']
-        if pidx not in problem_best:
-            problem_best[pidx] = {
-                'total_score': sub['total_score'],
-                'subtask_scores': sub['subtask_scores'][:],
-                'earliest_improvement_time': sub['submission_time'],
-            }
-        else:
-            current = problem_best[pidx]
-            new_scores = []
-            improved_any = False
-            max_len = max(len(current['subtask_scores']), len(sub['subtask_scores']))
-            for i in range(max_len):
-                cur = current['subtask_scores'][i] if i < len(current['subtask_scores']) else 0
-                nw = sub['subtask_scores'][i] if i < len(sub['subtask_scores']) else 0
-                mx = nw if (isinstance(nw, (int, float)) and nw > cur) else cur
-                if isinstance(nw, (int, float)) and nw > cur:
-                    improved_any = True
-                new_scores.append(mx)
-
-            new_total = sum(new_scores)
-
-            if new_total > current['total_score']:
-                # update to better total; earliest improvement time = earlier of the two
-                cur_t = _iso_to_dt(current['earliest_improvement_time'])
-                sub_t = _iso_to_dt(sub['submission_time'])
-                earliest = min(cur_t, sub_t)
-                problem_best[pidx] = {
-                    'total_score': new_total,
-                    'subtask_scores': new_scores,
-                    'earliest_improvement_time': _dt_to_iso_utc(earliest),
-                }
-            else:
-                # maybe some subtasks improved without total rising (e.g., rounding/plateau)
-                if improved_any:
-                    sub_t = _iso_to_dt(sub['submission_time'])
-                    cur_t = _iso_to_dt(current['earliest_improvement_time'])
-                    if sub_t < cur_t:
-                        problem_best[pidx]['earliest_improvement_time'] = _dt_to_iso_utc(sub_t)
-                    problem_best[pidx]['subtask_scores'] = new_scores
-
         # Persist each submission (like the oj.uz version)
         db.execute('''
             INSERT OR REPLACE INTO user_virtual_submissions 
-            (user_id, contest_name, contest_stage, submission_time, problem_index, score, subtask_scores)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            (user_id, contest_name, contest_stage, contest_id, submission_time, problem_index, score, subtask_scores, platform, submission_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'qoj.ac', ?)
         ''', (
             user_id,
             contest_name,
             contest_stage,
+            contest_id,
             sub['submission_time'],
             sub['problem_index'],
             sub['total_score'] if isinstance(sub['total_score'], (int, float)) else 0,
             json.dumps(sub['subtask_scores'] if isinstance(sub['subtask_scores'], list) else []),
+            int(sub['submission_id']),
         ))
 
     db.commit()
@@ -599,14 +772,14 @@ def verify_qoj():
     if not qoj_cookie:
         return jsonify({"error": "Missing cookie"}), 400
     try:
-        scraper = cloudscraper.create_scraper()
-        # Set the UOJ session cookie for qoj.ac
-        scraper.cookies.set('UOJSESSID', qoj_cookie, domain='qoj.ac', path='/')
-        resp = scraper.get(BASE, timeout=5)
+        # A warm scraper with the UOJ session cookie for qoj.ac; the user's
+        # full sync reuses it afterwards
+        with QOJ_SCRAPERS.session(qoj_cookie) as scraper:
+            resp = scraper.get(BASE, timeout=5)
         if resp.status_code != 200:
             return jsonify({"error": "Failed to fetch homepage"}), 500
 
-        soup = BeautifulSoup(resp.text, 'html.parser')
+        soup = parse_html(resp.text)
         if not _is_logged_in(soup):
             return jsonify({"valid": False}), 400
 
@@ -666,43 +839,56 @@ SOURCES_FOR_SYNC = [
     'CEOI', 'COI', 'BOI', 'JOIOC', 'EJOI', 'IZHO', 'ROI', 'BKOI'
 ]
 
+def _qoj_username(db, user_id):
+    """The user's configured qoj.ac handle, or None."""
+    row = db.execute(
+        "SELECT platform_usernames FROM user_settings WHERE user_id = ?",
+        (user_id,)
+    ).fetchone()
+    if not row or not row['platform_usernames']:
+        return None
+    try:
+        pu = json.loads(row['platform_usernames'])
+        if isinstance(pu, dict):
+            return pu.get('qoj.ac')
+    except Exception:
+        pass
+    return None
+
 def update_qoj_scores():
     """
-    Full-profile sync for qoj.ac (no contest window).
+    Queue a full-profile qoj.ac sync for the caller.
     Expects JSON body: {"cookie": "<SESSION_ID value>"}
-    - Uses the provided cookie as the qoj.ac SESSION_ID (already validated upstream).
-    - Fetches all submissions for the user's configured qoj.ac handle.
-    - For each problem with a qoj.ac link in our DB, computes best element-wise
-      subtask scores across all submissions and upserts into problem_statuses.
 
-    Returns: JSON {success: true, updated: <count>}
+    Returns: 202 JSON {job_id}; poll GET /api/jobs/<id> for the result.
     """
     data = request.get_json() or {}
     session_cookie = data.get('cookie')  # qoj.ac SESSION_ID
     if not session_cookie:
         return jsonify({'error': 'Missing cookie'}), 400
 
-    user_id = request.user_id
     db = get_db()
+    if not _qoj_username(db, request.user_id):
+        return jsonify({'error': 'qoj.ac username not configured in settings'}), 400
 
-    # Get the user's qoj.ac username from settings
-    row = db.execute(
-        "SELECT platform_usernames FROM user_settings WHERE user_id = ?",
-        (user_id,)
-    ).fetchone()
-    if not row:
-        return jsonify({'error': 'User settings not found'}), 404
+    job_id = enqueue_job(db, 'qoj_full_sync', {'cookie': seal_secret(session_cookie)}, user_id=request.user_id)
+    db.commit()
+    return jsonify({'job_id': job_id}), 202
 
-    qoj_username = None
-    if row['platform_usernames']:
-        try:
-            pu = json.loads(row['platform_usernames'])
-            if isinstance(pu, dict):
-                qoj_username = pu.get('qoj.ac')
-        except Exception:
-            pass
+def run_qoj_full_sync(user_id, session_cookie):
+    """
+    Job handler for 'qoj_full_sync' (no contest window).
+    - Uses the provided cookie as the qoj.ac SESSION_ID (already validated upstream).
+    - Fetches all submissions for the user's configured qoj.ac handle.
+    - For each problem with a qoj.ac link in our DB, computes best element-wise
+      subtask scores across all submissions and upserts into problem_statuses.
+
+    Returns: {success: true, updated: <count>}
+    """
+    db = get_db()
+    qoj_username = _qoj_username(db, user_id)
     if not qoj_username:
-        return jsonify({'error': 'qoj.ac username not configured in settings'}), 400
+        raise JobFailed('qoj.ac username not configured in settings')
 
     # Fetch all problems that have a qoj.ac link within our Olympiad sources
     placeholders = ', '.join(['?'] * len(SOURCES_FOR_SYNC))
@@ -738,126 +924,82 @@ def update_qoj_scores():
             }
 
     if not problem_map:
-        return jsonify({'success': True, 'updated': 0})
-
-    # Prepare an authenticated scraper with the provided UOJSESSID cookie
-    scraper = cloudscraper.create_scraper()
-    # Set cookie for qoj.ac
-    scraper.cookies.set(
-        name='UOJSESSID',
-        value=session_cookie,
-        domain='qoj.ac',
-        path='/'
-    )
+        return {'success': True, 'updated': 0}
+
     headers = {
         'User-Agent': 'Mozilla/5.0'
     }
 
-    # Discover max pages first by probing a very large page number
-    max_page = _discover_max_page(scraper, qoj_username)
-    print(f"[QOJ FULLSYNC] Detected {max_page} submission pages for {qoj_username}.")
-
-    detailed_submissions = []
-    for page in range(1, max_page + 1):
-        url = f"{BASE}/submissions?submitter={qoj_username}&page={page}"
-        try:
-            print(f"[QOJ FULLSYNC] Fetching page {page}: {url}")
-            r = scraper.get(url, headers=headers, timeout=20)
-            if r.status_code != 200:
-                print(f"[QOJ FULLSYNC] Non-200 on page {page}: {r.status_code} - stopping.")
-                break
-            soup = BeautifulSoup(r.text, "html.parser")
-            server_offset = _parse_server_time_offset(soup)
-
-            items, _ = _parse_submissions_rows_for_page(r.text, server_offset)
-            if not items:
-                print(f"[QOJ FULLSYNC] No items on page {page}.")
-                continue
-
-            # Filter to our mapped problem ids
-            relevant = [it for it in items if it.get('problem_id') in problem_map]
-
-            if relevant:
-                # Fetch details in threads
-                def _worker(sub_info):
-                    try:
-                        det = _fetch_submission_details(scraper, sub_info['submission_id'])
-                        if not det:
-                            return None
-                        # ensure problem id
-                        pid = det['problem_id'] if det.get('problem_id') is not None else sub_info['problem_id']
-                        return {
-                            'submission_id': sub_info['submission_id'],
-                            'submission_time': sub_info['submission_time_iso'],
-                            'problem_id': pid,
-                            'total_score': det.get('total_score', 0),
-                            'subtask_scores': det.get('subtask_scores') or [],
-                        }
-                    except Exception as e:
-                        print(f"[QOJ FULLSYNC] Error fetching details for {sub_info['submission_id']}: {e}")
-                        return None
-
-                with ThreadPoolExecutor(max_workers=6) as ex:
-                    for res in ex.map(_worker, relevant):
-                        if res:
-                            detailed_submissions.append(res)
-                        time.sleep(0.05)  # gentle pacing
-
-            time.sleep(0.2)
-        except Exception as e:
-            print(f"[QOJ FULLSYNC] Exception on page {page}: {e}")
-            break
-
-    print(f"[QOJ FULLSYNC] Got {len(detailed_submissions)} detailed submissions to aggregate.")
-
-    # Aggregate best per problem (element-wise subtask max); track earliest improvement time
-    problem_best = {}  # pid -> {'total_score', 'subtask_scores', 'earliest_improvement_time'}
-    for sub in detailed_submissions:
-        pid = sub['problem_id']
-        if pid not in problem_map:
-            continue
-        if pid not in problem_best:
-            problem_best[pid] = {
-                'total_score': float(sum(sub['subtask_scores'])) if isinstance(sub['subtask_scores'], list) else float(sub['total_score'] or 0),
-                'subtask_scores': [float(x) for x in (sub['subtask_scores'] or [])],
-                'earliest_improvement_time': sub['submission_time'],
-            }
-        else:
-            cur = problem_best[pid]
-            a = cur['subtask_scores']
-            b = [float(x) for x in (sub['subtask_scores'] or [])]
-            max_len = max(len(a), len(b))
-            merged = []
-            improved_any = False
-            for i in range(max_len):
-                va = a[i] if i < len(a) else 0.0
-                vb = b[i] if i < len(b) else 0.0
-                if vb > va:
-                    improved_any = True
-                merged.append(vb if vb > va else va)
-            new_total = float(sum(merged))
-            if new_total > cur['total_score']:
-                # better total → keep earliest improvement time among the two
-                t_old = _iso_to_dt(cur['earliest_improvement_time'])
-                t_new = _iso_to_dt(sub['submission_time'])
-                earliest = _dt_to_iso_utc(min(t_old, t_new))
-                problem_best[pid] = {
-                    'total_score': new_total,
-                    'subtask_scores': merged,
-                    'earliest_improvement_time': earliest,
-                }
-            else:
-                if improved_any:
-                    # total may tie; still update earliest improvement
-                    t_old = _iso_to_dt(cur['earliest_improvement_time'])
-                    t_new = _iso_to_dt(sub['submission_time'])
-                    if t_new < t_old:
-                        cur['earliest_improvement_time'] = _dt_to_iso_utc(t_new)
-                    cur['subtask_scores'] = merged
+    # Resume from the cursor of the previous full sync, unless the handle or
+    # the set of tracked problems changed since
+    problems_key = problem_set_key(problem_map)
+    cursor = get_cursor(db, user_id, 'qoj.ac')
+    if cursor and not cursor_matches(cursor, qoj_username, problems_key):
+        print("[QOJ FULLSYNC] Handle or problem set changed; resyncing the full history.")
+        reset_cursor(db, user_id, 'qoj.ac')
+        db.commit()
+        cursor = None
+    stop_id = cursor['last_submission_id'] if cursor else None
+
+    # Check out a warm scraper carrying the provided UOJSESSID cookie
+    scraper = QOJ_SCRAPERS.acquire(session_cookie)
+    try:
+        # Discover max pages first by probing a very large page number
+        max_page = _discover_max_page(scraper, qoj_username)
+        print(f"[QOJ FULLSYNC] Detected {max_page} submission pages for {qoj_username}"
+              + (f", stopping at submission {stop_id}." if stop_id else "."))
+        emit_progress('started', platform='qoj.ac', pages=max_page, problems=len(problem_map), incremental=stop_id is not None)
+
+        # Detailed submissions of tracked problems, aggregated after the scan on top of the
+        # state stored by earlier syncs (so only new submissions are merged in)
+        batch = {'pid': [], 'time': [], 'subtasks': [], 'total': []}
+
+        def on_page(page, results):
+            for sub_info, det in results:
+                # ensure problem id
+                pid = int(det['problem_ref']) if det['problem_ref'] is not None else sub_info['problem_id']
+                if pid not in problem_map:
+                    continue
+                batch['pid'].append(pid)
+                batch['time'].append(sub_info['submission_time_iso'])
+                batch['subtasks'].append(det.get('subtask_scores') or [])
+                batch['total'].append(det.get('total_score', 0))
+            emit_progress('page', platform='qoj.ac', page=page, pages=max(last, page), submissions=len(batch['pid']))
+
+        # Everything at or below the cursor was merged before; find the page it is on
+        pages = _SubmissionPages(scraper, qoj_username, max_page, headers=headers, log_prefix="[QOJ FULLSYNC] ")
+        last = max_page
+        if stop_id is not None:
+            try:
+                last = min(pages.first_page_where(
+                    lambda rows: not rows or min(int(r['submission_id']) for r in rows) <= stop_id), max_page)
+                print(f"[QOJ FULLSYNC] Sync cursor is on page {last}.")
+            except Exception as e:
+                print(f"[QOJ FULLSYNC] Could not locate the sync cursor ({e}); scanning every page.")
+
+        scanned, complete = _pipelined_details(
+            db, pages, last,
+            lambda it: _qoj_detail(scraper, it['submission_id']),
+            keep=lambda it: it.get('problem_id') in problem_map,
+            stop_id=stop_id,
+            on_page=on_page,
+        )
+    finally:
+        QOJ_SCRAPERS.release(scraper)
+
+    scanned = [{'submission_id': it['submission_id'], 'submission_time': it['submission_time_iso']} for it in scanned]
+    touched = set(batch['pid'])
+    stored = {int(ref): best for ref, best in load_best(db, user_id, 'qoj.ac').items()}
+    problem_best = best_subtasks(
+        batch['pid'], batch['time'], batch['subtasks'], batch['total'],
+        initial={pid: stored[pid] for pid in touched if pid in stored},
+    )
+    print(f"[QOJ FULLSYNC] Merged {len(batch['pid'])} detailed submissions from {pages.fetched} pages.")
 
     # Upsert into problem_statuses
     updated = 0
-    for pid, best in problem_best.items():
+    for pid in touched:
+        best = problem_best[pid]
         meta = problem_map[pid]
         total = best['total_score']
         # status: 2 if 100, 1 if >0 else 0
@@ -865,17 +1007,25 @@ def update_qoj_scores():
 
         db.execute(
             """
-            INSERT INTO problem_statuses (user_id, problem_name, source, year, status, score)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(user_id, problem_name, source, year)
+            INSERT INTO problem_statuses (user_id, problem_id, status, score)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id, problem_id)
             DO UPDATE SET
               status = CASE WHEN excluded.score > problem_statuses.score THEN excluded.status ELSE problem_statuses.status END,
               score  = MAX(excluded.score, problem_statuses.score)
             """,
-            (user_id, meta['name'], meta['source'], meta['year'], status, total)
+            (user_id, meta['db_id'], status, total)
         )
         updated += 1
 
+    if updated:
+        record_progress_changes(db, user_id, [problem_map[pid]['db_id'] for pid in touched])
+    save_best(db, user_id, 'qoj.ac', problem_best, touched)
+    newest = newest_settled(scanned) if complete else None
+    if newest:
+        save_cursor(db, user_id, 'qoj.ac', qoj_username, problems_key, *newest)
     db.commit()
-    print(f"[QOJ FULLSYNC] Upserted {updated} problem records for user {user_id}.")
-    return jsonify({'success': True, 'updated': updated})
+    print(f"[QOJ FULLSYNC] Upserted {updated} problem records for user {user_id}"
+          + (f"; cursor at submission {newest[0]}." if newest else "; cursor unchanged."))
+    emit_progress('updated', platform='qoj.ac', problems=updated)
+    return {'success': True, 'updated': updated}
@@ -0,0 +1,149 @@
+"""
+Per-host token buckets for the scrapers.
+
+Every request sent through a session from scrape/client.py takes a token
+for its host first, so the request rate to oj.uz / qoj.ac is bounded no
+matter how many syncs run at once, and nothing sleeps when there is budget
+to spare.
+
+Limits come from RATE_LIMITS (host=tokens per second/burst). The default of
+4 requests a second per host matches the pacing of the sleeps the buckets
+replaced. Hosts without an entry are not throttled. Each process has its
+own buckets; with RATE_LIMIT_SHARED=1 (setup.sh, which runs the web app
+and a job worker) they live in the rate_limits table instead, so all
+processes draw from one budget per host.
+"""
+import os
+import time
+import sqlite3
+import threading
+from urllib.parse import urlsplit
+from database.db import get_pool, DB_BUSY_TIMEOUT_MS
+
+RATE_LIMITS = os.getenv("RATE_LIMITS", "oj.uz=4/4,qoj.ac=4/4")
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "0") == "1"
+
+def parse_rate_limits(spec):
+    """'host=rate/burst,...' -> {host: (rate, burst)}."""
+    limits = {}
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        host, _, value = part.partition("=")
+        rate, _, burst = value.partition("/")
+        rate = float(rate)
+        limits[host.strip()] = (rate, float(burst) if burst else max(rate, 1.0))
+    return limits
+
+class TokenBucket:
+    """
+    In-process bucket. acquire() reserves a token immediately (the balance
+    may go negative) and sleeps until the reservation is due, so waiters are
+    served in arrival order without re-polling.
+    """
+
+    def __init__(self, host, rate, burst):
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+
+    def _reserve(self):
+        """Take a token; return how long the caller must wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        with self._lock:
+            self.acquired += 1
+            if wait > 0:
+                self.waited += 1
+                self.wait_seconds += wait
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "shared": False,
+                "acquired": self.acquired,
+                "waited": self.waited,
+                "wait_seconds": round(self.wait_seconds, 3),
+            }
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Same bucket, with its balance kept in SQLite (wall clock) across
+    processes. The shared buckets of a process take turns on one dedicated
+    connection, outside the request pool, and each reservation is a single
+    autocommit statement, so the writer lock is held only for that row.
+    """
+
+    _conn = None
+    _conn_lock = threading.Lock()
+
+    @classmethod
+    def _connection(cls):
+        if cls._conn is None:
+            cls._conn = sqlite3.connect(
+                get_pool().db_path,
+                timeout=DB_BUSY_TIMEOUT_MS / 1000,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            cls._conn.execute("PRAGMA journal_mode = WAL")
+            cls._conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+        return cls._conn
+
+    def _reserve(self):
+        with self._conn_lock:
+            (tokens,) = self._connection().execute(
+                """
+                INSERT INTO rate_limits (host, tokens, updated) VALUES (?1, ?2 - 1, ?4)
+                ON CONFLICT(host) DO UPDATE SET
+                    tokens = MIN(?2, tokens + MAX(excluded.updated - updated, 0) * ?3) - 1,
+                    updated = excluded.updated
+                RETURNING tokens
+                """,
+                (self.host, self.burst, self.rate, time.time())
+            ).fetchone()
+        return 0.0 if tokens >= 0 else -tokens / self.rate
+
+    def stats(self):
+        out = super().stats()
+        out["shared"] = True
+        return out
+
+_buckets = {
+    host: (SharedTokenBucket if RATE_LIMIT_SHARED else TokenBucket)(host, rate, burst)
+    for host, (rate, burst) in parse_rate_limits(RATE_LIMITS).items()
+}
+
+def bucket_for(url):
+    hostname = urlsplit(url).hostname or ""
+    for host, bucket in _buckets.items():
+        if hostname == host or hostname.endswith("." + host):
+            return bucket
+    return None
+
+def acquire(url):
+    """Block until a request to `url` is within its host's budget."""
+    bucket = bucket_for(url)
+    return bucket.acquire() if bucket is not None else 0.0
+
+def rate_limit_stats():
+    return {host: bucket.stats() for host, bucket in _buckets.items()}
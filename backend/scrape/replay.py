@@ -0,0 +1,237 @@
+"""
+Record and replay the scrapers' HTTP traffic.
+
+RecordingAdapter sits where RateLimitedAdapter normally does (see
+scrape/client.py) and saves every response it passes through into a
+fixture directory. ReplayAdapter answers from that directory instead of the
+network, with configurable latency and injected errors, so syncs can be
+benchmarked and regression-tested without touching oj.uz or qoj.ac.
+
+Fixture layout:
+    index.json            {"GET https://...": [response, ...], ...}
+    <kind>-<hash>-<n>.html  response bodies, named like bench/parse_pages.py expects
+
+A URL fetched several times during recording (e.g. the qoj.ac probe before
+and after logging in) keeps every response; replay serves them in order and
+then repeats the last one. Only Content-Type, Location and Set-Cookie headers
+are kept, and cookie values are replaced, so fixtures hold no credentials.
+Response bodies can still contain handles and submission data.
+
+qoj.ac pages print the server clock, which the scraper compares with ours
+to convert times; replay moves it forward by the fixture's age so
+timestamps come out as they did when recorded.
+
+Record live traffic with SCRAPER_RECORD_DIR=<dir>, or use install_replay()
+/ install_recorder() from a script (bench/sync_bench.py does).
+"""
+import os
+import re
+import json
+import time
+import random
+import hashlib
+import threading
+from datetime import datetime, timedelta
+from email.message import Message
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from scrape import client
+from scrape.ratelimit import acquire as rate_limit
+
+_KEEP_HEADERS = ("Content-Type", "Location")
+_SERVER_TIME_RE = re.compile(rb"(Server Time:\s*)(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})")
+
+# (host, path regex) -> fixture kind; the first match wins
+_KINDS = [
+    ("qoj.ac", r"^/submissions", "qoj-list"),
+    ("qoj.ac", r"^/submission/\d+", "qoj-detail"),
+    ("qoj.ac", r"^/login", "qoj-login"),
+    ("oj.uz", r"^/submissions", "ojuz-list"),
+    ("oj.uz", r"^/submission/\d+", "ojuz-detail"),
+    ("oj.uz", r"^/profile/", "ojuz-profile"),
+    ("oj.uz", r"^/problem/view/", "ojuz-problem"),
+]
+
+def fixture_kind(url) -> str:
+    parts = urlsplit(url)
+    host = parts.hostname or "unknown"
+    for kind_host, pattern, kind in _KINDS:
+        if (host == kind_host or host.endswith("." + kind_host)) and re.search(pattern, parts.path):
+            return kind
+    return host.replace(".", "") + "-page"
+
+def _key(method, url) -> str:
+    return f"{method.upper()} {url}"
+
+def _redact_cookie(header: str) -> str:
+    name, _, rest = header.partition("=")
+    _, sep, attrs = rest.partition(";")
+    return f"{name}=replay-{name.strip()}{sep}{attrs}"
+
+class FixtureStore:
+    """index.json plus body files; safe to use from several threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._index = {}
+        self._served = {}
+        index_path = os.path.join(path, "index.json")
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                self._index = json.load(f)
+
+    def __len__(self):
+        return sum(len(v) for v in self._index.values())
+
+    def save(self, method, url, status, headers, set_cookies, body: bytes):
+        key = _key(method, url)
+        with self._lock:
+            responses = self._index.setdefault(key, [])
+            digest = hashlib.sha1(key.encode()).hexdigest()[:10]
+            name = f"{fixture_kind(url)}-{digest}-{len(responses)}.html"
+            with open(os.path.join(self.path, name), "wb") as f:
+                f.write(body)
+            responses.append({
+                "file": name,
+                "status": status,
+                "headers": {h: headers[h] for h in _KEEP_HEADERS if h in headers},
+                "set_cookies": [_redact_cookie(c) for c in set_cookies],
+                "recorded_at": time.time(),
+            })
+            tmp = os.path.join(self.path, "index.json.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, indent=1, sort_keys=True)
+            os.replace(tmp, os.path.join(self.path, "index.json"))
+
+    def next(self, method, url):
+        """(entry, body) of the next recorded response for the request, or None."""
+        key = _key(method, url)
+        with self._lock:
+            responses = self._index.get(key)
+            if not responses:
+                return None
+            n = self._served.get(key, 0)
+            self._served[key] = n + 1
+            entry = responses[min(n, len(responses) - 1)]
+        with open(os.path.join(self.path, entry["file"]), "rb") as f:
+            return entry, f.read()
+
+    def rewind(self):
+        with self._lock:
+            self._served.clear()
+
+class RecordingAdapter(client.RateLimitedAdapter):
+    """The normal pooled, rate-limited adapter, saving each response."""
+
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        resp = super().send(request, **kwargs)
+        original = getattr(resp.raw, "_original_response", None)
+        set_cookies = original.msg.get_all("Set-Cookie", []) if original is not None else []
+        self.store.save(request.method, request.url, resp.status_code, resp.headers, set_cookies, resp.content)
+        return resp
+
+class ReplayAdapter(client.RateLimitedAdapter):
+    """
+    Serves responses from a FixtureStore. Each request waits `latency`
+    seconds (plus up to `jitter`), and fails with a 503 with probability
+    `error_rate`. Unrecorded requests get a 404. Requests still take a
+    rate-limit token unless rate_limited is False.
+    """
+
+    def __init__(self, store, latency=0.0, jitter=0.0, error_rate=0.0, seed=None, rate_limited=True, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limited = rate_limited
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"served": 0, "missing": 0, "injected_errors": 0}
+
+    def _count(self, what):
+        with self._lock:
+            self.stats[what] += 1
+
+    def send(self, request, **kwargs):
+        if self.rate_limited:
+            rate_limit(request.url)
+        with self._lock:
+            delay = self.latency + self._random.random() * self.jitter
+            fail = self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            self._count("injected_errors")
+            return _response(request, 503, {}, [], b"replay: injected error")
+        found = self.store.next(request.method, request.url)
+        if found is None:
+            self._count("missing")
+            print(f"[replay] no fixture for {request.method} {request.url}")
+            return _response(request, 404, {}, [], b"replay: not recorded")
+        entry, body = found
+        if entry.get("recorded_at"):
+            body = _shift_server_time(body, time.time() - entry["recorded_at"])
+        self._count("served")
+        return _response(request, entry["status"], entry["headers"], entry["set_cookies"], body)
+
+def _shift_server_time(body: bytes, seconds: float) -> bytes:
+    def shift(m):
+        t = datetime.strptime(m.group(2).decode(), "%Y-%m-%d %H:%M:%S") + timedelta(seconds=round(seconds))
+        return m.group(1) + t.strftime("%Y-%m-%d %H:%M:%S").encode()
+    return _SERVER_TIME_RE.sub(shift, body)
+
+def _response(request, status, headers, set_cookies, body: bytes):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.reason = "Replayed"
+    resp.url = request.url
+    resp.request = request
+    resp.headers = CaseInsensitiveDict(headers)
+    resp.encoding = get_encoding_from_headers(resp.headers) or "utf-8"
+    resp._content = body
+    resp._content_consumed = True
+    # Session.send reads Set-Cookie from the raw http.client response
+    msg = Message()
+    for cookie in set_cookies:
+        msg["Set-Cookie"] = cookie
+    resp.raw = SimpleNamespace(_original_response=SimpleNamespace(msg=msg), release_conn=lambda: None)
+    return resp
+
+def _adapter_kwargs():
+    return {"pool_connections": client.HTTP_POOL_HOSTS, "pool_maxsize": client.HTTP_POOL_MAXSIZE}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def recording_adapter(path):
+    """A RecordingAdapter saving into `path` (one store per directory)."""
+    with _stores_lock:
+        if path not in _stores:
+            os.makedirs(path, exist_ok=True)
+            _stores[path] = FixtureStore(path)
+        store = _stores[path]
+    return RecordingAdapter(store, **_adapter_kwargs())
+
+def install_recorder(path):
+    """Record every scraper response into `path` from now on. Returns the store."""
+    client.set_adapter_factory(lambda: recording_adapter(path))
+    recording_adapter(path)
+    return _stores[path]
+
+def install_replay(path, **options):
+    """
+    Serve every scraper request from the fixtures in `path` from now on.
+    options go to ReplayAdapter. Returns the adapter (shared by all sessions).
+    """
+    adapter = ReplayAdapter(FixtureStore(path), **options, **_adapter_kwargs())
+    client.set_adapter_factory(lambda: adapter)
+    return adapter
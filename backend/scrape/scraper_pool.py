@@ -0,0 +1,282 @@
+"""
+Reusable cloudscraper sessions.
+
+A cloudscraper session is expensive to get going: building it, solving the
+Cloudflare challenge and the first TLS handshake all happen on its first
+request. ScraperPool keeps up to SCRAPER_POOL_SIZE sessions alive between
+syncs, keyed by the identity cookie they carry (the shared bot token, a
+user's UOJSESSID, or none), so a session is only ever reused with the same
+credentials.
+
+Anonymous sessions are pre-warmed in the background (one request to the
+site, which also serves as their health check). A checkout for an identity
+with no idle session of its own claims a warm one and sets its cookie.
+Sessions are recycled after SCRAPER_POOL_MAX_USES checkouts, after
+SCRAPER_POOL_IDLE_SECONDS unused, and whenever a caller raised while using
+one or the site answered with a challenge/blocked status.
+
+    scraper = pool.acquire(token)
+    try:
+        ...
+    finally:
+        pool.release(scraper)
+
+or `with pool.session(token) as scraper:`.
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+SCRAPER_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "8"))                  # sessions kept per site
+SCRAPER_POOL_WARM = int(os.getenv("SCRAPER_POOL_WARM", "2"))                  # anonymous sessions kept warm
+SCRAPER_POOL_MAX_USES = int(os.getenv("SCRAPER_POOL_MAX_USES", "50"))         # checkouts before recycling
+SCRAPER_POOL_IDLE_SECONDS = float(os.getenv("SCRAPER_POOL_IDLE_SECONDS", "600"))
+SCRAPER_POOL_WAIT_SECONDS = float(os.getenv("SCRAPER_POOL_WAIT_SECONDS", "5"))  # then an unpooled session is made
+
+_BLOCKED_STATUSES = (403, 429, 503)
+_pools = []
+
+def _identity(token):
+    return hashlib.sha1(token.encode()).hexdigest()[:12] if token else None
+
+class _Entry:
+    def __init__(self, session, key):
+        self.session = session
+        self.key = key
+        self.uses = 0
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.blocked = False
+        self.pooled = True
+
+class ScraperPool:
+    """
+    Sessions for one site. `factory()` builds a new configured session;
+    `cookie` is the name of the identity cookie on `domain`; `warm_url` is
+    requested to warm a session up and check it works.
+    """
+
+    def __init__(self, name, factory, cookie, domain, warm_url):
+        self.name = name
+        self.factory = factory
+        self.cookie = cookie
+        self.domain = domain
+        self.warm_url = warm_url
+        self._cond = threading.Condition()
+        self._idle = []          # _Entry, least recently used first
+        self._out = {}           # id(session) -> _Entry
+        self._warming = 0        # anonymous sessions being warmed
+        self._building = 0       # sessions being built for a checkout
+        self._latencies = deque(maxlen=500)
+        self._stats = {
+            "checkouts": 0, "reused": 0, "claimed_warm": 0, "created": 0, "overflow": 0,
+            "waited": 0, "warmed": 0, "warm_failures": 0,
+            "recycled_uses": 0, "recycled_idle": 0, "recycled_errors": 0,
+        }
+        _pools.append(self)
+
+    # -- cookies ---------------------------------------------------------
+
+    def _cookie_value(self, session):
+        for c in session.cookies:
+            if c.name == self.cookie and self.domain in c.domain:
+                return c.value
+        return None
+
+    def _set_identity(self, session, token):
+        # drop every copy (host-only and domain cookies) before setting ours
+        for c in [c for c in session.cookies if c.name == self.cookie]:
+            session.cookies.clear(c.domain, c.path, c.name)
+        if token:
+            session.cookies.set(self.cookie, token, domain=self.domain, path="/")
+
+    # -- building and warming -------------------------------------------
+
+    def _new_entry(self, key):
+        session = self.factory()
+        entry = _Entry(session, key)
+
+        def watch(resp, *args, **kwargs):
+            if resp.status_code in _BLOCKED_STATUSES:
+                entry.blocked = True
+            return resp
+        session.hooks["response"].append(watch)
+        with self._cond:
+            self._stats["created"] += 1
+        return entry
+
+    def _warm_one(self):
+        try:
+            entry = self._new_entry(None)
+            resp = entry.session.get(self.warm_url, timeout=20)
+            ok = resp.status_code == 200 and not entry.blocked
+        except Exception as e:
+            print(f"[scrapers] Warming a {self.name} session failed: {e}")
+            entry, ok = None, False
+        with self._cond:
+            self._warming -= 1
+            if not ok:
+                self._stats["warm_failures"] += 1
+                self._cond.notify_all()
+                return
+            self._set_identity(entry.session, None)
+            entry.last_used = time.monotonic()
+            self._stats["warmed"] += 1
+            if self._size_locked() < SCRAPER_POOL_SIZE:
+                self._idle.append(entry)
+                self._cond.notify_all()
+                return
+        entry.session.close()
+
+    def _size_locked(self) -> int:
+        """Sessions counted against SCRAPER_POOL_SIZE, including those being built."""
+        pooled_out = sum(1 for e in self._out.values() if e.pooled)
+        return len(self._idle) + pooled_out + self._warming + self._building
+
+    def _top_up_locked(self):
+        """Start warming anonymous sessions up to SCRAPER_POOL_WARM (caller holds the lock)."""
+        anonymous = sum(1 for e in self._idle if e.key is None) + self._warming
+        room = SCRAPER_POOL_SIZE - self._size_locked()
+        for _ in range(max(0, min(SCRAPER_POOL_WARM - anonymous, room))):
+            self._warming += 1
+            threading.Thread(target=self._warm_one, daemon=True).start()
+
+    def prewarm(self):
+        with self._cond:
+            self._top_up_locked()
+
+    # -- checkout --------------------------------------------------------
+
+    def _healthy_locked(self, entry, now) -> bool:
+        if entry.uses >= SCRAPER_POOL_MAX_USES:
+            self._stats["recycled_uses"] += 1
+            return False
+        if now - entry.last_used > SCRAPER_POOL_IDLE_SECONDS:
+            self._stats["recycled_idle"] += 1
+            return False
+        return True
+
+    def _take_idle_locked(self, key):
+        """(entry, how) of an idle session usable for `key`, dropping unhealthy ones."""
+        now = time.monotonic()
+        stale = [e for e in self._idle if not self._healthy_locked(e, now)]
+        for e in stale:
+            self._idle.remove(e)
+            e.session.close()
+        for e in reversed(self._idle):
+            if e.key == key:
+                self._idle.remove(e)
+                return e, "reused"
+        for e in reversed(self._idle):
+            if e.key is None:
+                self._idle.remove(e)
+                return e, "claimed_warm"
+        return None, None
+
+    def acquire(self, token=None):
+        """A session carrying `token` as its identity cookie (None: no cookie)."""
+        key = _identity(token)
+        start = time.monotonic()
+        deadline = start + SCRAPER_POOL_WAIT_SECONDS
+        waited = False
+        with self._cond:
+            while True:
+                entry, how = self._take_idle_locked(key)
+                if entry is not None:
+                    break
+                total = self._size_locked()
+                if total < SCRAPER_POOL_SIZE or self._idle:
+                    if total >= SCRAPER_POOL_SIZE:
+                        # full of other identities' idle sessions: make room
+                        self._idle.pop(0).session.close()
+                    how = "created"
+                    self._building += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    how = "overflow"
+                    break
+                if not waited:
+                    waited = True
+                    self._stats["waited"] += 1
+                self._cond.wait(remaining)
+        if entry is None:
+            try:
+                entry = self._new_entry(key)
+            finally:
+                if how == "created":
+                    with self._cond:
+                        self._building -= 1
+            entry.pooled = how == "created"
+        entry.key = key
+        self._set_identity(entry.session, token)
+        entry.uses += 1
+        with self._cond:
+            if how != "created":
+                self._stats[how] += 1
+            self._stats["checkouts"] += 1
+            self._out[id(entry.session)] = entry
+            self._latencies.append(time.monotonic() - start)
+            self._top_up_locked()
+        return entry.session
+
+    def release(self, session, discard=False):
+        """
+        Return a session. It is dropped instead if `discard`, if it was
+        blocked, or if its identity cookie changed under a named identity
+        (an anonymous session that logged in is kept under its new cookie).
+        """
+        with self._cond:
+            entry = self._out.pop(id(session), None)
+            if entry is None:
+                return
+            token = self._cookie_value(session)
+            if entry.key is None and token:
+                entry.key = _identity(token)
+            keep = entry.pooled and not discard and not entry.blocked and entry.key == _identity(token)
+            if not keep and entry.pooled and (discard or entry.blocked):
+                self._stats["recycled_errors"] += 1
+            if keep:
+                entry.last_used = time.monotonic()
+                self._idle.append(entry)
+                while self._idle and self._size_locked() > SCRAPER_POOL_SIZE:
+                    self._idle.pop(0).session.close()
+            self._cond.notify_all()
+        if not keep:
+            session.close()
+
+    @contextmanager
+    def session(self, token=None):
+        """acquire()/release() around a block; the session is dropped if the block raises."""
+        scraper = self.acquire(token)
+        try:
+            yield scraper
+        except BaseException:
+            self.release(scraper, discard=True)
+            raise
+        self.release(scraper)
+
+    def stats(self):
+        with self._cond:
+            latencies = sorted(self._latencies)
+            out = dict(self._stats)
+            out.update({
+                "size": SCRAPER_POOL_SIZE,
+                "idle": len(self._idle),
+                "idle_warm": sum(1 for e in self._idle if e.key is None),
+                "checked_out": len(self._out),
+                "identities": len({e.key for e in self._idle + list(self._out.values())}),
+            })
+        if latencies:
+            out["checkout_ms"] = {
+                "avg": round(sum(latencies) / len(latencies) * 1000, 2),
+                "p95": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            }
+        return out
+
+def scraper_pool_stats():
+    return {pool.name: pool.stats() for pool in _pools}
@@ -0,0 +1,154 @@
+"""
+Read-through cache of judged submission details (platform_submissions).
+
+A judged submission on oj.uz or qoj.ac never changes, so the detail
+fetchers look here first and only download what is missing. Only final
+results are written: a detail page that still shows the submission as
+waiting/judging is not cached (and drops a cached row, e.g. on rejudge),
+and neither is anything younger than SYNC_CURSOR_SETTLE_SECONDS.
+"""
+import re
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from scrape.cursor import SYNC_CURSOR_SETTLE_SECONDS
+
+_PENDING_RE = re.compile(r'\b(Waiting|Pending|In queue|Judging|Compiling|Running)\b', re.I)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "stored": 0, "not_final": 0}
+
+# cells that name a problem or a user, never a verdict ("Running Man", handle "judging")
+_NAME_CELLS = 'a[href*="/problem/"], a[href*="/profile/"], a[href*="/user/"], span[data-timestamp-iso]'
+
+def result_column(table):
+    """Index of a submission table's Result / Score / Verdict column, or None without a header."""
+    headers = [th.get_text(" ", strip=True).lower() for th in table.select("thead th")]
+    for name in ("result", "score", "verdict"):
+        if name in headers:
+            return headers.index(name)
+    return None
+
+def result_text(row, col=None) -> str:
+    """Text of a submission row's result cell (column `col`, else every cell that is no name or time)."""
+    cells = row.find_all("td")
+    if col is not None and col < len(cells):
+        return cells[col].get_text(" ", strip=True)
+    return " ".join(cell.get_text(" ", strip=True) for cell in cells if not cell.select_one(_NAME_CELLS))
+
+def looks_pending(soup) -> bool:
+    """True if the result in the submission summary table on a detail page is not final yet."""
+    table = soup.select_one("table")
+    if table is None:
+        return False
+    col = result_column(table)
+    return any(_PENDING_RE.search(result_text(row, col)) for row in table.select("tr"))
+
+def _settled(submission_time) -> bool:
+    try:
+        t = datetime.fromisoformat(submission_time.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return False
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=timezone.utc)
+    return t <= datetime.now(timezone.utc) - timedelta(seconds=SYNC_CURSOR_SETTLE_SECONDS)
+
+def _number(v):
+    # scores come back from REAL columns as floats; keep whole numbers as ints like the parsers do
+    return int(v) if float(v).is_integer() else v
+
+def load_cached(db, platform, submission_ids):
+    """submission_id (str) -> {problem_ref, total_score, subtask_scores}; counts hits/misses."""
+    ids = [int(i) for i in submission_ids]
+    out = {}
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows = db.execute(
+            f"""
+            SELECT submission_id, problem_ref, total_score, subtask_scores
+            FROM platform_submissions
+            WHERE platform = ? AND submission_id IN ({', '.join(['?'] * len(chunk))})
+            """,
+            (platform, *chunk)
+        ).fetchall()
+        for r in rows:
+            out[str(r["submission_id"])] = {
+                "problem_ref": r["problem_ref"],
+                "total_score": _number(r["total_score"]),
+                "subtask_scores": json.loads(r["subtask_scores"]),
+            }
+    with _stats_lock:
+        _stats["hits"] += len(out)
+        _stats["misses"] += len(ids) - len(out)
+    return out
+
+def store(db, platform, items):
+    """
+    Cache final details; forget ones that are pending again. items are
+    (submission_id, submission_time, detail) tuples. The caller commits.
+    """
+    final = []
+    pending = []
+    for submission_id, submission_time, det in items:
+        if det.get("pending"):
+            pending.append((platform, int(submission_id)))
+        elif _settled(submission_time):
+            final.append((
+                platform, int(submission_id),
+                None if det.get("problem_ref") is None else str(det["problem_ref"]),
+                submission_time, det["total_score"],
+                json.dumps(det["subtask_scores"], separators=(",", ":")),
+            ))
+    if final:
+        db.executemany(
+            """
+            INSERT OR REPLACE INTO platform_submissions
+                (platform, submission_id, problem_ref, submission_time, total_score, subtask_scores)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            final
+        )
+    if pending:
+        db.executemany("DELETE FROM platform_submissions WHERE platform = ? AND submission_id = ?", pending)
+    with _stats_lock:
+        _stats["stored"] += len(final)
+        _stats["not_final"] += len(items) - len(final)
+
+def fetch_details(db, platform, items, fetch, max_workers=5):
+    """
+    Details for each item ({submission_id, submission_time, ...}), in order:
+    cached ones from platform_submissions, the rest via fetch(item) in a
+    thread pool. fetch returns {problem_ref, total_score, subtask_scores,
+    pending} or None on failure; failed items come back as None. New final
+    results are cached and committed.
+    """
+    cached = load_cached(db, platform, [it["submission_id"] for it in items])
+    missing = [it for it in items if str(it["submission_id"]) not in cached]
+
+    def _safe_fetch(it):
+        try:
+            return fetch(it)
+        except Exception as e:
+            print(f"[{platform}] Error fetching submission {it['submission_id']}: {e}")
+            return None
+
+    fetched = {}
+    if missing:
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            for it, det in zip(missing, ex.map(_safe_fetch, missing)):
+                if det:
+                    fetched[str(it["submission_id"])] = det
+        store(db, platform, [
+            (it["submission_id"], it["submission_time"], fetched[str(it["submission_id"])])
+            for it in missing if str(it["submission_id"]) in fetched
+        ])
+        db.commit()
+
+    if items:
+        print(f"[{platform}] submission details: {len(items) - len(missing)} cached, {len(fetched)}/{len(missing)} fetched")
+    return [cached.get(str(it["submission_id"])) or fetched.get(str(it["submission_id"])) for it in items]
+
+def submission_cache_stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,174 @@
+"""
+Shared login tokens of the scraper bot accounts (scraper_auth_tokens).
+
+The qoj.ac syncs read submissions with one bot account. When its session
+expires, every sync running at that moment used to log in again and
+overwrite the others' token. TokenManager turns that into one login:
+threads of a process queue on a lock, processes on a lease row in
+scraper_auth_locks, and whoever gets there after a refresh picks up the
+new token instead of logging in again.
+
+Tokens are cached in memory, and a token that passed a login check is
+trusted for SCRAPER_TOKEN_CHECK_TTL seconds without being checked again.
+"""
+import os
+import time
+import uuid
+import threading
+from database.db import get_pool
+
+SCRAPER_TOKEN_CHECK_TTL = float(os.getenv("SCRAPER_TOKEN_CHECK_TTL", "300"))
+SCRAPER_LOGIN_LEASE_SECONDS = float(os.getenv("SCRAPER_LOGIN_LEASE_SECONDS", "60"))
+_LEASE_POLL_SECONDS = 0.5
+
+_managers = {}
+
+def _read_token(db, platform):
+    row = db.execute(
+        "SELECT token FROM scraper_auth_tokens WHERE platform = ? ORDER BY rowid DESC LIMIT 1",
+        (platform,),
+    ).fetchone()
+    return row["token"] if row else None
+
+def _save_token(db, platform, token):
+    # replace any existing token row(s) for the platform with the new one
+    db.execute("DELETE FROM scraper_auth_tokens WHERE platform = ?", (platform,))
+    db.execute(
+        "INSERT INTO scraper_auth_tokens (platform, token) VALUES (?, ?)",
+        (platform, token),
+    )
+    db.commit()
+
+class TokenManager:
+    """Cached token of one platform's bot account with single-flight refresh."""
+
+    def __init__(self, platform):
+        self.platform = platform
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._token = None
+        self._checked_at = None
+        self._stats = {"logins": 0, "joined": 0, "lease_waits": 0, "checks": 0, "checks_skipped": 0}
+        _managers[platform] = self
+
+    def _count(self, what):
+        with self._lock:
+            self._stats[what] += 1
+
+    def _set(self, token, checked=False):
+        with self._lock:
+            if token != self._token:
+                self._checked_at = None
+            self._token = token
+            if checked:
+                self._checked_at = time.monotonic()
+
+    def current(self, db):
+        """The token to use (memory first, then the database), or None."""
+        with self._lock:
+            token = self._token
+        if token is None:
+            token = _read_token(db, self.platform)
+            if token is not None:
+                self._set(token)
+        return token
+
+    def recently_valid(self, token) -> bool:
+        """True if `token` passed a login check less than SCRAPER_TOKEN_CHECK_TTL ago."""
+        with self._lock:
+            fresh = (
+                token is not None and token == self._token and self._checked_at is not None
+                and time.monotonic() - self._checked_at < SCRAPER_TOKEN_CHECK_TTL
+            )
+        self._count("checks_skipped" if fresh else "checks")
+        return fresh
+
+    def mark_valid(self, token):
+        self._set(token, checked=True)
+
+    def invalidate(self, token):
+        """Forget that `token` was checked (e.g. a page showed it logged out)."""
+        with self._lock:
+            if token == self._token:
+                self._checked_at = None
+
+    def refresh(self, db, stale, login):
+        """
+        Replace the expired token `stale`: `login()` returns a fresh token and
+        runs at most once at a time across threads and processes. Callers that
+        waited for someone else's login get that token instead.
+        """
+        with self._refresh_lock:
+            token = self._newer(db, stale)
+            if token:
+                return token
+            holder = uuid.uuid4().hex
+            waited = False
+            while not self._take_lease(holder):
+                if not waited:
+                    waited = True
+                    self._count("lease_waits")
+                    print(f"[auth] Another process is logging into {self.platform}; waiting…")
+                time.sleep(_LEASE_POLL_SECONDS)
+                token = self._newer(db, stale)
+                if token:
+                    return token
+            try:
+                token = self._newer(db, stale)
+                if token:
+                    return token
+                token = login()
+                _save_token(db, self.platform, token)
+                self._count("logins")
+                self._set(token, checked=True)
+                return token
+            finally:
+                self._release_lease(holder)
+
+    def _newer(self, db, stale):
+        """The stored token if someone replaced `stale` in the meantime."""
+        token = _read_token(db, self.platform)
+        if token and token != stale:
+            self._count("joined")
+            self._set(token)
+            return token
+        return None
+
+    def _take_lease(self, holder) -> bool:
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            now = time.time()
+            cur = conn.execute(
+                """
+                INSERT INTO scraper_auth_locks (platform, holder, expires) VALUES (?, ?, ?)
+                ON CONFLICT(platform) DO UPDATE SET holder = excluded.holder, expires = excluded.expires
+                WHERE scraper_auth_locks.expires < ?
+                """,
+                (self.platform, holder, now + SCRAPER_LOGIN_LEASE_SECONDS, now)
+            )
+            conn.commit()
+            return cur.rowcount == 1
+        finally:
+            pool.release(conn)
+
+    def _release_lease(self, holder):
+        pool = get_pool()
+        conn = pool.acquire()
+        try:
+            conn.execute(
+                "DELETE FROM scraper_auth_locks WHERE platform = ? AND holder = ?",
+                (self.platform, holder)
+            )
+            conn.commit()
+        finally:
+            pool.release(conn)
+
+    def stats(self):
+        with self._lock:
+            out = dict(self._stats)
+            out["checked_age_s"] = round(time.monotonic() - self._checked_at, 1) if self._checked_at else None
+        return out
+
+def token_stats():
+    return {platform: manager.stats() for platform, manager in _managers.items()}
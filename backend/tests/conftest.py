@@ -0,0 +1,42 @@
+"""
+Shared fixtures. Tests import backend modules the way the app does (backend
+on sys.path) and never touch the real database: every database is built
+from scratch in pytest's tmp_path with database/init/init_db.py.
+"""
+import os
+import sys
+import sqlite3
+import subprocess
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """Path of a database with the baseline schema (init_db.py, no migrations)."""
+    path = tmp_path / "baseline.db"
+    env = dict(os.environ, DATABASE_PATH=str(path))
+    subprocess.run(
+        [sys.executable, str(BACKEND_DIR / "database" / "init" / "init_db.py")],
+        cwd=tmp_path, env=env, check=True, capture_output=True,
+    )
+    return path
+
+def connect(path):
+    # as migrate_db.py: manual transactions, the runner issues BEGIN itself
+    conn = sqlite3.connect(path)
+    conn.isolation_level = None
+    conn.row_factory = sqlite3.Row
+    return conn
+
+@pytest.fixture
+def db(baseline_db):
+    """Connection to a database migrated to the head schema."""
+    from database.migrations import run_migrations
+    conn = connect(baseline_db)
+    run_migrations(conn, verbose=False)
+    yield conn
+    conn.close()
@@ -0,0 +1,76 @@
+import pytest
+
+from scrape import aggregate
+from scrape.aggregate import best_subtasks, to_epoch
+
+MODES = [False] + ([True] if aggregate.HAVE_NUMPY else [])
+
+@pytest.fixture(params=MODES, ids=lambda numpy: "numpy" if numpy else "python")
+def use_numpy(request):
+    return request.param
+
+def test_elementwise_max_and_time_of_last_raise(use_numpy):
+    out = best_subtasks(
+        ["a", "a", "a", "b"],
+        ["2024-01-01T00:00:03Z", "2024-01-01T00:00:01Z", "2024-01-01T00:00:02Z", "2024-01-01T00:00:05Z"],
+        [[10, 0, 5], [0, 20], [10, 0, 0], [7]],
+        [15, 20, 10, 7],
+        use_numpy=use_numpy,
+    )
+    assert out == {
+        "a": {"total_score": 35, "subtask_scores": [10, 20, 5], "earliest_improvement_time": "2024-01-01T00:00:03Z"},
+        "b": {"total_score": 7, "subtask_scores": [7], "earliest_improvement_time": "2024-01-01T00:00:05Z"},
+    }
+
+def test_no_improvement_keeps_earlier_time(use_numpy):
+    out = best_subtasks(
+        ["a", "a"], ["2024-01-01T00:00:00+00:00", "2024-01-02T00:00:00+00:00"], [[50, 50], [50, 10]],
+        use_numpy=use_numpy,
+    )
+    assert out["a"]["earliest_improvement_time"] == "2024-01-01T00:00:00+00:00"
+
+def test_submissions_without_breakdown_count_by_total(use_numpy):
+    out = best_subtasks(
+        ["a", "a", "b"],
+        ["2024-01-01T00:00:00Z", "2024-01-02T00:00:00Z", "2024-01-01T00:00:00Z"],
+        [[], [30, 10], None],
+        [60, 40, 12.5],
+        use_numpy=use_numpy,
+    )
+    assert out["a"] == {"total_score": 60, "subtask_scores": [30, 10], "earliest_improvement_time": "2024-01-01T00:00:00Z"}
+    assert out["b"] == {"total_score": 12.5, "subtask_scores": [], "earliest_improvement_time": "2024-01-01T00:00:00Z"}
+
+def test_initial_is_older_than_the_batch(use_numpy):
+    initial = {
+        "a": {"total_score": 40, "subtask_scores": [40, 0], "earliest_improvement_time": "2023-01-01T00:00:00Z"},
+        "c": {"total_score": 100, "subtask_scores": [], "earliest_improvement_time": "2023-06-01T00:00:00Z"},
+    }
+    out = best_subtasks(
+        ["a", "c"], ["2022-01-01T00:00:00Z", "2024-01-01T00:00:00Z"], [[0, 30], [50]], [30, 50],
+        initial=initial, use_numpy=use_numpy,
+    )
+    assert out["a"] == {"total_score": 70, "subtask_scores": [40, 30], "earliest_improvement_time": "2022-01-01T00:00:00Z"}
+    assert out["c"] == {"total_score": 100, "subtask_scores": [50], "earliest_improvement_time": "2023-06-01T00:00:00Z"}
+
+def test_empty_batch():
+    assert best_subtasks([], [], []) == {}
+
+@pytest.mark.skipif(not aggregate.HAVE_NUMPY, reason="NumPy not installed")
+def test_numpy_matches_python():
+    import random
+    rng = random.Random(7)
+    keys, times, subtasks, totals = [], [], [], []
+    for i in range(500):
+        keys.append(rng.choice("abcdefg"))
+        times.append(None if rng.random() < 0.05 else f"2024-01-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00Z")
+        parts = [rng.choice([0, 0.5, 7, 12.25, 30]) for _ in range(rng.randint(0, 6))]
+        subtasks.append(parts)
+        totals.append(sum(parts) if parts else rng.choice([0, 10, 100]))
+    args = (keys, times, subtasks, totals)
+    assert best_subtasks(*args, use_numpy=True) == best_subtasks(*args, use_numpy=False)
+
+def test_to_epoch():
+    assert to_epoch("1970-01-01T00:01:00Z") == 60.0
+    assert to_epoch("1970-01-01T01:00:00+01:00") == 0.0
+    assert to_epoch("1970-01-01T00:00:30") == 30.0
+    assert to_epoch(None) == float("-inf")
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+
+from scrape.cursor import (
+    SYNC_CURSOR_SETTLE_SECONDS, problem_set_key, get_cursor, save_cursor, reset_cursor,
+    cursor_matches, newest_settled, load_best, save_best,
+)
+
+def _ago(seconds):
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat().replace("+00:00", "Z")
+
+def test_problem_set_key_ignores_order():
+    assert problem_set_key([3, 1, 2]) == problem_set_key(["2", "3", "1"])
+    assert problem_set_key([1, 2]) != problem_set_key([1, 2, 3])
+
+def test_cursor_round_trip(db):
+    db.execute("INSERT INTO users (id, username) VALUES (1, 'alice')")
+    assert get_cursor(db, 1, "qoj.ac") is None
+
+    key = problem_set_key([1, 2])
+    save_cursor(db, 1, "qoj.ac", "alice_qoj", key, "120", "2024-01-01T00:00:00Z")
+    save_cursor(db, 1, "qoj.ac", "alice_qoj", key, 150, "2024-01-02T00:00:00Z")
+    cursor = get_cursor(db, 1, "qoj.ac")
+    assert cursor == {
+        "username": "alice_qoj", "problems_key": key,
+        "last_submission_id": 150, "last_submission_time": "2024-01-02T00:00:00Z",
+    }
+    assert cursor_matches(cursor, "alice_qoj", key)
+    assert not cursor_matches(cursor, "bob", key)
+    assert not cursor_matches(cursor, "alice_qoj", problem_set_key([1]))
+    assert get_cursor(db, 1, "oj.uz") is None
+
+def test_best_round_trip_and_reset(db):
+    db.execute("INSERT INTO users (id, username) VALUES (1, 'alice')")
+    best = {
+        "p1": {"total_score": 70, "subtask_scores": [40, 30], "earliest_improvement_time": "2024-01-01T00:00:00Z"},
+        "p2": {"total_score": 12.5, "subtask_scores": [], "earliest_improvement_time": None},
+    }
+    save_best(db, 1, "qoj.ac", best, ["p1", "p2"])
+    assert load_best(db, 1, "qoj.ac") == best
+
+    best["p1"] = {"total_score": 100, "subtask_scores": [40, 60], "earliest_improvement_time": "2024-02-01T00:00:00Z"}
+    save_best(db, 1, "qoj.ac", best, ["p1"])
+    assert load_best(db, 1, "qoj.ac")["p1"] == best["p1"]
+
+    save_cursor(db, 1, "qoj.ac", "alice_qoj", problem_set_key(["p1", "p2"]), 1, "2024-01-01T00:00:00Z")
+    reset_cursor(db, 1, "qoj.ac")
+    assert get_cursor(db, 1, "qoj.ac") is None
+    assert load_best(db, 1, "qoj.ac") == {}
+
+def test_newest_settled_skips_recent_and_unparsable():
+    old = SYNC_CURSOR_SETTLE_SECONDS + 60
+    items = [
+        {"submission_id": "30", "submission_time": _ago(0)},          # may still be judging
+        {"submission_id": "20", "submission_time": _ago(old)},
+        {"submission_id": "25", "submission_time": "not a time"},
+        {"submission_id": "10", "submission_time": _ago(old * 2)},
+        {"submission_id": "5", "submission_time": None},
+    ]
+    assert newest_settled(items) == (20, items[1]["submission_time"])
+    assert newest_settled(items[:1]) is None
+    assert newest_settled([]) is None
+
+def test_newest_settled_naive_times_are_utc():
+    t = (datetime.now(timezone.utc) - timedelta(seconds=SYNC_CURSOR_SETTLE_SECONDS + 60)).replace(tzinfo=None)
+    items = [{"submission_id": 7, "time": t.isoformat()}]
+    assert newest_settled(items, time_key="time") == (7, t.isoformat())
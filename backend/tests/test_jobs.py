@@ -0,0 +1,45 @@
+import json
+
+from jobs.jobs import enqueue_job, lease_job, fail_job, current_job
+
+def _expire(db, job_id):
+    db.execute("UPDATE jobs SET lease_expires = 0 WHERE id = ?", (job_id,))
+
+def test_expired_lease_is_requeued_until_out_of_attempts(db):
+    db.execute("INSERT INTO users (id, username) VALUES (1, 'alice')")
+    job_id = enqueue_job(db, "ojuz_full_sync", {"cookie": "sealed"}, user_id=1, max_attempts=2)
+
+    for attempt in (1, 2):
+        job = lease_job(db, "w1")
+        assert (job["id"], job["attempts"]) == (job_id, attempt)
+        _expire(db, job_id)         # the worker died mid-run
+
+    assert lease_job(db, "w2") is None
+    row = db.execute("SELECT status, error, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    assert (row["status"], row["error"]) == ("failed", "Lease expired after max attempts")
+    assert "cookie" not in json.loads(row["payload"])
+
+def test_expired_lease_with_a_newer_queued_run_fails(db):
+    db.execute("INSERT INTO users (id, username) VALUES (1, 'alice')")
+    first = enqueue_job(db, "ojuz_full_sync", {}, user_id=1)
+    assert lease_job(db, "w1")["id"] == first
+    # the running job queues its own next run, then its worker dies
+    token = current_job.set((first, 0))
+    second = enqueue_job(db, "ojuz_full_sync", {}, user_id=1, delay=3600)
+    current_job.reset(token)
+    assert second != first
+    _expire(db, first)
+
+    assert lease_job(db, "w2") is None
+    row = db.execute("SELECT status, error FROM jobs WHERE id = ?", (first,)).fetchone()
+    assert (row["status"], row["error"]) == ("failed", "Lease expired; a newer run is queued")
+    assert db.execute("SELECT status FROM jobs WHERE id = ?", (second,)).fetchone()[0] == "queued"
+
+def test_failed_attempt_is_retried_with_backoff(db):
+    db.execute("INSERT INTO users (id, username) VALUES (1, 'alice')")
+    job_id = enqueue_job(db, "ojuz_full_sync", {}, user_id=1, max_attempts=2)
+    lease_job(db, "w1")
+    fail_job(db, job_id, "w1", "boom")
+    row = db.execute("SELECT status, error, run_after FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    assert (row["status"], row["error"]) == ("queued", "boom")
+    assert lease_job(db, "w1") is None          # not before run_after
@@ -0,0 +1,91 @@
+from conftest import connect
+from database.migrations import MIGRATIONS, run_migrations, current_version, check_query_plans
+
+HEAD = max(m["version"] for m in MIGRATIONS)
+
+def _seed(conn):
+    conn.execute("INSERT INTO users (id, username) VALUES (1, 'alice'), (2, 'bob')")
+    conn.executemany(
+        "INSERT INTO problems (id, name, number, source, year) VALUES (?, ?, ?, ?, ?)",
+        [(1, "Nile", 1, "IOI", 2024), (2, "Message", 2, "IOI", 2024), (3, "Sequence", 1, "APIO", 2023)],
+    )
+    conn.executemany(
+        "INSERT INTO contests (name, stage, source, year, duration_minutes) VALUES (?, ?, ?, ?, ?)",
+        [("IOI 2024", "Day 1", "IOI", 2024, 300), ("IOI 2024", "Day 2", "IOI", 2024, 300),
+         ("APIO 2023", None, "APIO", 2023, 300)],
+    )
+    conn.executemany(
+        """
+        INSERT INTO contest_problems (contest_name, contest_stage, problem_source, problem_year, problem_number, problem_index)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        [("IOI 2024", "Day 1", "IOI", 2024, 1, 1), ("IOI 2024", "Day 2", "IOI", 2024, 2, 1),
+         ("APIO 2023", None, "APIO", 2023, 1, 1)],
+    )
+    conn.execute(
+        "INSERT INTO user_virtual_contests (user_id, contest_name, contest_stage, score, per_problem_scores) "
+        "VALUES (1, 'APIO 2023', NULL, 42, '[42]')"
+    )
+    conn.execute(
+        "INSERT INTO user_virtual_submissions (user_id, contest_name, contest_stage, submission_time, problem_index, score, subtask_scores) "
+        "VALUES (1, 'APIO 2023', NULL, '2024-05-01T10:00:00Z', 1, 42, '[42]')"
+    )
+    conn.execute("INSERT INTO active_virtual_contests (user_id, contest_name, contest_stage) VALUES (2, 'IOI 2024', 'Day 2')")
+    conn.executemany(
+        "INSERT INTO problem_statuses (user_id, problem_name, source, year, status, score) VALUES (?, ?, ?, ?, ?, ?)",
+        [(1, "Nile", "IOI", 2024, 2, 100), (1, "Sequence", "APIO", 2023, 1, 28), (2, "Gone", "IOI", 1999, 1, 5)],
+    )
+    conn.execute(
+        "INSERT INTO user_problem_notes (user_id, problem_name, source, year, note) VALUES (1, 'Message', 'IOI', 2024, 'hi')"
+    )
+
+def test_baseline_to_head_keeps_rows(baseline_db):
+    conn = connect(baseline_db)
+    _seed(conn)
+
+    assert run_migrations(conn, verbose=False) == sorted(m["version"] for m in MIGRATIONS)
+    assert current_version(conn) == HEAD
+    assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+
+    contests = {(r["name"], r["stage"]): r for r in conn.execute("SELECT * FROM contests")}
+    assert set(contests) == {("IOI 2024", "Day 1"), ("IOI 2024", "Day 2"), ("APIO 2023", None)}
+    assert len({r["id"] for r in contests.values()}) == 3
+    assert contests[("IOI 2024", "Day 1")]["slug"] == "ioi2024day1"
+
+    # contest_id backfilled on every child table (migration 16)
+    for table in ("contest_problems", "user_virtual_contests", "active_virtual_contests"):
+        rows = conn.execute(f"SELECT contest_name, contest_stage, contest_id FROM {table}").fetchall()
+        assert rows
+        for r in rows:
+            assert r["contest_id"] == contests[(r["contest_name"], r["contest_stage"])]["id"]
+    assert conn.execute("SELECT COUNT(*) FROM user_virtual_submissions").fetchone()[0] == 1
+
+    # progress and notes rekeyed by problem id, unknown problems set aside (migration 17)
+    statuses = conn.execute("SELECT user_id, problem_id, status, score FROM problem_statuses ORDER BY problem_id").fetchall()
+    assert [tuple(r) for r in statuses] == [(1, 1, 2, 100.0), (1, 3, 1, 28.0)]
+    assert [tuple(r) for r in conn.execute("SELECT problem_name, source, year FROM problem_statuses_unmatched")] == [
+        ("Gone", "IOI", 1999)
+    ]
+    assert [tuple(r) for r in conn.execute("SELECT user_id, problem_id, note FROM user_problem_notes")] == [(1, 2, "hi")]
+
+    assert run_migrations(conn, verbose=False) == []
+    conn.close()
+
+def test_head_query_plans_use_their_indexes(db):
+    failed = [(r["label"], r["plan"]) for r in check_query_plans(db) if not r["ok"]]
+    assert failed == []
+
+def test_contest_ids_are_not_reused(db):
+    db.execute("INSERT INTO contests (name, stage, source, year) VALUES ('A', NULL, 'X', 2000)")
+    first = db.execute("SELECT id FROM contests WHERE name = 'A'").fetchone()[0]
+    db.execute("DELETE FROM contests WHERE name = 'A'")
+    db.execute("INSERT INTO contests (name, stage, source, year) VALUES ('B', NULL, 'X', 2000)")
+    assert db.execute("SELECT id FROM contests WHERE name = 'B'").fetchone()[0] > first
+
+def test_child_rows_get_contest_id_from_name_and_stage(db):
+    db.execute("INSERT INTO contests (name, stage, source, year) VALUES ('BOI 2023', 'Day 1', 'BOI', 2023)")
+    db.execute("INSERT INTO users (id, username) VALUES (1, 'alice')")
+    db.execute("INSERT INTO user_virtual_contests (user_id, contest_name, contest_stage) VALUES (1, 'BOI 2023', 'Day 1')")
+    row = db.execute("SELECT contest_id FROM user_virtual_contests").fetchone()
+    assert row[0] == db.execute("SELECT id FROM contests").fetchone()[0]
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from scrape.qoj import _SubmissionPages, _dt_to_iso_utc
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+PER_PAGE = 10
+
+class FakePages(_SubmissionPages):
+    """
+    Submissions one minute apart, newest first, PER_PAGE to a page; ids grow
+    with time. Counts every page it is asked to fetch.
+    """
+
+    def __init__(self, total, max_page=None):
+        pages = -(-total // PER_PAGE)
+        super().__init__(scraper=None, username="alice", max_page=pages if max_page is None else max_page)
+        self.total = total
+        self.calls = []
+
+    def get(self, page):
+        self.calls.append(page)
+        newest = self.total - 1 - (page - 1) * PER_PAGE
+        return [
+            {"submission_id": str(i), "submission_time_iso": _dt_to_iso_utc(T0 + timedelta(minutes=i))}
+            for i in range(newest, max(newest - PER_PAGE, -1), -1)
+        ]
+
+def _minute(i):
+    return T0 + timedelta(minutes=i)
+
+def test_window_covers_the_range():
+    pages = FakePages(200)          # page 1 holds 199..190, page 20 holds 9..0
+    assert pages.window(_minute(150), _minute(165)) == (4, 6)
+
+def test_window_inside_one_page():
+    pages = FakePages(200)
+    assert pages.window(_minute(152), _minute(155)) == (5, 5)
+
+def test_window_newer_than_everything_is_the_first_page():
+    pages = FakePages(200)
+    assert pages.window(_minute(500), _minute(600)) == (1, 1)
+
+def test_window_older_than_everything_is_none():
+    assert FakePages(200).window(T0 - timedelta(days=2), T0 - timedelta(days=1)) is None
+    # only the first max_page pages are searched
+    assert FakePages(200, max_page=10).window(_minute(10), _minute(20)) is None
+
+def test_window_reaching_past_the_oldest_page_is_clamped():
+    pages = FakePages(200)
+    assert pages.window(T0 - timedelta(days=1), _minute(25)) == (18, 20)
+
+def test_search_fetches_few_pages():
+    pages = FakePages(10_000)
+    # page 100 holds 9009..9000; a start on its oldest row takes the next page too
+    assert pages.window(_minute(9_000), _minute(9_005)) == (100, 101)
+    assert len(set(pages.calls)) < 20
+
+@pytest.mark.parametrize("stop", [0, 1, 55, 199, 500])
+def test_first_page_where_matches_a_linear_scan(stop):
+    pages = FakePages(200)
+
+    def pred(rows):
+        return min(int(r["submission_id"]) for r in rows) <= stop
+
+    linear = next((p for p in range(1, pages.max_page + 1) if pred(pages.get(p))), pages.max_page + 1)
+    assert pages.first_page_where(pred) == linear
@@ -0,0 +1,33 @@
+import sqlite3
+
+import pytest
+
+from scrape.ratelimit import SharedTokenBucket, TokenBucket, parse_rate_limits
+
+def test_parse_rate_limits():
+    assert parse_rate_limits("oj.uz=4/8, qoj.ac=0.5,") == {"oj.uz": (4.0, 8.0), "qoj.ac": (0.5, 1.0)}
+    assert parse_rate_limits("") == {}
+
+def test_bucket_waits_once_the_burst_is_spent():
+    bucket = TokenBucket("example.com", rate=10, burst=2)
+    assert [bucket._reserve() > 0 for _ in range(3)] == [False, False, True]
+
+@pytest.fixture
+def shared(db, monkeypatch):
+    conn = sqlite3.connect(db.execute("PRAGMA database_list").fetchone()[2], isolation_level=None,
+                           check_same_thread=False)
+    monkeypatch.setattr(SharedTokenBucket, "_conn", conn)
+    yield conn
+    conn.close()
+
+def test_shared_buckets_draw_from_one_balance(shared):
+    # two processes' buckets for the same host
+    a = SharedTokenBucket("example.com", rate=1, burst=2)
+    b = SharedTokenBucket("example.com", rate=1, burst=2)
+    assert a._reserve() == 0.0
+    assert b._reserve() == 0.0
+    assert a._reserve() == pytest.approx(1.0, abs=0.1)
+    assert b._reserve() == pytest.approx(2.0, abs=0.1)
+    assert SharedTokenBucket("other.com", rate=1, burst=2)._reserve() == 0.0
+    assert shared.execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0] == 2
+    assert not shared.in_transaction
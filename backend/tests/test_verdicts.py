@@ -0,0 +1,45 @@
+import pytest
+from bs4 import BeautifulSoup
+
+from scrape.submissions import looks_pending
+from scrape.ojuz import _parse_ojuz_submission_rows
+
+LIST_HEAD = "<thead><tr><th>#</th><th>Time</th><th>Handle</th><th>Problem</th><th>Language</th><th>Result</th></tr></thead>"
+
+def _list_row(i, title, result, handle="me"):
+    return (
+        f'<tr><td><a href="/submission/{i}">{i}</a></td>'
+        f'<td><span data-timestamp-iso="2024-01-01T00:00:00Z">t</span></td>'
+        f'<td><a href="/profile/{handle}">{handle}</a></td>'
+        f'<td><a href="/problem/view/X_{i}">{title}</a></td><td>C++17</td><td>{result}</td></tr>'
+    )
+
+@pytest.mark.parametrize("head", [LIST_HEAD, ""], ids=["header", "no-header"])
+def test_ojuz_list_reads_only_the_result_cell(head):
+    body = "".join([
+        _list_row(4, "Running Man", '<div class="progress"><span>100 / 100</span></div>'),
+        _list_row(3, "Pending Tree", "Compilation error", handle="judging"),
+        _list_row(2, "Nile", "Judging"),
+        _list_row(1, "Compiling", '<div class="progress"><span>7 / 20</span></div>'),
+    ])
+    rows = _parse_ojuz_submission_rows(f'<table class="table">{head}<tbody>{body}</tbody></table>')
+    assert [(r["submission_id"], r["score"]) for r in rows] == [("4", 100), ("3", 0), ("2", None), ("1", 35)]
+
+def _detail(title, result, head=True):
+    thead = "<thead><tr><th>ID</th><th>Problem</th><th>Submitter</th><th>Result</th></tr></thead>" if head else ""
+    return BeautifulSoup(
+        f'<table>{thead}<tbody><tr><td><a href="/submission/5">#5</a></td>'
+        f'<td><a href="/problem/7">{title}</a></td><td><a href="/user/profile/me">me</a></td>'
+        f"<td>{result}</td></tr></tbody></table>",
+        "html.parser",
+    )
+
+@pytest.mark.parametrize("head", [True, False], ids=["header", "no-header"])
+def test_looks_pending_ignores_the_title(head):
+    assert not looks_pending(_detail("Running Man", '<a href="/submission/5" class="uoj-score">100</a>', head))
+    assert not looks_pending(_detail("Waiting Room", "Accepted", head))
+    assert looks_pending(_detail("Nile", '<a href="/submission/5">Judging</a>', head))
+    assert looks_pending(_detail("Nile", "Waiting", head))
+
+def test_looks_pending_without_a_table():
+    assert not looks_pending(BeautifulSoup("<p>nothing</p>", "html.parser"))
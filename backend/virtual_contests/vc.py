@@ -1,12 +1,20 @@
+import os
 import pytz
 import json
+import contextvars
 from flask import request, jsonify
 from datetime import timedelta, datetime
 from database.db import get_db
+from progress.progress import record_progress_changes
 from scrape.ojuz import sync_ojuz_submissions
 from scrape.qoj import sync_qoj_submissions
+from scrape.aggregate import best_subtasks
+from jobs.jobs import enqueue_job, JobFailed
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# Minutes between live syncs of a running autosynced contest (0 turns them off)
+VC_LIVE_SYNC_MINUTES = float(os.getenv("VC_LIVE_SYNC_MINUTES", "5"))
+
 def get_virtual_contests():
     user_id = request.user_id
     db = get_db()
@@ -19,19 +27,22 @@ def get_virtual_contests():
             avc.start_time,
             avc.end_time,
             avc.autosynced,
+            avc.score,
+            avc.per_problem_scores,
+            avc.live_synced_at,
             c.duration_minutes,
             c.location,
             c.website,
             c.link
         FROM active_virtual_contests avc
-        JOIN contests c ON avc.contest_name = c.name AND (avc.contest_stage = c.stage OR (avc.contest_stage IS NULL AND c.stage IS NULL))
+        JOIN contests c ON c.id = avc.contest_id
         WHERE avc.user_id = ?
     ''', (user_id,)).fetchone()
     
     # Get all contests with their problems
     contests = db.execute('''
         SELECT 
-            name, stage, source, year, duration_minutes,
+            id, name, stage, source, year, duration_minutes,
             COALESCE(location, '') as location,
             COALESCE(website, '') as website,
             COALESCE(link, '') as link,
@@ -44,21 +55,20 @@ def get_virtual_contests():
     # Get contest problems for all contests
     contest_problems = db.execute('''
         SELECT 
-            cp.contest_name,
-            cp.contest_stage,
+            cp.contest_id,
             cp.problem_source,
             cp.problem_year,
             cp.problem_number,
             cp.problem_extra,
             cp.problem_index
         FROM contest_problems cp
-        ORDER BY cp.contest_name, cp.contest_stage, cp.problem_index
+        ORDER BY cp.contest_id, cp.problem_index
     ''').fetchall()
     
     # Get last 3 virtual contests for this user
     recent_virtuals = db.execute('''
         SELECT 
-            v.contest_name, v.contest_stage,
+            v.contest_name, v.contest_stage, v.slug,
             c.source as contest_source, c.year as contest_year,
             v.started_at,
             v.score as total_score,
@@ -68,7 +78,7 @@ def get_virtual_contests():
                 ELSE 'manual'
             END as platform
         FROM user_virtual_contests v
-        JOIN contests c ON v.contest_name = c.name AND (v.contest_stage = c.stage OR (v.contest_stage IS NULL AND c.stage IS NULL))
+        JOIN contests c ON c.id = v.contest_id
         WHERE v.user_id = ?
         ORDER BY v.started_at DESC
         LIMIT 3
@@ -76,11 +86,15 @@ def get_virtual_contests():
 
     # Get all completed contests for this user
     completed_contests = db.execute('''
-        SELECT DISTINCT contest_name || '|' || COALESCE(contest_stage, '') as contest_key
+        SELECT DISTINCT contest_id
         FROM user_virtual_contests
         WHERE user_id = ?
     ''', (user_id,)).fetchall()
 
+    problems_by_contest = {}
+    for cp in contest_problems:
+        problems_by_contest.setdefault(cp['contest_id'], []).append(cp)
+
     # Convert to dictionary format
     contests_dict = {}
     for c in contests:
@@ -94,22 +108,23 @@ def get_virtual_contests():
         contest_dict = dict(c)
         # Add problems for this contest
         contest_dict['problems'] = []
-        for cp in contest_problems:
-            if cp['contest_name'] == c['name'] and (cp['contest_stage'] == c['stage'] or (cp['contest_stage'] is None and c['stage'] is None)):
-                p = {
-                    'source': cp['problem_source'],
-                    'year': cp['problem_year'],
-                    'number': cp['problem_number'],
-                    'index': cp['problem_index']
-                }
-                if cp['problem_extra'] is not None and cp['problem_extra'] != '':
-                    p['extra'] = cp['problem_extra']
-                contest_dict['problems'].append(p)
+        for cp in problems_by_contest.get(c['id'], []):
+            p = {
+                'source': cp['problem_source'],
+                'year': cp['problem_year'],
+                'number': cp['problem_number'],
+                'index': cp['problem_index']
+            }
+            if cp['problem_extra'] is not None and cp['problem_extra'] != '':
+                p['extra'] = cp['problem_extra']
+            contest_dict['problems'].append(p)
         
         contests_dict[source][year].append(contest_dict)
 
     recent_list = [dict(v) for v in recent_virtuals]
-    completed_list = [row['contest_key'] for row in completed_contests]
+    # the frontend keys completed contests by "name|stage"
+    key_by_id = {c['id']: f"{c['name']}|{c['stage'] or ''}" for c in contests}
+    completed_list = [key_by_id[row['contest_id']] for row in completed_contests if row['contest_id'] in key_by_id]
 
     result = {
         'contests': contests_dict,
@@ -132,6 +147,7 @@ def get_virtual_contest_history():
         SELECT 
             v.contest_name,
             v.contest_stage,
+            v.slug,
             c.source as contest_source,
             c.year as contest_year,
             v.started_at,
@@ -143,7 +159,7 @@ def get_virtual_contest_history():
                 ELSE 'manual'
             END as platform
         FROM user_virtual_contests v
-        JOIN contests c ON v.contest_name = c.name AND (v.contest_stage = c.stage OR (v.contest_stage IS NULL AND c.stage IS NULL))
+        JOIN contests c ON c.id = v.contest_id
         WHERE v.user_id = ?
         ORDER BY v.started_at DESC
     ''', (user_id,)).fetchall()
@@ -177,45 +193,34 @@ def start_virtual_contest():
     if existing:
         return jsonify({'error': 'User already has an active contest'}), 400
     
+    # Verify contest exists (contest_stage may be None)
+    contest = db.execute(
+        'SELECT id FROM contests WHERE name = ? AND stage IS ?',
+        (contest_name, contest_stage)
+    ).fetchone()
+    
+    if not contest:
+        return jsonify({'error': 'Contest not found'}), 404
+    
     # Check if user has already completed this contest
-    # Handle both NULL and non-NULL contest_stage cases
-    if contest_stage is not None:
-        completed = db.execute(
-            'SELECT 1 FROM user_virtual_contests WHERE user_id = ? AND contest_name = ? AND contest_stage = ?',
-            (user_id, contest_name, contest_stage)
-        ).fetchone()
-    else:
-        completed = db.execute(
-            'SELECT 1 FROM user_virtual_contests WHERE user_id = ? AND contest_name = ? AND contest_stage IS NULL',
-            (user_id, contest_name)
-        ).fetchone()
+    completed = db.execute(
+        'SELECT 1 FROM user_virtual_contests WHERE user_id = ? AND contest_id = ?',
+        (user_id, contest['id'])
+    ).fetchone()
     
     if completed:
         return jsonify({'error': 'Contest already completed'}), 400
     
-    # Verify contest exists
-    # Handle both NULL and non-NULL contest_stage cases
-    if contest_stage is not None:
-        contest_exists = db.execute(
-            'SELECT 1 FROM contests WHERE name = ? AND stage = ?',
-            (contest_name, contest_stage)
-        ).fetchone()
-    else:
-        contest_exists = db.execute(
-            'SELECT 1 FROM contests WHERE name = ? AND stage IS NULL',
-            (contest_name,)
-        ).fetchone()
-    
-    if not contest_exists:
-        return jsonify({'error': 'Contest not found'}), 404
-    
     # Start the virtual contest with UTC timestamp
     utc_now = datetime.now(pytz.UTC).isoformat()
     db.execute('''
         INSERT INTO active_virtual_contests 
-        (user_id, contest_name, contest_stage, start_time, autosynced)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (user_id, contest_name, contest_stage, utc_now, autosynced_flag))
+        (user_id, contest_name, contest_stage, contest_id, start_time, autosynced)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (user_id, contest_name, contest_stage, contest['id'], utc_now, autosynced_flag))
+    if autosynced_flag and VC_LIVE_SYNC_MINUTES > 0:
+        # keep the scores live while the contest runs (see run_vc_live_sync)
+        enqueue_job(db, 'vc_live_sync', {}, user_id=user_id, max_attempts=1, delay=VC_LIVE_SYNC_MINUTES * 60)
     
     db.commit()
     return jsonify({'success': True})
@@ -250,11 +255,14 @@ def end_virtual_contest():
         SELECT 
             avc.contest_name, 
             avc.contest_stage, 
+            avc.contest_id,
             avc.start_time,
             avc.autosynced,
+            avc.per_problem_scores,
+            avc.live_synced_at,
             c.duration_minutes
         FROM active_virtual_contests avc
-        JOIN contests c ON avc.contest_name = c.name AND (avc.contest_stage = c.stage OR (avc.contest_stage IS NULL AND c.stage IS NULL))
+        JOIN contests c ON c.id = avc.contest_id
         WHERE avc.user_id = ?
     ''', (user_id,)).fetchone()
 
@@ -284,139 +292,190 @@ def end_virtual_contest():
     ''', (capped_end_time_iso, user_id))
     db.commit()
     
-    # Create updated active_contest object with capped end_time for sync function
+    # Autosynced contests pull submissions from the platforms in the job worker;
+    # the client polls GET /api/jobs/<id> for {submissions, final_scores}.
+    # Scores from the live syncs come back right away; the job only has to
+    # add what was submitted since the last one.
+    if active_contest.get('autosynced', False):
+        job_id = enqueue_job(db, 'vc_autosync', {}, user_id=user_id)
+        db.commit()
+        live_scores = None
+        if active_contest['live_synced_at'] and active_contest['per_problem_scores']:
+            live_scores = json.loads(active_contest['per_problem_scores'])
+        return jsonify({'success': True, 'job_id': job_id, 'live_scores': live_scores,
+                        'live_synced_at': active_contest['live_synced_at']}), 202
+
+    return jsonify({'success': True})
+
+def _sync_contest_window(db, user_id, active_contest, end_time, live=False):
+    """
+    Sync active_contest's window up to `end_time` from every platform the
+    user has a handle for, and store the per-problem best on the active
+    contest. Returns (submissions, final_scores).
+    """
     active_contest_with_end = {
         'user_id': user_id,
         'contest_name': active_contest['contest_name'],
         'contest_stage': active_contest['contest_stage'],
+        'contest_id': active_contest['contest_id'],
         'start_time': active_contest['start_time'],
-        'end_time': capped_end_time_iso
+        'end_time': end_time
     }
-    
-    # Handle autosync across multiple platforms (oj.uz, qoj.ac) if autosynced is true
+
+    # Autosync across multiple platforms (oj.uz, qoj.ac)
     submissions = []
     final_scores = []
 
-    if active_contest.get('autosynced', False):
-        # Resolve usernames from user_settings
-        platform_usernames = {}
-        try:
-            db_for_username = get_db()
-            row = db_for_username.execute(
-                "SELECT platform_usernames FROM user_settings WHERE user_id = ?",
-                (user_id,)
-            ).fetchone()
-            if row and row['platform_usernames']:
-                try:
-                    platform_usernames = json.loads(row['platform_usernames'])
-                    if not isinstance(platform_usernames, dict):
-                        platform_usernames = {}
-                except Exception:
+    # Resolve usernames from user_settings
+    platform_usernames = {}
+    try:
+        db_for_username = get_db()
+        row = db_for_username.execute(
+            "SELECT platform_usernames FROM user_settings WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row and row['platform_usernames']:
+            try:
+                platform_usernames = json.loads(row['platform_usernames'])
+                if not isinstance(platform_usernames, dict):
                     platform_usernames = {}
-        except Exception:
-            platform_usernames = {}
+            except Exception:
+                platform_usernames = {}
+    except Exception:
+        platform_usernames = {}
 
-        # Map of supported platforms to their sync functions
-        sync_funcs = {
-            'oj.uz': (sync_ojuz_submissions, platform_usernames.get('oj.uz')),
-            'qoj.ac': (sync_qoj_submissions, platform_usernames.get('qoj.ac')),
-        }
+    # Map of supported platforms to their sync functions
+    sync_funcs = {
+        'oj.uz': (sync_ojuz_submissions, platform_usernames.get('oj.uz')),
+        'qoj.ac': (sync_qoj_submissions, platform_usernames.get('qoj.ac')),
+    }
 
-        # Kick off parallel syncs for platforms that have a username configured
-        futures = []
-        with ThreadPoolExecutor(max_workers=len(sync_funcs)) as executor:
-            for plat, (fn, uname) in sync_funcs.items():
-                if uname:
-                    futures.append(executor.submit(fn, active_contest_with_end, uname))
-
-            # Collect results as they complete
-            for fut in as_completed(futures):
-                try:
-                    res = fut.result() or []
-                    if isinstance(res, list):
-                        submissions.extend(res)
-                except Exception as e:
-                    print(f"Error syncing submissions: {e}")
-
-        # Compute per-problem final scores by maxing **per-subtask** across all platforms
-        try:
-            # Get declared problems for this contest to shape the score array deterministically
-            contest_problems = db.execute('''
-                SELECT cp.problem_index
-                FROM contest_problems cp
-                WHERE cp.contest_name = ? AND (cp.contest_stage = ? OR (cp.contest_stage IS NULL AND ? IS NULL))
-                ORDER BY cp.problem_index
-            ''', (active_contest['contest_name'], active_contest['contest_stage'], active_contest['contest_stage'])).fetchall()
-            indices = [row['problem_index'] for row in contest_problems]
-        except Exception:
-            indices = []
-
-        if submissions and indices:
-            # For each problem index, keep the **element-wise max** of subtask scores
-            # If a submission has no subtask breakdown, treat it as a single subtask with the total score
-            from math import isfinite
-
-            def _normalize_scores(x):
-                # Return a list of floats for subtask scores
-                if isinstance(x, (list, tuple)):
-                    out = []
-                    for v in x:
-                        try:
-                            fv = float(v)
-                        except Exception:
-                            fv = 0.0
-                        out.append(fv if isfinite(fv) else 0.0)
-                    return out
-                # Fallback: single total score as one subtask
-                try:
-                    s = float(x)
-                except Exception:
-                    s = 0.0
-                return [s if isfinite(s) else 0.0]
-
-            best_subtasks = {idx: [] for idx in indices}
-
-            for sub in submissions:
-                try:
-                    idx = int(sub.get('problem_index'))
-                except Exception:
-                    continue
-                if idx not in best_subtasks:
-                    # Ignore submissions for indices not declared in this contest
-                    continue
-
-                # Prefer explicit subtask_scores; fallback to the total score
-                sts = sub.get('subtask_scores')
-                if sts is None:
-                    sts = sub.get('score', 0)
-                cur = _normalize_scores(sts)
-
-                # Element-wise max into accumulator (pad with zeros as needed)
-                acc = best_subtasks[idx]
-                if len(cur) > len(acc):
-                    acc.extend([0.0] * (len(cur) - len(acc)))
-                for i in range(len(cur)):
-                    acc[i] = max(acc[i] if i < len(acc) else 0.0, cur[i])
-                best_subtasks[idx] = acc
-
-            # Final scores are the sum of best subtasks per problem, ordered by official indices
-            final_scores = [float(sum(best_subtasks[idx])) for idx in indices]
-            total_score = float(sum(final_scores))
-
-            # Persist aggregated scores on the active contest
-            db.execute('''
-                UPDATE active_virtual_contests 
-                SET score = ?, per_problem_scores = ?
-                WHERE user_id = ?
-            ''', (total_score, json.dumps(final_scores), user_id))
-            db.commit()
+    # Kick off parallel syncs for platforms that have a username configured
+    futures = []
+    with ThreadPoolExecutor(max_workers=len(sync_funcs)) as executor:
+        for plat, (fn, uname) in sync_funcs.items():
+            if uname:
+                # copy the context so the syncs' progress events land on this job
+                futures.append(executor.submit(contextvars.copy_context().run, fn, active_contest_with_end, uname))
 
-    response_data = {'success': True}
-    if active_contest.get('autosynced', False) and submissions:
-        response_data['submissions'] = submissions
-        response_data['final_scores'] = final_scores
+        # Collect results as they complete
+        for fut in as_completed(futures):
+            try:
+                res = fut.result() or []
+                if isinstance(res, list):
+                    submissions.extend(res)
+            except Exception as e:
+                print(f"Error syncing submissions: {e}")
 
-    return jsonify(response_data)
+    # Compute per-problem final scores by maxing **per-subtask** across all platforms
+    try:
+        # Get declared problems for this contest to shape the score array deterministically
+        contest_problems = db.execute('''
+            SELECT cp.problem_index
+            FROM contest_problems cp
+            WHERE cp.contest_id = ?
+            ORDER BY cp.problem_index
+        ''', (active_contest['contest_id'],)).fetchall()
+        indices = [row['problem_index'] for row in contest_problems]
+    except Exception:
+        indices = []
+
+    if submissions and indices:
+        # For each problem index, keep the **element-wise max** of subtask scores
+        # If a submission has no subtask breakdown, treat it as a single subtask with the total score
+        declared = set(indices)
+        kept = []
+        for sub in submissions:
+            try:
+                idx = int(sub.get('problem_index'))
+            except Exception:
+                continue
+            # Ignore submissions for indices not declared in this contest
+            if idx in declared:
+                kept.append((idx, sub))
+        best = best_subtasks(
+            [idx for idx, _ in kept], None,
+            [sub.get('subtask_scores') for _, sub in kept],
+            [sub.get('score', 0) for _, sub in kept],
+        )
+
+        # Final scores are the sum of best subtasks per problem, ordered by official indices
+        final_scores = [float(best[idx]['total_score']) if idx in best else 0.0 for idx in indices]
+        total_score = float(sum(final_scores))
+
+        # Persist aggregated scores on the active contest (a live poll
+        # never overwrites the scores of a contest that has ended meanwhile)
+        db.execute(f'''
+            UPDATE active_virtual_contests 
+            SET score = ?, per_problem_scores = ?
+            WHERE user_id = ? {"AND end_time IS NULL" if live else ""}
+        ''', (total_score, json.dumps(final_scores), user_id))
+        db.commit()
+
+    return submissions, final_scores
+
+def run_vc_autosync(user_id):
+    """
+    Job handler for 'vc_autosync': sync the ended contest window from every
+    platform the user has a handle for and persist the per-problem scores.
+    """
+    db = get_db()
+    active_contest = db.execute('''
+        SELECT contest_name, contest_stage, contest_id, start_time, end_time
+        FROM active_virtual_contests
+        WHERE user_id = ? AND end_time IS NOT NULL
+    ''', (user_id,)).fetchone()
+    if not active_contest:
+        raise JobFailed('No ended contest to sync')
+    active_contest = dict(active_contest)
+
+    submissions, final_scores = _sync_contest_window(db, user_id, active_contest, active_contest['end_time'])
+
+    # same shape /api/virtual-contests/end used to return inline
+    if not submissions:
+        return {}
+    return {'submissions': submissions, 'final_scores': final_scores}
+
+def run_vc_live_sync(user_id):
+    """
+    Job handler for 'vc_live_sync': while an autosynced contest is running,
+    sync its window up to now every VC_LIVE_SYNC_MINUTES. That keeps
+    user_virtual_submissions and the running per-problem scores current
+    (get_virtual_contests shows them), and leaves the end-of-contest sync
+    only the last few minutes to fetch: older judged submissions come from
+    the submission cache. The next run is queued before syncing, so one
+    failed poll doesn't stop the chain.
+    """
+    db = get_db()
+    active_contest = db.execute('''
+        SELECT avc.contest_name, avc.contest_stage, avc.contest_id, avc.start_time, c.duration_minutes
+        FROM active_virtual_contests avc
+        JOIN contests c ON c.id = avc.contest_id
+        WHERE avc.user_id = ? AND avc.end_time IS NULL AND avc.autosynced = 1
+    ''', (user_id,)).fetchone()
+    if not active_contest:
+        return {'stopped': True}
+    active_contest = dict(active_contest)
+
+    start_time = datetime.fromisoformat(active_contest['start_time'].replace('Z', '+00:00'))
+    contest_end = start_time + timedelta(minutes=active_contest['duration_minutes'])
+    utc_now = datetime.now(pytz.UTC)
+    running = utc_now < contest_end and VC_LIVE_SYNC_MINUTES > 0
+    if running:
+        enqueue_job(db, 'vc_live_sync', {}, user_id=user_id, max_attempts=1, delay=VC_LIVE_SYNC_MINUTES * 60)
+        db.commit()
+
+    submissions, final_scores = _sync_contest_window(
+        db, user_id, active_contest, min(utc_now, contest_end).isoformat(), live=True)
+    db.execute('''
+        UPDATE active_virtual_contests
+        SET live_synced_at = ?
+        WHERE user_id = ? AND end_time IS NULL
+    ''', (utc_now.isoformat(), user_id))
+    db.commit()
+    print(f"[VC LIVE] user {user_id}: {len(submissions)} problems synced, scores {final_scores}"
+          + ("" if running else "; contest time is up, stopping."))
+    return {'final_scores': final_scores, 'next_sync_minutes': VC_LIVE_SYNC_MINUTES if running else None}
 
 def confirm_virtual_contest():
     """
@@ -429,7 +488,7 @@ def confirm_virtual_contest():
     
     # Get the ended active contest with oj.uz sync
     active_contest = db.execute('''
-        SELECT contest_name, contest_stage, start_time, end_time, score, per_problem_scores, autosynced
+        SELECT contest_name, contest_stage, contest_id, start_time, end_time, score, per_problem_scores, autosynced
         FROM active_virtual_contests 
         WHERE user_id = ? AND end_time IS NOT NULL AND autosynced = 1
     ''', (user_id,)).fetchone()
@@ -448,16 +507,14 @@ def confirm_virtual_contest():
     contest_problems = db.execute('''
         SELECT 
             cp.problem_index,
-            p.name as problem_name,
-            p.source,
-            p.year
+            p.id as problem_id
         FROM contest_problems cp
         JOIN problems p ON cp.problem_source = p.source 
                         AND cp.problem_year = p.year 
                         AND cp.problem_number = p.number
-        WHERE cp.contest_name = ? AND (cp.contest_stage = ? OR (cp.contest_stage IS NULL AND ? IS NULL))
+        WHERE cp.contest_id = ?
         ORDER BY cp.problem_index
-    ''', (contest_name, contest_stage, contest_stage)).fetchall()
+    ''', (active_contest['contest_id'],)).fetchall()
     
     # Parse the per-problem scores from JSON
     try:
@@ -466,6 +523,7 @@ def confirm_virtual_contest():
         scores_list = []
     
     # Update user's problem scores in the database
+    changed = []
     for i, problem in enumerate(contest_problems):
         if i < len(scores_list):
             score = scores_list[i]
@@ -480,24 +538,27 @@ def confirm_virtual_contest():
             
             # Update or insert the problem status and score
             db.execute('''
-                INSERT INTO problem_statuses (user_id, problem_name, source, year, status, score)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(user_id, problem_name, source, year)
+                INSERT INTO problem_statuses (user_id, problem_id, status, score)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, problem_id)
                 DO UPDATE SET 
                     status = CASE WHEN excluded.score > problem_statuses.score THEN excluded.status ELSE problem_statuses.status END,
                     score = MAX(excluded.score, problem_statuses.score)
-            ''', (user_id, problem['problem_name'], problem['source'], problem['year'], status, score))
+            ''', (user_id, problem['problem_id'], status, score))
+            changed.append(problem['problem_id'])
     
     # Move the contest to completed virtual contests
     db.execute('''
         INSERT OR REPLACE INTO user_virtual_contests 
-        (user_id, contest_name, contest_stage, started_at, ended_at, score, per_problem_scores)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (user_id, contest_name, contest_stage, start_time, end_time, total_score, per_problem_scores))
+        (user_id, contest_name, contest_stage, contest_id, started_at, ended_at, score, per_problem_scores, slug)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT slug FROM contests WHERE id = ?))
+    ''', (user_id, contest_name, contest_stage, active_contest['contest_id'], start_time, end_time, total_score,
+          per_problem_scores, active_contest['contest_id']))
     
     # Remove from active contests
     db.execute('DELETE FROM active_virtual_contests WHERE user_id = ?', (user_id,))
     
+    record_progress_changes(db, user_id, changed)
     db.commit()
     return jsonify({'success': True})
 
@@ -516,7 +577,7 @@ def submit_virtual_contest():
     
     # Get the ended active contest
     active_contest = db.execute('''
-        SELECT contest_name, contest_stage, start_time, end_time, autosynced
+        SELECT contest_name, contest_stage, contest_id, start_time, end_time, autosynced
         FROM active_virtual_contests 
         WHERE user_id = ? AND end_time IS NOT NULL
     ''', (user_id,)).fetchone()
@@ -536,9 +597,10 @@ def submit_virtual_contest():
     # Save the virtual contest result to main table
     db.execute('''
         INSERT OR REPLACE INTO user_virtual_contests 
-        (user_id, contest_name, contest_stage, started_at, ended_at, score, per_problem_scores)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (user_id, contest_name, contest_stage, start_time, end_time, total_score, json.dumps(scores)))
+        (user_id, contest_name, contest_stage, contest_id, started_at, ended_at, score, per_problem_scores, slug)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, (SELECT slug FROM contests WHERE id = ?))
+    ''', (user_id, contest_name, contest_stage, active_contest['contest_id'], start_time, end_time, total_score,
+          json.dumps(scores), active_contest['contest_id']))
     
     # Remove from active contests
     db.execute('DELETE FROM active_virtual_contests WHERE user_id = ?', (user_id,))
@@ -567,25 +629,15 @@ def get_contest_scores():
 
     db = get_db()
     
-    # Build dynamic query to handle NULL stages properly
-    where_conditions = []
-    params = []
-    
-    for name, stage in contest_list:
-        if stage is None:
-            where_conditions.append("(contest_name = ? AND contest_stage IS NULL)")
-            params.append(name)
-        else:
-            where_conditions.append("(contest_name = ? AND contest_stage = ?)")
-            params.extend([name, stage])
-    
-    where_clause = " OR ".join(where_conditions)
-    
+    # Resolve the requested name/stage pairs to contest ids, then read the
+    # scores by contest_id (IS matches a NULL stage and still uses the index)
     contest_scores = db.execute(f'''
-        SELECT contest_name, contest_stage, medal_names, medal_cutoffs, problem_scores
-        FROM contest_scores 
-        WHERE {where_clause}
-    ''', params).fetchall()
+        WITH wanted(name, stage) AS (VALUES {', '.join(['(?, ?)'] * len(contest_list))})
+        SELECT c.name AS contest_name, c.stage AS contest_stage, s.medal_names, s.medal_cutoffs, s.problem_scores
+        FROM wanted w
+        JOIN contests c ON c.name = w.name AND c.stage IS w.stage
+        JOIN contest_scores s ON s.contest_id = c.id
+    ''', [v for pair in contest_list for v in pair]).fetchall()
     
     # Convert to dictionary format
     scores_dict = {}
@@ -603,11 +655,12 @@ def get_virtual_contest_detail(slug):
     user_id = request.user_id
     db = get_db()
 
-    # Get all virtual contests for this user to find matching slug
-    contests = db.execute('''
+    # The user's virtual contest with this slug (the latest run, for a contest done twice)
+    contest = db.execute('''
         SELECT 
             v.contest_name,
             v.contest_stage,
+            v.contest_id,
             c.source AS contest_source,
             c.year AS contest_year,
             c.location,
@@ -621,53 +674,45 @@ def get_virtual_contest_detail(slug):
                 ELSE 'manual'
             END AS platform
         FROM user_virtual_contests v
-        JOIN contests c 
-          ON v.contest_name = c.name 
-         AND (v.contest_stage = c.stage OR (v.contest_stage IS NULL AND c.stage IS NULL))
-        WHERE v.user_id = ?
-    ''', (user_id,)).fetchall()
+        JOIN contests c ON c.id = v.contest_id
+        WHERE v.user_id = ? AND v.slug = ?
+        ORDER BY v.started_at DESC
+        LIMIT 1
+    ''', (user_id, slug)).fetchone()
+
+    if not contest:
+        return jsonify({'error': 'Contest not found'}), 404
+
+    result = dict(contest)
+
+    # Fetch only the relevant submission fields
+    submissions = db.execute('''
+        SELECT 
+            submission_time,
+            problem_index,
+            score,
+            subtask_scores
+        FROM user_virtual_submissions
+        WHERE user_id = ?
+          AND contest_id = ?
+          AND submission_time >= ?
+          AND submission_time <= ?
+        ORDER BY submission_time ASC
+    ''', (
+        user_id,
+        contest['contest_id'],
+        contest['started_at'],
+        contest['ended_at'],
+    )).fetchall()
+
+    out_subs = []
+    for row in submissions:
+        d = dict(row)
+        try:
+            d['subtask_scores'] = json.loads(d.get('subtask_scores') or 'null')
+        except Exception:
+            pass
+        out_subs.append(d)
 
-    for contest in contests:
-        contest_slug = (contest['contest_name'] + (contest['contest_stage'] or '')).lower().replace(' ', '')
-        if contest_slug == slug:
-            result = dict(contest)
-
-            # Fetch only the relevant submission fields
-            submissions = db.execute('''
-                SELECT 
-                    submission_time,
-                    problem_index,
-                    score,
-                    subtask_scores
-                FROM user_virtual_submissions
-                WHERE user_id = ?
-                  AND contest_name = ?
-                  AND (
-                        (contest_stage = ?)
-                        OR (contest_stage IS NULL AND ? IS NULL)
-                      )
-                  AND submission_time >= ?
-                  AND submission_time <= ?
-                ORDER BY submission_time ASC
-            ''', (
-                user_id,
-                contest['contest_name'],
-                contest['contest_stage'], contest['contest_stage'],
-                contest['started_at'],
-                contest['ended_at'],
-            )).fetchall()
-
-            out_subs = []
-            for row in submissions:
-                d = dict(row)
-                try:
-                    import json
-                    d['subtask_scores'] = json.loads(d.get('subtask_scores') or 'null')
-                except Exception:
-                    pass
-                out_subs.append(d)
-
-            result['submissions'] = out_subs
-            return jsonify(result)
-
-    return jsonify({'error': 'Contest not found'}), 404
\ No newline at end of file
+    result['submissions'] = out_subs
+    return jsonify(result)
@@ -7,10 +7,11 @@ FRONTEND_PORT=5501
 
 BACKEND_SESSION="checklist-back"
 FRONTEND_SESSION="checklist-front"
+WORKER_SESSION="checklist-worker"
 
 # --- Shutdown ---
 if [[ "$1" == "--shutdown" ]]; then
-  for session in "$BACKEND_SESSION" "$FRONTEND_SESSION"; do
+  for session in "$BACKEND_SESSION" "$FRONTEND_SESSION" "$WORKER_SESSION"; do
     if tmux has-session -t "$session" 2>/dev/null; then
       echo "Killing session: $session"
       tmux kill-session -t "$session"
@@ -27,6 +28,12 @@ if [[ "$1" == "--focus" ]]; then
     else
       echo "Backend session not running."
     fi
+  elif [[ "$2" == "worker" ]]; then
+    if tmux has-session -t "$WORKER_SESSION" 2>/dev/null; then
+      tmux attach-session -t "$WORKER_SESSION"
+    else
+      echo "Worker session not running."
+    fi
   elif [[ "$2" == "front" ]]; then
     if tmux has-session -t "$FRONTEND_SESSION" 2>/dev/null; then
       tmux attach-session -t "$FRONTEND_SESSION"
@@ -34,7 +41,7 @@ if [[ "$1" == "--focus" ]]; then
       echo "Frontend session not running."
     fi
   else
-    echo "Usage: $0 --focus [back|front]"
+    echo "Usage: $0 --focus [back|front|worker]"
     exit 1
   fi
   exit 0
@@ -50,9 +57,12 @@ echo "Starting backend server in tmux session '$BACKEND_SESSION'..."
 cp "$FRONTEND_DIR/index.html" "$FRONTEND_DIR/404.html"
 tmux new-session -d -s "$BACKEND_SESSION" -c "$BACKEND_DIR" "FLASK_ENV=production python3 app.py"
 
+echo "Starting job worker in tmux session '$WORKER_SESSION'..."
+tmux new-session -d -s "$WORKER_SESSION" -c "$BACKEND_DIR" "FLASK_ENV=production python3 jobs/worker.py"
+
 echo "Starting frontend server in tmux session '$FRONTEND_SESSION'..."
 tmux new-session -d -s "$FRONTEND_SESSION" -c "$FRONTEND_DIR" "python3 custom_server.py"
 
 echo "Servers started."
-echo "Use './checklist.sh --focus back' or '--focus front' to view logs."
-echo "Use './checklist.sh --shutdown' to stop both."
+echo "Use './checklist.sh --focus back', '--focus front' or '--focus worker' to view logs."
+echo "Use './checklist.sh --shutdown' to stop all of them."
@@ -520,10 +520,19 @@ async function onSubmitOjuzCookie(e) {
       })
         .then(res => res.json())
         .then(result => {
-          console.log('Problems updated in the background.');
+          if (!result.job_id) return;
+          return streamJobEvents(result.job_id, (event, data) => {
+            const line = describeSyncProgress(event, data);
+            if (line) messageBox.textContent = line;
+          });
+        })
+        .then(job => {
+          if (job) console.log('Problems updated in the background.');
         })
         .catch(err => {
           console.error('Error updating problems in the background:', err);
+          messageBox.textContent = `Sync failed: ${err.message}`;
+          messageBox.style.color = 'red';
         });
     } else {
       messageBox.textContent = `Invalid cookie. Please check and try again.`;
@@ -748,10 +757,19 @@ async function onSubmitQojCookie(e) {
       })
         .then(res => res.json())
         .then(result => {
-          console.log('QOJ problems update triggered.');
+          if (!result.job_id) return;
+          return streamJobEvents(result.job_id, (event, data) => {
+            const line = describeSyncProgress(event, data);
+            if (line) messageBox.textContent = line;
+          });
+        })
+        .then(job => {
+          if (job) console.log('QOJ problems updated in the background.');
         })
         .catch(err => {
           console.error('Error updating QOJ problems:', err);
+          messageBox.textContent = `Sync failed: ${err.message}`;
+          messageBox.style.color = 'red';
         });
     } else {
       messageBox.textContent = `Invalid cookie. Please check and try again.`;
@@ -134,6 +134,96 @@ let currentStatus = 0;
 let isProfileMode = false;
 let documentClickHandlerAdded = false;
 
+// Poll a background job (platform syncs) until it finishes; resolves with the job
+async function waitForJob(jobId, { interval = 1500, timeout = 10 * 60 * 1000 } = {}) {
+  const sessionToken = localStorage.getItem('sessionToken');
+  const deadline = Date.now() + timeout;
+  while (Date.now() < deadline) {
+    const res = await fetch(`${apiUrl}/api/jobs/${jobId}`, {
+      credentials: 'include',
+      headers: { 'Authorization': `Bearer ${sessionToken}` }
+    });
+    if (!res.ok) {
+      throw new Error(`Job ${jobId} lookup failed (${res.status})`);
+    }
+    const job = await res.json();
+    if (job.status === 'succeeded') {
+      return job;
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || `Job ${jobId} failed`);
+    }
+    await new Promise(resolve => setTimeout(resolve, interval));
+  }
+  throw new Error(`Timed out waiting for job ${jobId}`);
+}
+
+// Stream a background job's progress events (SSE over fetch, so the session
+// token can go in a header); resolves with the finished job from the `done` event
+async function streamJobEvents(jobId, onProgress) {
+  const sessionToken = localStorage.getItem('sessionToken');
+  const res = await fetch(`${apiUrl}/api/jobs/${jobId}/events`, {
+    credentials: 'include',
+    headers: { 'Authorization': `Bearer ${sessionToken}` }
+  });
+  if (!res.ok || !res.body) {
+    // no streaming support: fall back to polling
+    return waitForJob(jobId);
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const chunk = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = 'message';
+      let data = '';
+      for (const line of chunk.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (!data) continue;  // keepalive comment
+      const payload = JSON.parse(data);
+      if (event === 'done') {
+        if (payload && payload.status === 'failed') {
+          throw new Error(payload.error || `Job ${jobId} failed`);
+        }
+        return payload;
+      }
+      if (onProgress) onProgress(event, payload);
+    }
+  }
+  // stream dropped before the job finished
+  return waitForJob(jobId);
+}
+
+// Human-readable line for a sync progress event
+function describeSyncProgress(event, data) {
+  switch (event) {
+    case 'started':
+      return data.pages
+        ? `Syncing ${data.platform}: ${data.pages} submission pages to scan...`
+        : `Syncing ${data.platform}: checking ${data.problems} problems...`;
+    case 'page':
+      return data.pages
+        ? `Syncing ${data.platform}: page ${data.page}/${data.pages}, ${data.submissions} submissions so far`
+        : `Syncing ${data.platform}: page ${data.page}, ${data.submissions} submissions so far`;
+    case 'problems':
+      return `Syncing ${data.platform}: checked ${data.checked}/${data.total} problems`;
+    case 'submissions':
+      return `Syncing ${data.platform}: fetched ${data.fetched}/${data.total} submissions`;
+    case 'updated':
+      return `Synced ${data.platform}: ${data.problems} problems updated in ${Math.round(data.elapsed)}s`;
+    default:
+      return null;
+  }
+}
+
 // Add global click handler once
 function addGlobalClickHandler() {
   if (documentClickHandlerAdded) return;
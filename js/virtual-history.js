@@ -326,7 +326,7 @@ function createContestItem(contest, contestData, problemsData, contestScores) {
       return;
     }
     // Use query parameters with clean slug
-    const slug = (contest.contest_name + (contest.contest_stage || '')).toLowerCase().replace(/\s+/g, '');
+    const slug = contest.slug || (contest.contest_name + (contest.contest_stage || '')).toLowerCase().replace(/\s+/g, '');
     window.location.href = `virtual-contest-detail?contest=${slug}`;
   });
 
@@ -590,7 +590,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         if (e.target.tagName === 'A' || e.target.closest('a')) {
           return;
         }
-        const slug = (contest.contest_name + (contest.contest_stage || '')).toLowerCase().replace(/\s+/g, '');
+        const slug = contest.slug || (contest.contest_name + (contest.contest_stage || '')).toLowerCase().replace(/\s+/g, '');
         window.location.href = `virtual-contest-detail?contest=${slug}`;
       });
       pastVcList.appendChild(item);
@@ -1234,13 +1234,23 @@ document.addEventListener('DOMContentLoaded', async () => {
         body: JSON.stringify({})
       });
 
-      // Hide loading spinner and restore UI
-      if (isAutosynced) {
-        document.getElementById('ojuz-sync-loading').style.display = 'none';
-      }
-
       if (response.ok) {
-        const result = await response.json();
+        let result = await response.json();
+
+        // Autosync runs as a background job; keep the spinner up until it finishes
+        if (result.job_id) {
+          const loadingText = document.querySelector('#ojuz-sync-loading .loading-text span');
+          const job = await streamJobEvents(result.job_id, (event, data) => {
+            const line = describeSyncProgress(event, data);
+            if (line && loadingText) loadingText.textContent = line;
+          });
+          result = { ...result, ...(job.result || {}) };
+        }
+
+        // Hide loading spinner and restore UI
+        if (isAutosynced) {
+          document.getElementById('ojuz-sync-loading').style.display = 'none';
+        }
 
         if (isAutosynced && result.submissions) {
           // Show score entry with oj.uz data in read-only mode
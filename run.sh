@@ -19,6 +19,12 @@ source venv/bin/activate
 # Update database
 # ------------------------------
 
+echo "[INFO] Running schema migrations..."
+python3 backend/database/init/migrate_db.py
+
+echo "[INFO] Compacting old progress events..."
+python3 backend/database/init/compact_events.py
+
 echo "[INFO] Populating problems..."
 python3 backend/database/init/populate_problems.py
 
@@ -35,6 +41,10 @@ BACKEND_PID=$!
 # Give backend a few seconds to start
 sleep 2
 
+echo "[INFO] Starting job worker..."
+python3 backend/jobs/worker.py &
+WORKER_PID=$!
+
 # ------------------------------
 # Run frontend
 # ------------------------------
@@ -44,8 +54,9 @@ FRONTEND_PID=$!
 
 echo "[INFO] Backend PID: $BACKEND_PID"
 echo "[INFO] Frontend PID: $FRONTEND_PID"
+echo "[INFO] Worker PID: $WORKER_PID"
 
 # ------------------------------
-# Wait for both processes to finish
+# Wait for the processes to finish
 # ------------------------------
-wait $BACKEND_PID $FRONTEND_PID
+wait $BACKEND_PID $FRONTEND_PID $WORKER_PID
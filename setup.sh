@@ -42,6 +42,55 @@ FLASK_ENV=local
 # Path to your SQLite database (e.g., database.db)
 DATABASE_PATH=database.db
 
+# SQLite connection pool (per backend process)
+DB_POOL_SIZE=8
+DB_POOL_TIMEOUT=10
+DB_BUSY_TIMEOUT_MS=5000
+
+# In-process cache for session token lookups
+SESSION_CACHE_SIZE=4096
+SESSION_CACHE_TTL=60
+
+# Background job worker (platform syncs)
+JOB_WORKER_THREADS=2
+JOB_LEASE_SECONDS=60
+JOB_MAX_ATTEMPTS=3
+
+# Keep-alive HTTP pools used by the scrapers
+HTTP_POOL_MAXSIZE=16
+HTTP_TIMEOUT=10
+
+# Per-host request budgets (host=requests per second/burst); the backend and
+# worker processes share them through the database (RATE_LIMIT_SHARED=1)
+RATE_LIMITS=oj.uz=4/4,qoj.ac=4/4
+RATE_LIMIT_SHARED=1
+
+# Submission-list and detail pages fetched at once by the qoj.ac syncs
+QOJ_PAGE_WORKERS=4
+QOJ_DETAIL_WORKERS=6
+
+# Seconds a qoj.ac bot session that passed a login check is trusted without
+# re-checking, and how long one process may hold the login lease
+SCRAPER_TOKEN_CHECK_TTL=300
+SCRAPER_LOGIN_LEASE_SECONDS=60
+
+# Reusable cloudscraper sessions for qoj.ac: pool size, anonymous sessions
+# kept warm, checkouts and idle seconds before a session is recycled
+SCRAPER_POOL_SIZE=8
+SCRAPER_POOL_WARM=2
+SCRAPER_POOL_MAX_USES=50
+SCRAPER_POOL_IDLE_SECONDS=600
+
+# Minutes between live syncs of a running autosynced virtual contest (0 = off)
+VC_LIVE_SYNC_MINUTES=5
+
+# How the oj.uz full sync reads scores: submissions (walk the submissions
+# list) or problems (open every problem page)
+OJUZ_SYNC_MODE=submissions
+
+# HTML tree builder for the scrapers: auto (lxml if installed), lxml or html.parser
+HTML_PARSER=auto
+
 # Absolute path to the backend/ folder
 BACKEND_DIR=backend
 
@@ -86,6 +135,9 @@ fi
 echo "[INFO] Initializing database..."
 python3 backend/database/init/init_db.py
 
+echo "[INFO] Running schema migrations..."
+python3 backend/database/init/migrate_db.py
+
 echo "[INFO] Populating problems..."
 python3 backend/database/init/populate_problems.py
 
@@ -105,6 +157,10 @@ BACKEND_PID=$!
 # Give backend a moment to start (optional)
 sleep 2
 
+echo "[INFO] Starting job worker..."
+python3 backend/jobs/worker.py &
+WORKER_PID=$!
+
 echo "[INFO] Starting frontend server..."
 # Activate venv and run frontend in another process
 source venv/bin/activate
@@ -115,6 +171,7 @@ FRONTEND_PID=$!
 
 echo "[INFO] Backend PID: $BACKEND_PID"
 echo "[INFO] Frontend PID: $FRONTEND_PID"
+echo "[INFO] Worker PID: $WORKER_PID"
 
-# Wait for both processes to finish (keeps the script running)
-wait $BACKEND_PID $FRONTEND_PID
+# Wait for the processes to finish (keeps the script running)
+wait $BACKEND_PID $FRONTEND_PID $WORKER_PID